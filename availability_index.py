@@ -0,0 +1,102 @@
+import threading
+
+# Appointment slots offered as alternatives: every SLOT_MINUTES within opening hours
+SLOT_MINUTES = 30
+OPENING_TIME = '08:00'
+CLOSING_TIME = '18:00'  # Last slot starts at least SLOT_MINUTES before closing
+DEFAULT_SUGGESTIONS = 3
+
+
+# Converts HH:MM to minutes since midnight
+def to_minute(time):
+    hours, minutes = time.split(':')
+    return int(hours) * 60 + int(minutes)
+
+# Converts minutes since midnight to HH:MM
+def to_time(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+# In-memory record of booked times, as one bitmap per day (bit m set = minute m of the day is booked),
+# plus one per (day, service type). Answers "is this time free" in O(1) and finds the nearest free slots
+# without touching SQLite. The database stays the authority: the booking system keeps this in sync on
+# book/cancel and records any conflict the database reports.
+class AvailabilityIndex:
+    def __init__(self, slot_minutes=SLOT_MINUTES, opening_time=OPENING_TIME, closing_time=CLOSING_TIME):
+        self.slot_minutes = slot_minutes
+        self.opening_minute = to_minute(opening_time)
+        self.closing_minute = to_minute(closing_time)
+        self.days = {}  # date -> bitmap of booked minutes, over all services
+        self.services = {}  # (date, service type) -> bitmap of booked minutes
+        self.lock = threading.Lock()
+
+    # Rebuilds the index from (date, time, service_type) rows, skipping rows with malformed times
+    def load(self, rows):
+        with self.lock:
+            self.days.clear()
+            self.services.clear()
+            for date, time, service_type in rows:
+                try:
+                    minute = to_minute(time)
+                except (AttributeError, ValueError):
+                    continue
+                self._set(date, minute, service_type)
+
+    # Marks a time as booked, for service_type as well if given
+    def add(self, date, time, service_type=None):
+        with self.lock:
+            self._set(date, to_minute(time), service_type)
+
+    # Marks a time as free again. still_booked lists the service types of appointments that still hold the
+    # time (possible on databases without the unique slot index): while there are any the day stays booked,
+    # and so does service_type if one of them is for it.
+    def remove(self, date, time, service_type=None, still_booked=()):
+        minute = to_minute(time)
+        mask = ~(1 << minute)
+        remaining = {self._service_key(service) for service in still_booked}
+        with self.lock:
+            if date in self.days and not still_booked:
+                self.days[date] &= mask
+                if not self.days[date]:
+                    del self.days[date]
+            if service_type is None or self._service_key(service_type) in remaining:
+                return
+            key = (date, self._service_key(service_type))
+            if key in self.services:
+                self.services[key] &= mask
+                if not self.services[key]:
+                    del self.services[key]
+
+    # Returns True if nothing is booked at this time (for one service type, if given)
+    def is_free(self, date, time, service_type=None):
+        return not (self._bitmap(date, service_type) >> to_minute(time)) & 1
+
+    # Returns up to n free slot times on the slot grid within opening hours, nearest to the requested
+    # time first (earlier slot first on ties), never including the requested time itself
+    def nearest_free(self, date, time, n=DEFAULT_SUGGESTIONS, service_type=None):
+        bitmap = self._bitmap(date, service_type)
+        requested = to_minute(time)
+        last_start = self.closing_minute - self.slot_minutes
+        candidates = []
+        for minute in range(self.opening_minute, last_start + 1, self.slot_minutes):
+            if minute != requested and not (bitmap >> minute) & 1:
+                candidates.append((abs(minute - requested), minute))
+        candidates.sort()
+        return [to_time(minute) for _, minute in candidates[:n]]
+
+    def _service_key(self, service_type):
+        return (service_type or '').strip().lower()
+
+    def _bitmap(self, date, service_type):
+        if service_type is None:
+            return self.days.get(date, 0)
+        return self.services.get((date, self._service_key(service_type)), 0)
+
+    # Sets the bit for a booked minute, in the service's bitmap too unless service_type is None (call with the lock held)
+    def _set(self, date, minute, service_type):
+        bit = 1 << minute
+        self.days[date] = self.days.get(date, 0) | bit
+        if service_type is None:
+            return
+        key = (date, self._service_key(service_type))
+        self.services[key] = self.services.get(key, 0) | bit
@@ -0,0 +1,69 @@
+# Rows/sec of the bulk import API against booking the same appointments one by one.
+# Usage: python benchmarks/bench_bulk_import.py [--rows 20000] [--batch-sizes 100 1000 5000] [--json report.json]
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from healthcare_booking import HealthcareBooking
+from availability_index import SLOT_MINUTES, OPENING_TIME, CLOSING_TIME, to_minute, to_time
+
+
+# Builds a clinic schedule of distinct slots, filling each day's opening hours before moving to the next day
+def build_rows(count):
+    slots_per_day = (to_minute(CLOSING_TIME) - to_minute(OPENING_TIME)) // SLOT_MINUTES
+    first_day = datetime.date(2030, 1, 1)
+    rows = []
+    for number in range(count):
+        day, slot = divmod(number, slots_per_day)
+        date = (first_day + datetime.timedelta(days=day)).strftime('%d-%m-%Y')
+        time_of_day = to_time(to_minute(OPENING_TIME) + slot * SLOT_MINUTES)
+        rows.append((number % 500, date, time_of_day, 'General Practitioner', f"Dr {number % 40}"))
+    return rows
+
+
+# Loads rows into a fresh temporary database with load(booking, rows); returns rows/sec
+def measure(rows, load):
+    booking = HealthcareBooking(':memory:')
+    try:
+        start = time.perf_counter()
+        load(booking, rows)
+        return len(rows) / (time.perf_counter() - start)
+    finally:
+        booking.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bulk appointment import with looping over book_appointment")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    report = {
+        'rows': len(rows),
+        'book_appointment': measure(rows, lambda booking, rows: [booking.book_appointment(*row) for row in rows]),
+        'import_appointments': [],
+    }
+    for batch_size in args.batch_sizes:
+        rate = measure(rows, lambda booking, rows: booking.import_appointments(rows, batch_size))
+        report['import_appointments'].append({'batch_size': batch_size, 'rows_per_s': rate})
+
+    print(f"{report['rows']} rows; book_appointment loop: {report['book_appointment']:.0f} rows/s")
+    print(f"{'batch':>7} {'rows/s':>10} {'speedup':>8}")
+    for row in report['import_appointments']:
+        print(f"{row['batch_size']:>7} {row['rows_per_s']:>10.0f} {row['rows_per_s'] / report['book_appointment']:>7.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
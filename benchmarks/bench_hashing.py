@@ -0,0 +1,90 @@
+# Memory/accuracy report for the hashing feature mode against the TfidfVectorizer vocabulary.
+# Usage: python benchmarks/bench_hashing.py [--n-features 4096 16384 65536 262144] [--json report.json]
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import intent_recognition as ir
+from bench_lsa import build_queries, time_queries, csr_nbytes
+from session_store import estimate_size
+
+
+# Builds the model in one feature mode; returns it with its build time in seconds
+def build(features, n_features=None):
+    options = {'n_features': n_features} if n_features else {}
+    start = time.perf_counter()
+    model = ir.setup_intent_recognition(
+        os.path.join(ROOT, 'intents.json'), os.path.join(ROOT, 'qa_dataset.csv'),
+        os.path.join(ROOT, 'healthcare_info.csv'), artifact_file=None, features=features, **options)
+    return list(model), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare hashed features with the TF-IDF vocabulary")
+    parser.add_argument('--n-features', type=int, nargs='+', default=[2 ** 12, 2 ** 14, 2 ** 16, 2 ** 18])
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    queries = build_queries()
+    preprocessed = ir.preprocess_texts(queries)
+    model, build_seconds = build('tfidf')
+    vectorizer = model[0]
+    exact_top = [indices[0] for indices, _ in ir.match_inputs(preprocessed, vectorizer, model[1], 1)]
+    exact_results = [r[0][:2] for r in ir.recognize_intents(queries, *model)]
+    latency = time_queries(queries, model)
+    report = {
+        'queries': len(queries),
+        'tfidf': {
+            'features': len(vectorizer.vocabulary_),
+            'vectorizer_bytes': estimate_size(vectorizer.vocabulary_) + vectorizer.idf_.nbytes,
+            'pickle_bytes': len(pickle.dumps(vectorizer)),
+            'matrix_bytes': csr_nbytes(model[1]),
+            'build_s': build_seconds,
+            'p50_ms': float(np.percentile(latency, 50)),
+        },
+        'hashing': [],
+    }
+
+    for n_features in args.n_features:
+        hashed, build_seconds = build('hashing', n_features)
+        top = [indices[0] for indices, _ in ir.match_inputs(preprocessed, hashed[0], hashed[1], 1)]
+        results = [r[0][:2] for r in ir.recognize_intents(queries, *hashed)]
+        latency = time_queries(queries, hashed)
+        buckets = np.unique(hashed[0].hasher.transform(list(vectorizer.vocabulary_)).indices).size
+        report['hashing'].append({
+            'n_features': n_features,
+            'vectorizer_bytes': hashed[0].nbytes(),
+            'pickle_bytes': len(pickle.dumps(hashed[0])),
+            'matrix_bytes': csr_nbytes(hashed[1]),
+            'colliding_ngrams': len(vectorizer.vocabulary_) - int(buckets),
+            'top1_agreement': float(np.mean([a == b for a, b in zip(top, exact_top)])),
+            'answer_agreement': float(np.mean([a == b for a, b in zip(results, exact_results)])),
+            'build_s': build_seconds,
+            'p50_ms': float(np.percentile(latency, 50)),
+        })
+
+    tfidf = report['tfidf']
+    print(f"{report['queries']} queries; TF-IDF vocabulary: {tfidf['features']} n-grams, "
+          f"{tfidf['vectorizer_bytes'] / 1024:.0f} KiB in memory, {tfidf['pickle_bytes'] / 1024:.0f} KiB pickled, "
+          f"matrix {tfidf['matrix_bytes'] / 1024:.0f} KiB, p50 {tfidf['p50_ms']:.3f} ms")
+    print(f"{'features':>9} {'KiB':>7} {'pickle KiB':>11} {'matrix KiB':>11} {'collisions':>11} {'top1':>6} {'agree':>6} {'p50 ms':>7}")
+    for row in report['hashing']:
+        print(f"{row['n_features']:>9} {row['vectorizer_bytes'] / 1024:>7.0f} {row['pickle_bytes'] / 1024:>11.0f} "
+              f"{row['matrix_bytes'] / 1024:>11.0f} {row['colliding_ngrams']:>11} {row['top1_agreement']:>6.3f} "
+              f"{row['answer_agreement']:>6.3f} {row['p50_ms']:>7.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
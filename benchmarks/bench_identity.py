@@ -0,0 +1,90 @@
+# Per-call cost of IdentityManager name extraction and lookups with many registered users, against the
+# previous approach (each pattern tried with re.search in turn, and a linear scan for name -> ID).
+# Usage: python benchmarks/bench_identity.py [--users 100000] [--calls 2000] [--json report.json]
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import identity_management as idm
+from session_store import estimate_size
+
+FIRST_NAMES = ['Emily', 'John', 'David', 'Susan', 'Adam', 'Lisa', 'Clara', 'Paul', 'Rachel', 'Henry']
+INTRODUCTIONS = ["My name is {}", "Hi, I am {}", "call me {}", "You can call me {}", "I'm {}", "{}",
+                 "hello there, nice to meet you, my name's {}"]
+
+
+# Previous extract_name: every pattern tried with re.search in turn
+def legacy_extract(text):
+    for pattern in idm.NAME_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return ' '.join(part.capitalize() for part in match.group(1).split())
+    return None
+
+
+# Previous get_user_id: a linear scan over every registered user
+def legacy_user_id(user_data, user_name):
+    for user_id, name in user_data.items():
+        if name == user_name:
+            return user_id
+    return None
+
+
+# Returns the mean time per call of function over args, in microseconds
+def per_call(function, args):
+    start = time.perf_counter()
+    for arg in args:
+        function(arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time identity extraction and lookups at scale")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    manager = idm.IdentityManager(max_users=args.users)
+    names = [f"{rng.choice(FIRST_NAMES)} {number}" for number in range(args.users)]
+    for name in names:
+        manager.extract_name(f"My name is {name}")
+    texts = [rng.choice(INTRODUCTIONS).format(rng.choice(names).lower()) for _ in range(args.calls)]
+    lookups = [rng.choice(names) for _ in range(args.calls)]
+    ids = [manager.get_user_id(name) for name in lookups]
+    # The linear scan is slow enough at this size that a sample of calls is plenty
+    scan_lookups = lookups[:max(1, args.calls // 100)]
+
+    report = {
+        'users': len(manager.user_data),
+        'bytes': estimate_size(manager),
+        'extract_name_us': {'legacy': per_call(legacy_extract, texts),
+                            'compiled': per_call(lambda text: idm.NAME_EXTRACTOR.match(text), texts)},
+        'get_user_id_us': {'legacy': per_call(lambda name: legacy_user_id(manager.user_data, name), scan_lookups),
+                           'indexed': per_call(manager.get_user_id, lookups)},
+        'get_user_name_us': per_call(manager.get_user_name, ids),
+    }
+    # Registering a user past max_users also evicts the least recently used one
+    report['register_with_eviction_us'] = per_call(manager.extract_name, texts)
+
+    print(f"{report['users']} users, about {report['bytes'] / 2**20:.1f} MiB")
+    print(f"extract_name:  legacy {report['extract_name_us']['legacy']:.2f} us, compiled {report['extract_name_us']['compiled']:.2f} us")
+    print(f"get_user_id:   legacy {report['get_user_id_us']['legacy']:.0f} us, indexed {report['get_user_id_us']['indexed']:.2f} us")
+    print(f"get_user_name: {report['get_user_name_us']:.2f} us")
+    print(f"register with eviction: {report['register_with_eviction_us']:.2f} us")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Model build time and peak memory of the serial path (load every row, preprocess them in one process, then
+# fit) against streaming ingestion (corpus_ingest) with 1..N preprocessing processes, on a QA corpus scaled
+# with --scale. Every build runs in a fresh process with a cold lemma cache, and reports a digest of the
+# model it built, so the report also shows whether each streamed model is identical to the serial one.
+# Peak memory is the largest resident set of the building process (not its preprocessing workers). Linux only.
+# Usage: python benchmarks/bench_ingest.py [--scale 20] [--workers 1,2,4] [--features tfidf] [--json report.json]
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_shared_model import scaled_sources
+
+
+# Hashes everything in a model tuple, so models built in different processes can be compared
+def model_digest(model):
+    vectorizer, X, *columns = model
+    digest = hashlib.sha256()
+    for array in (X.data, X.indices, X.indptr, vectorizer.idf_):
+        digest.update(array.dtype.str.encode())
+        digest.update(array.tobytes())
+    if hasattr(vectorizer, 'vocabulary_'):
+        digest.update(json.dumps(list(vectorizer.vocabulary_.items())).encode())
+    for column in columns:
+        digest.update(json.dumps(list(column)).encode())
+    return digest.hexdigest()
+
+
+# Builds the model once (workers=None is the serial path) and reports its time, peak memory and digest
+def run_build(files, features, workers, chunk_size, results):
+    try:
+        import intent_recognition as ir
+        start = time.perf_counter()
+        model = ir.build_model(*files, features=features, workers=workers, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        results.put({'seconds': elapsed, 'rows': model[1].shape[0], 'digest': model_digest(model),
+                     'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+    except Exception as e:
+        results.put({'error': repr(e)})
+
+
+# Runs one build in a fresh process and returns its report
+def measure(files, features, workers, chunk_size):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_build, args=(files, features, workers, chunk_size, results))
+    process.start()
+    report = results.get()
+    process.join()
+    if 'error' in report:
+        raise RuntimeError(f"Build failed: {report['error']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial and streaming model builds")
+    parser.add_argument('--scale', type=int, default=20, help="Copies of the general QA corpus")
+    parser.add_argument('--workers', default='1,2,4', help="Comma-separated preprocessing process counts")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--features', default='tfidf', choices=('tfidf', 'hashing'))
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = {'scale': args.scale, 'features': args.features, 'chunk_size': args.chunk_size, 'runs': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        files = scaled_sources(directory, args.scale)
+        report['runs']['serial'] = measure(files, args.features, None, args.chunk_size)
+        for workers in (int(value) for value in args.workers.split(',')):
+            report['runs'][f"streaming x{workers}"] = measure(files, args.features, workers, args.chunk_size)
+
+    serial = report['runs']['serial']
+    print(f"{serial['rows']} rows, features={args.features}, chunk size {args.chunk_size}")
+    print(f"{'build':<16}{'seconds':>10}{'rows/s':>10}{'peak RSS MB':>13}{'speedup':>9}  identical")
+    for name, run in report['runs'].items():
+        run['identical'] = run['digest'] == serial['digest']
+        print(f"{name:<16}{run['seconds']:>10.2f}{run['rows'] / run['seconds']:>10.0f}{run['peak_rss_mb']:>13.1f}"
+              f"{serial['seconds'] / run['seconds']:>9.2f}  {'yes' if run['identical'] else 'NO'}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
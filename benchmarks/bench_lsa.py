@@ -0,0 +1,116 @@
+# Recall/latency report for the LSA matching backend against the exact TF-IDF path.
+# Usage: python benchmarks/bench_lsa.py [--dims 64 128 256 512] [--json report.json]
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import intent_recognition as ir
+import lsa_index
+
+
+# Builds evaluation queries from the bundled data: every intent pattern and corpus question,
+# with about a third of its words dropped so the queries are not exact copies of indexed rows
+def build_queries(seed=0):
+    rng = random.Random(seed)
+    with open(os.path.join(ROOT, 'intents.json')) as file:
+        texts = [pattern for intent in json.load(file)['intents'] for pattern in intent['patterns']]
+    for name in ('qa_dataset.csv', 'healthcare_info.csv'):
+        with open(os.path.join(ROOT, name), newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            texts.extend(row[1] for row in reader)
+
+    queries = []
+    for text in texts:
+        words = text.split()
+        keep = max(1, (2 * len(words) + 2) // 3)
+        queries.append(' '.join(sorted(rng.sample(words, keep), key=words.index)))
+    return queries
+
+
+# Times recognize_intent on each query and returns per-query latencies in milliseconds
+def time_queries(queries, model):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        ir.recognize_intent(query, *model)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def csr_nbytes(X):
+    return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the LSA backend with exact TF-IDF matching")
+    parser.add_argument('--dims', type=int, nargs='+', default=[64, 128, 256, 512])
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    model = list(ir.setup_intent_recognition(
+        os.path.join(ROOT, 'intents.json'), os.path.join(ROOT, 'qa_dataset.csv'),
+        os.path.join(ROOT, 'healthcare_info.csv'), artifact_file=None))
+    vectorizer, X = model[0], model[1]
+    queries = build_queries()
+    preprocessed = ir.preprocess_texts(queries)
+
+    exact_top = [indices[0] for indices, _ in ir.match_inputs(preprocessed, vectorizer, X, 1)]
+    exact_results = [r[0][:2] for r in ir.recognize_intents(queries, *model)]
+    exact_latency = time_queries(queries, model)
+
+    report = {
+        'queries': len(queries),
+        'exact': {
+            'bytes': csr_nbytes(X),
+            'p50_ms': float(np.percentile(exact_latency, 50)),
+            'p95_ms': float(np.percentile(exact_latency, 95)),
+        },
+        'lsa': [],
+    }
+    for dim in args.dims:
+        build_start = time.perf_counter()
+        index = lsa_index.LSAIndex(X, n_components=dim)
+        build_seconds = time.perf_counter() - build_start
+        lsa_model = model[:]
+        lsa_model[1] = index
+
+        top10 = [indices for indices, _ in ir.match_inputs(preprocessed, vectorizer, index, 10)]
+        lsa_results = [r[0][:2] for r in ir.recognize_intents(queries, *lsa_model)]
+        latency = time_queries(queries, lsa_model)
+        report['lsa'].append({
+            'dim': index.n_components,
+            'explained_variance': index.explained_variance,
+            'build_s': build_seconds,
+            'bytes': index.nbytes(),
+            'recall@1': float(np.mean([top[0] == best for top, best in zip(top10, exact_top)])),
+            'recall@10': float(np.mean([best in top for top, best in zip(top10, exact_top)])),
+            'answer_agreement': float(np.mean([a == b for a, b in zip(lsa_results, exact_results)])),
+            'p50_ms': float(np.percentile(latency, 50)),
+            'p95_ms': float(np.percentile(latency, 95)),
+        })
+
+    print(f"{report['queries']} queries; exact TF-IDF: {report['exact']['bytes'] / 1024:.0f} KiB, "
+          f"p50 {report['exact']['p50_ms']:.3f} ms, p95 {report['exact']['p95_ms']:.3f} ms")
+    print(f"{'dim':>5} {'var':>6} {'recall@1':>9} {'recall@10':>10} {'agree':>7} {'KiB':>8} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for row in report['lsa']:
+        print(f"{row['dim']:>5} {row['explained_variance']:>6.2f} {row['recall@1']:>9.3f} {row['recall@10']:>10.3f} "
+              f"{row['answer_agreement']:>7.3f} {row['bytes'] / 1024:>8.0f} {row['p50_ms']:>8.3f} "
+              f"{row['p95_ms']:>8.3f} {row['build_s']:>8.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
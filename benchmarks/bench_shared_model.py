@@ -0,0 +1,126 @@
+# Memory of N worker processes holding the model, each loading its own copy from the artifact or all
+# memory-mapping one shared export (see shared_model). The QA corpus can be replicated --scale times to see
+# how memory grows with it. Each worker reports its proportional set size (PSS: shared pages divided among
+# the processes mapping them) and private memory, both measured after loading the model, reading all of X
+# and every answer and answering a few questions, minus the same measure taken after its imports. Linux only (/proc/self/smaps_rollup).
+# Usage: python benchmarks/bench_shared_model.py [--workers 4] [--scale 20] [--json report.json]
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOURCE_FILES = ('intents.json', 'qa_dataset.csv', 'healthcare_info.csv')
+SAMPLE_QUESTIONS = 10
+
+
+# Returns the Pss and private memory of this process in MB
+def memory_mb():
+    values = {}
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {'pss': values['Pss'], 'private': values['Private_Clean'] + values['Private_Dirty']}
+
+
+# Copies the sources into directory, with every general QA pair repeated scale times (each copy numbered,
+# so the rows differ); returns the paths of the copies
+def scaled_sources(directory, scale):
+    for name in SOURCE_FILES:
+        shutil.copy(os.path.join(ROOT, name), directory)
+    with open(os.path.join(ROOT, 'qa_dataset.csv'), newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        rows = list(reader)
+    with open(os.path.join(directory, 'qa_dataset.csv'), 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for copy in range(scale):
+            for row in rows:
+                suffix = f" (copy {copy})" if copy else ''
+                writer.writerow([row[0], row[1] + suffix, row[2] + suffix])
+    return [os.path.join(directory, name) for name in SOURCE_FILES]
+
+
+# Worker: loads the model and touches all of it, as a long-running worker eventually would, waits until
+# every worker has done the same, then reports its memory growth (or the error that stopped it)
+def run_worker(files, artifact_file, shared_dir, barrier, results):
+    try:
+        import intent_recognition as ir
+        before = memory_mb()
+        model = ir.setup_intent_recognition(*files, artifact_file=artifact_file, shared_dir=shared_dir)
+        vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers = model
+        float(X.sum()), sum(map(len, answers)), sum(map(len, healthcare_answers))
+        ir.recognize_intents(list(questions[:SAMPLE_QUESTIONS]), *model)
+        barrier.wait()
+        after = memory_mb()
+        results.put({key: after[key] - before[key] for key in after})
+        barrier.wait()  # Keep the model mapped until every worker has measured
+    except Exception as e:
+        barrier.abort()  # Release the other workers instead of leaving them waiting
+        results.put({'error': repr(e)})
+
+
+# Runs the workers in one mode and returns the total and per-worker memory growth
+def measure(workers, files, artifact_file, shared_dir):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=run_worker, args=(files, artifact_file, shared_dir, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    errors = [report['error'] for report in reports if 'error' in report]
+    if errors:
+        raise RuntimeError(f"Worker failed: {errors[0]}")
+    return {
+        'total_pss_mb': sum(report['pss'] for report in reports),
+        'worker_pss_mb': sum(report['pss'] for report in reports) / workers,
+        'worker_private_mb': sum(report['private'] for report in reports) / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare worker memory with private and shared model copies")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--scale', type=int, default=20, help="Copies of the general QA corpus")
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    import intent_recognition as ir
+    report = {'workers': args.workers, 'scale': args.scale}
+    with tempfile.TemporaryDirectory() as directory:
+        files = scaled_sources(directory, args.scale)
+        artifact_file = os.path.join(directory, 'intent_model.pkl')
+        shared_dir = os.path.join(directory, 'shared_model')
+        # Build the artifact and the export up front, so the workers only load
+        ir.setup_intent_recognition(*files, artifact_file=artifact_file, shared_dir=shared_dir)
+        model = ir.load_model(*files, artifact_file=artifact_file)
+        report['rows'] = model[1].shape[0]
+        report['artifact_mb'] = os.path.getsize(artifact_file) / 2 ** 20
+        for mode, mode_shared_dir in (('private', None), ('shared', shared_dir)):
+            report[mode] = measure(args.workers, files, artifact_file, mode_shared_dir)
+
+    print(f"{report['workers']} workers, {report['rows']} rows, artifact {report['artifact_mb']:.1f} MB")
+    print(f"{'mode':<10}{'total PSS MB':>14}{'PSS/worker MB':>15}{'private/worker MB':>19}")
+    for mode in ('private', 'shared'):
+        result = report[mode]
+        print(f"{mode:<10}{result['total_pss_mb']:>14.1f}{result['worker_pss_mb']:>15.1f}{result['worker_private_mb']:>19.1f}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
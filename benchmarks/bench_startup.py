@@ -0,0 +1,132 @@
+# Startup cost of the chatbot, each measured in fresh interpreters: import times of converse (all the greeting
+# needs) and model_store (the model stack) broken down by package, and the time to the first prompt and to
+# the first answer when the model loads in the background (as main.py does) against loading it first.
+# The model artifact is built beforehand, so the model load is the artifact path of a normal start.
+# Children run with CHATBOT_OFFLINE=1 unless --online, so a missing NLTK download fails instead of waiting.
+# Usage: python benchmarks/bench_startup.py [--repeats 5] [--online] [--json report.json]
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOURCE_FILES = ('intents.json', 'qa_dataset.csv', 'healthcare_info.csv')
+TOP_PACKAGES = 8
+
+# Child script timing one start: greeting, a name turn (no model needed) and a free-text question
+FIRST_TURNS = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import converse
+from healthcare_booking import HealthcareBooking
+
+def load():
+    import model_store
+    return model_store.ModelStore(*{files!r}, artifact_file={artifact!r})
+
+if {eager!r}:
+    converse.setup(load())
+else:
+    converse.setup_in_background(load)
+session = converse.ChatSession(HealthcareBooking({database!r}))
+session.welcome()
+timings = {{'first_prompt': time.perf_counter() - start}}
+session.respond('My name is Ann')
+timings['name_turn'] = time.perf_counter() - start
+try:
+    session.respond('what are your opening hours')
+    timings['first_answer'] = time.perf_counter() - start
+except (LookupError, RuntimeError) as e:  # A failed background load surfaces as RuntimeError
+    timings['error'] = str(e)
+print(json.dumps(timings))
+'''
+
+
+# Runs python with args in a fresh interpreter and returns the finished process
+def run_python(args, env):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+# Imports module with -X importtime; returns its cumulative import time and the self time per top-level package, in ms
+def import_breakdown(module, env):
+    stderr = run_python(['-X', 'importtime', '-c', f"import {module}"], env).stderr
+    total, packages = 0.0, {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace('import time:', '|', 1).split('|'))
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+        if name.strip() == module:
+            total = int(cumulative_us) / 1000
+    return total, dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import times and time to the first prompt")
+    parser.add_argument('--repeats', type=int, default=5, help="Fresh interpreters per measurement (the median is kept)")
+    parser.add_argument('--online', action='store_true', help="Let the children download missing NLTK data")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, CHATBOT_OFFLINE='0' if args.online else '1')
+    results = {}
+    # Modules every interpreter imports before running anything
+    interpreter = []
+    for _ in range(args.repeats):
+        stderr = run_python(['-X', 'importtime', '-c', 'pass'], env).stderr
+        interpreter.append(sum(int(line.split('|')[0].split(':')[1]) for line in stderr.splitlines()
+                               if line.startswith('import time:') and 'cumulative' not in line) / 1000)
+    results['interpreter_imports_ms'] = float(np.median(interpreter))
+
+    for module in ('converse', 'model_store'):
+        runs = [import_breakdown(module, env) for _ in range(args.repeats)]
+        results[f"import_{module}_ms"] = float(np.median([total for total, _ in runs]))
+        results[f"import_{module}_packages_ms"] = dict(list(runs[len(runs) // 2][1].items())[:TOP_PACKAGES])
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in SOURCE_FILES:
+            shutil.copy(os.path.join(ROOT, name), directory)
+        files = tuple(os.path.join(directory, name) for name in SOURCE_FILES)
+        artifact = os.path.join(directory, 'intent_model.pkl')
+        import intent_recognition as ir
+        ir.setup_intent_recognition(*files, artifact_file=artifact)  # Later starts load this artifact
+
+        for mode in ('background', 'eager'):
+            runs = []
+            for repeat in range(args.repeats):
+                script = FIRST_TURNS.format(root=ROOT, files=files, artifact=artifact, eager=mode == 'eager',
+                                            database=os.path.join(directory, f"{mode}_{repeat}.db"))
+                runs.append(json.loads(run_python(['-c', script], env).stdout.strip().splitlines()[-1]))
+            errors = [run['error'] for run in runs if 'error' in run]
+            if errors:
+                results[f"{mode}_error"] = errors[0]
+            for key in ('first_prompt', 'name_turn', 'first_answer'):
+                values = [run[key] for run in runs if key in run]
+                if values:
+                    results[f"{mode}_{key}_ms"] = float(np.median(values)) * 1000
+
+    for metric, value in results.items():
+        if isinstance(value, dict):
+            print(f"{metric}:")
+            for package, milliseconds in value.items():
+                print(f"    {package:<24} {milliseconds:>10.1f}")
+        elif isinstance(value, str):
+            print(f"{metric}: {value}")
+        else:
+            print(f"{metric:<32} {value:>10.1f}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
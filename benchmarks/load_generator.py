@@ -0,0 +1,358 @@
+# Load generator: replays conversation transcripts as many concurrent simulated users against the dialogue
+# engine, either in-process (converse.ChatSession on worker processes) or through chat_server.py, always
+# with a throwaway SQLite database. Reports throughput, the latency distribution of turns and the number of
+# errors and state mismatches, for each level of concurrency given.
+#
+# A transcript is a list of turns {"user": "<input>", "state": "<expected dialogue state or null>",
+# "expect": "<text one of the replies must contain>"}; "state" and "expect" are optional. Inputs may use the
+# placeholders {name}, {date} and {time} (a slot unique to the conversation) and {appointment_id} (the ID of
+# the last appointment booked in the conversation). A conversation stops at its first error or mismatch.
+#
+# Usage: python benchmarks/load_generator.py [--users 1,2,4,8] [--conversations 20] [--mode inprocess|server]
+#        [--server HOST:PORT] [--transcripts file.json] [--save-transcripts file.json] [--output report.json]
+import argparse
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import availability_index
+
+SOURCE_FILES = ('intents.json', 'qa_dataset.csv', 'healthcare_info.csv')
+DEFAULT_CONVERSATIONS = 20  # conversations replayed by each simulated user
+SERVER_START_TIMEOUT = 60.0  # seconds to wait for a spawned chat server to accept connections
+MAX_REPORTED_FAILURES = 5
+APPOINTMENT_ID = re.compile(r"Appointment ID is (\d+)")
+FIRST_NAMES = ['Emily', 'John', 'David', 'Susan', 'Adam', 'Lisa', 'Clara', 'Paul', 'Rachel', 'Henry']
+
+
+# Reads the second column (the question) of a QA CSV
+def read_questions(name):
+    with open(os.path.join(ROOT, name), newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return [row[1] for row in reader]
+
+
+# Returns count seeded synthetic transcripts: a name turn, a booking by menu number, free-text QA,
+# viewing the booking, a question about the professionals and cancelling the booking, in varying order
+def synthetic_transcripts(count, seed):
+    rng = random.Random(seed)
+    questions = read_questions('qa_dataset.csv')
+    healthcare_questions = read_questions('healthcare_info.csv')
+    transcripts = []
+    for _ in range(count):
+        book = [
+            {'user': '1', 'state': 'book_appointment'},
+            {'user': 'General Practitioner', 'state': 'book_appointment'},
+            {'user': '{date}', 'state': 'book_appointment'},
+            {'user': '{time}', 'state': None, 'expect': 'is confirmed'},
+        ]
+        middle = [
+            [{'user': rng.choice(questions)}],
+            [{'user': '2', 'state': 'view_appointments'},
+             {'user': '{appointment_id}', 'state': None, 'expect': 'Appointment ID({appointment_id})'}],
+            [{'user': '4', 'state': 'ask_question'}, {'user': rng.choice(healthcare_questions), 'state': None}],
+        ]
+        rng.shuffle(middle)
+        cancel = [
+            {'user': '3', 'state': 'cancel_appointment'},
+            {'user': '{appointment_id}', 'state': 'cancel_appointment'},
+            {'user': 'yes', 'state': None, 'expect': 'successfully cancelled'},
+        ]
+        turns = [{'user': 'My name is {name}', 'state': None}] + book + [turn for part in middle for turn in part]
+        transcripts.append(turns + cancel + [{'user': 'exit'}])
+    return transcripts
+
+
+# Returns the (date, time) of the index-th slot from tomorrow on, so no two conversations book the same slot
+def slot(index):
+    opening = availability_index.to_minute(availability_index.OPENING_TIME)
+    per_day = (availability_index.to_minute(availability_index.CLOSING_TIME) - opening) // availability_index.SLOT_MINUTES
+    day = datetime.date.today() + datetime.timedelta(days=1 + index // per_day)
+    return day.strftime('%d-%m-%Y'), availability_index.to_time(opening + availability_index.SLOT_MINUTES * (index % per_day))
+
+
+# A simulated user's connection to the dialogue engine in this process
+class InProcessClient:
+    def __init__(self, booking_system):
+        self.booking_system = booking_system
+        self.session = None
+
+    def start(self):
+        import converse
+        self.session = converse.ChatSession(self.booking_system)
+        return self.session.welcome()
+
+    # Returns the replies, the dialogue state after the turn and whether the conversation finished
+    def send(self, text):
+        replies = self.session.respond(text)
+        return replies, self.session.context.state, self.session.finished
+
+    def close(self):
+        pass
+
+
+# A simulated user's connection to a chat server, speaking its line-based JSON protocol
+class ServerClient:
+    def __init__(self, address):
+        self.connection = socket.create_connection(address)
+        self.file = self.connection.makefile('rw', encoding='utf-8')
+        self.session_id = None
+
+    def request(self, request):
+        self.file.write(json.dumps(request) + '\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+    def start(self):
+        response = self.request({})
+        self.session_id = response['session_id']
+        return response['replies']
+
+    def send(self, text):
+        response = self.request({'session_id': self.session_id, 'message': text})
+        return response['replies'], response['state'], response['finished']
+
+    def close(self):
+        self.file.close()
+        self.connection.close()
+
+
+# Replays one transcript; returns its turn latencies in seconds and the failure that stopped it, if any
+def replay(client, transcript, values):
+    latencies = []
+    values = dict(values, appointment_id='')
+    client.start()
+    finished, failure = False, None
+    for number, turn in enumerate(transcript):
+        text = turn['user'].format(**values)
+        start = time.perf_counter()
+        try:
+            replies, state, finished = client.send(text)
+        except Exception as e:
+            return latencies, ('error', number, text, repr(e))
+        latencies.append(time.perf_counter() - start)
+        for reply in replies:
+            match = APPOINTMENT_ID.search(reply)
+            if match:
+                values['appointment_id'] = match.group(1)
+        expect = turn.get('expect')
+        if 'state' in turn and state != turn['state']:
+            failure = ('mismatch', number, text, f"state {state!r}, expected {turn['state']!r}: {replies}")
+        elif expect and not any(expect.format(**values) in reply for reply in replies):
+            failure = ('mismatch', number, text, f"no reply contains {expect.format(**values)!r}: {replies}")
+        if finished or failure:
+            break
+    if not finished:
+        try:
+            client.send('exit')  # Conversations cut short still free their session
+        except Exception as e:
+            failure = failure or ('error', len(transcript), 'exit', repr(e))
+    return latencies, failure
+
+
+# Runs the simulated users of one worker process, each on its own thread, after every worker is ready.
+# Puts (latencies, conversations, failures) on results.
+def run_worker(users, settings, barrier, results):
+    booking_system = None
+    if settings['mode'] == 'inprocess':
+        import converse
+        import model_store
+        from healthcare_booking import HealthcareBooking
+        converse.setup(model_store.ModelStore(*(os.path.join(ROOT, name) for name in SOURCE_FILES),
+                                              artifact_file=settings['artifact_file'],
+                                              shared_dir=settings['shared_dir']))
+        booking_system = HealthcareBooking(settings['db_path'], group_commit=settings['group_commit'])
+        make_client = lambda: InProcessClient(booking_system)
+    else:
+        make_client = lambda: ServerClient(settings['address'])
+
+    transcripts = settings['transcripts']
+    conversations = settings['conversations']
+    latencies, failures = [], []
+    counts = {'conversations': 0}
+    lock = threading.Lock()
+
+    def simulate(user):
+        user_latencies, user_failures = [], []
+        for number in range(conversations):
+            index = user * conversations + number
+            date, slot_time = slot(index)
+            values = {'name': f"{FIRST_NAMES[index % len(FIRST_NAMES)]} User{user}", 'date': date, 'time': slot_time}
+            try:
+                client = make_client()
+            except OSError as e:
+                user_failures.append(('error', None, None, repr(e)))
+                continue
+            try:
+                turn_latencies, failure = replay(client, transcripts[index % len(transcripts)], values)
+            finally:
+                client.close()
+            user_latencies.extend(turn_latencies)
+            if failure:
+                user_failures.append(failure)
+        with lock:
+            latencies.extend(user_latencies)
+            failures.extend(user_failures)
+            counts['conversations'] += conversations
+
+    threads = [threading.Thread(target=simulate, args=(user,)) for user in users]
+    barrier.wait()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if booking_system is not None:
+        booking_system.close()
+    results.put((latencies, counts['conversations'], failures))
+
+
+# Starts chat_server.py on a free port with the given database; returns the process and its address
+def start_server(db_path, workers, group_commit):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, os.path.join(ROOT, 'chat_server.py'), '--db', db_path, '--port', str(port),
+               '--workers', str(workers), '--reload-interval', '0']
+    if group_commit:
+        command.append('--group-commit')
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return server, ('127.0.0.1', port)
+        except OSError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise RuntimeError("The chat server did not start")
+            time.sleep(0.1)
+
+
+# Replays the transcripts with the given number of concurrent users spread over processes, and returns the report
+def run_load(users, processes, settings):
+    context = multiprocessing.get_context('spawn')
+    processes = max(1, min(processes, users))
+    barrier = context.Barrier(processes + 1)
+    results = context.Queue()
+    workers = [context.Process(target=run_worker, args=(list(range(users))[worker::processes], settings, barrier, results))
+               for worker in range(processes)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()  # Every worker has loaded the model; time from here
+    start = time.perf_counter()
+    outcomes = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - start
+    for worker in workers:
+        worker.join()
+
+    latencies = np.array([latency for outcome in outcomes for latency in outcome[0]]) * 1000
+    failures = [failure for outcome in outcomes for failure in outcome[2]]
+    report = {
+        'users': users,
+        'processes': processes,
+        'conversations': sum(outcome[1] for outcome in outcomes),
+        'turns': len(latencies),
+        'seconds': elapsed,
+        'turns_per_s': len(latencies) / elapsed,
+        'errors': sum(1 for failure in failures if failure[0] == 'error'),
+        'state_mismatches': sum(1 for failure in failures if failure[0] == 'mismatch'),
+        'failures': [list(failure) for failure in failures[:MAX_REPORTED_FAILURES]],
+    }
+    if len(latencies):
+        for q in (50, 95, 99):
+            report[f"p{q}_ms"] = float(np.percentile(latencies, q))
+        report['max_ms'] = float(latencies.max())
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay transcripts as concurrent simulated users and measure the dialogue engine")
+    parser.add_argument('--users', default='1,2,4', help="Comma-separated numbers of concurrent users, one run each")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help="Worker processes the users are spread over (at most one per user)")
+    parser.add_argument('--conversations', type=int, default=DEFAULT_CONVERSATIONS, help="Conversations per user")
+    parser.add_argument('--mode', default='inprocess', choices=('inprocess', 'server'))
+    parser.add_argument('--server', help="HOST:PORT of a running chat server (server mode starts one on a temporary database otherwise)")
+    parser.add_argument('--server-workers', type=int, default=os.cpu_count(), help="Worker threads of a started server")
+    parser.add_argument('--group-commit', action='store_true', help="Use group commit for bookings")
+    parser.add_argument('--shared-model', action='store_true',
+                        help="In-process workers memory-map one shared copy of the model instead of loading their own")
+    parser.add_argument('--transcripts', help="JSON file with a list of transcripts to replay instead of synthetic ones")
+    parser.add_argument('--synthetic', type=int, default=50, help="Number of synthetic transcripts")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-transcripts', help="Write the transcripts replayed to this JSON file")
+    parser.add_argument('--output', help="Write the reports to this JSON file")
+    args = parser.parse_args()
+
+    if args.transcripts:
+        with open(args.transcripts) as file:
+            transcripts = json.load(file)
+    else:
+        transcripts = synthetic_transcripts(args.synthetic, args.seed)
+    if args.save_transcripts:
+        with open(args.save_transcripts, 'w') as file:
+            json.dump(transcripts, file, indent=2)
+
+    reports = []
+    with tempfile.TemporaryDirectory() as directory:
+        artifact_file = os.path.join(directory, 'intent_model.pkl')
+        shared_dir = os.path.join(directory, 'shared_model') if args.shared_model else None
+        if args.mode == 'inprocess':
+            import intent_recognition as ir
+            ir.setup_intent_recognition(*(os.path.join(ROOT, name) for name in SOURCE_FILES), artifact_file=artifact_file,
+                                        shared_dir=shared_dir)  # Built (and exported) once; workers load it
+        for run, users in enumerate(int(value) for value in args.users.split(',')):
+            db_path = os.path.join(directory, f"load_{run}.db")  # A fresh database for every run
+            settings = {'mode': args.mode, 'db_path': db_path, 'artifact_file': artifact_file,
+                        'group_commit': args.group_commit, 'shared_dir': shared_dir, 'transcripts': transcripts,
+                        'conversations': args.conversations, 'address': None}
+            server = None
+            if args.mode == 'server':
+                if args.server:
+                    host, port = args.server.rsplit(':', 1)
+                    settings['address'] = (host, int(port))
+                else:
+                    server, settings['address'] = start_server(db_path, args.server_workers, args.group_commit)
+            try:
+                report = run_load(users, args.processes, settings)
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.wait()
+            reports.append(report)
+            print(f"users {users:>4}  processes {report['processes']:>3}  turns {report['turns']:>7}  "
+                  f"{report['turns_per_s']:>9.1f} turns/s  p50 {report.get('p50_ms', 0):>7.2f} ms  "
+                  f"p95 {report.get('p95_ms', 0):>7.2f} ms  p99 {report.get('p99_ms', 0):>7.2f} ms  "
+                  f"errors {report['errors']}  mismatches {report['state_mismatches']}")
+            for failure in report['failures']:
+                print("   ", failure)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'mode': args.mode, 'conversations_per_user': args.conversations, 'runs': reports}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
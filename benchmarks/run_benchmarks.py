@@ -0,0 +1,204 @@
+# Benchmark suite for the chatbot pipeline: model cold start, per-turn latency of converse.get_response and
+# HealthcareBooking throughput against a temporary database. Results are written as JSON and can be compared
+# with a stored baseline; any metric worse than the baseline by more than --tolerance fails the run.
+# Usage: python benchmarks/run_benchmarks.py [--output results.json] [--baseline baseline.json] [--save-baseline baseline.json]
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import converse
+import intent_recognition as ir
+import model_store
+from healthcare_booking import HealthcareBooking
+
+SOURCE_FILES = ('intents.json', 'qa_dataset.csv', 'healthcare_info.csv')
+DEFAULT_TOLERANCE = 0.2  # a metric may be 20% worse than the baseline before it counts as a regression
+# Whether a larger value of a metric is better, by metric-name suffix
+HIGHER_IS_BETTER = ('_per_s',)
+
+
+# Reads the second column (the question) of a QA CSV
+def read_questions(name):
+    with open(os.path.join(ROOT, name), newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return [row[1] for row in reader]
+
+
+# Returns seeded samples of turns per query kind: intent patterns, general QA and healthcare questions
+def build_turns(count, seed):
+    rng = random.Random(seed)
+    with open(os.path.join(ROOT, 'intents.json')) as file:
+        patterns = [pattern for intent in json.load(file)['intents'] for pattern in intent['patterns']]
+    kinds = {'intent': patterns, 'qa': read_questions('qa_dataset.csv'), 'healthcare': read_questions('healthcare_info.csv')}
+    return {kind: [rng.choice(texts) for _ in range(count)] for kind, texts in kinds.items()}
+
+
+# Child script timing one cold start: importing intent_recognition and setting up the model
+COLD_START = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import intent_recognition as ir
+ir.setup_intent_recognition(*{paths!r}, artifact_file={artifact_file!r})
+print(json.dumps(time.perf_counter() - start))
+'''
+
+
+# Times cold starts building from the sources, and loading a saved artifact, in a scratch directory. Each
+# repeat runs in a fresh interpreter, so imports and the lemma cache start cold as they do at a real start.
+def bench_cold_start(repeats):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in SOURCE_FILES:
+            shutil.copy(os.path.join(ROOT, name), directory)
+        paths = [os.path.join(directory, name) for name in SOURCE_FILES]
+        artifact = os.path.join(directory, 'intent_model.pkl')
+        ir.setup_intent_recognition(*paths, artifact_file=artifact)  # Writes the artifact the 'artifact' starts load
+        for label, artifact_file in (('build', None), ('artifact', artifact)):
+            script = COLD_START.format(root=ROOT, paths=paths, artifact_file=artifact_file)
+            timings = []
+            for _ in range(repeats):
+                process = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True,
+                                         check=True)
+                timings.append(json.loads(process.stdout.strip().splitlines()[-1]))
+            results[f"cold_start_{label}_ms"] = float(np.median(timings)) * 1000
+    return results
+
+
+# Times converse.get_response for each kind of turn from a fresh context, with the recognition cache cleared,
+# so every turn pays for the full matching pipeline
+def bench_turns(turns, booking_system):
+    results = {}
+    snapshot = converse.current_snapshot()
+    for kind, texts in turns.items():
+        latencies = []
+        for text in texts:
+            converse.recognition_cache.clear()
+            context = converse.ConversationContext()
+            start = time.perf_counter()
+            converse.get_response(text, context, booking_system, snapshot)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[f"turn_{kind}_p50_ms"] = float(np.percentile(latencies, 50))
+        results[f"turn_{kind}_p95_ms"] = float(np.percentile(latencies, 95))
+        results[f"turn_{kind}_p99_ms"] = float(np.percentile(latencies, 99))
+    return results
+
+
+# Books, views and cancels count appointments in distinct slots; returns operations per second of each
+def bench_booking(count):
+    booking_system = HealthcareBooking(':memory:')
+    try:
+        first_day = datetime.date(2030, 1, 1)
+        slots = [((first_day + datetime.timedelta(days=number // 20)).strftime('%d-%m-%Y'),
+                  f"{8 + number % 20 // 2:02d}:{30 * (number % 2):02d}") for number in range(count)]
+        results = {}
+
+        start = time.perf_counter()
+        ids = [booking_system.book_appointment(number, date, slot_time, 'General Practitioner', 'Dr. Emily Carter')[2]
+               for number, (date, slot_time) in enumerate(slots)]
+        results['book_per_s'] = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for appointment_id in ids:
+            booking_system.get_appointment_by_id(appointment_id)
+        results['view_per_s'] = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for appointment_id in ids:
+            booking_system.cancel_appointment(appointment_id)
+        results['cancel_per_s'] = count / (time.perf_counter() - start)
+        return results
+    finally:
+        booking_system.close()
+
+
+# Describes where the results came from, so runs on different machines or commits are not confused
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+# Compares results with a baseline; returns rows of (metric, baseline, current, relative change, regressed)
+def compare(results, baseline, tolerance):
+    rows = []
+    for metric, current in results.items():
+        previous = baseline.get(metric)
+        if previous is None or previous == 0:
+            continue
+        change = (current - previous) / previous
+        worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+        rows.append((metric, previous, current, change, worse > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot pipeline and compare with a baseline")
+    parser.add_argument('--turns', type=int, default=300, help="Turns timed per query kind")
+    parser.add_argument('--bookings', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=3, help="Cold starts timed per mode (the median is kept)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare with the results in this JSON file")
+    parser.add_argument('--save-baseline', help="Also write the results to this file as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = bench_cold_start(args.repeats)
+    converse.setup(model_store.ModelStore(*(os.path.join(ROOT, name) for name in SOURCE_FILES), artifact_file=None))
+    booking_system = HealthcareBooking(':memory:')
+    try:
+        results.update(bench_turns(build_turns(args.turns, args.seed), booking_system))
+    finally:
+        booking_system.close()
+    results.update(bench_booking(args.bookings))
+
+    report = {
+        'environment': environment(),
+        'settings': {'turns': args.turns, 'bookings': args.bookings, 'repeats': args.repeats, 'seed': args.seed},
+        'results': results,
+    }
+    for metric, value in results.items():
+        print(f"{metric:<28} {value:>12.3f}")
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        rows = compare(results, baseline['results'], args.tolerance)
+        print(f"\nAgainst {args.baseline} ({baseline['environment'].get('commit')}, tolerance {args.tolerance:.0%}):")
+        for metric, previous, current, change, regressed in rows:
+            print(f"{metric:<28} {previous:>12.3f} -> {current:>12.3f} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+        if any(regressed for *_, regressed in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
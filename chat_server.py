@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+import converse
+import intent_recognition as ir
+import metrics
+import model_store
+import session_store
+import text_preprocessing
+import write_queue
+from healthcare_booking import HealthcareBooking
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+SWEEP_INTERVAL = 60.0  # seconds between idle-session sweeps
+
+# Multi-session chat server speaking line-based JSON over TCP (stdlib asyncio only).
+#
+# Each request is one JSON object per line:
+#   {"session_id": "<id>", "message": "<user input>"}
+# "session_id" is optional and defaults to the last session used on the connection. A request without
+# "message" starts a new session and returns the welcome prompt. Each response is one JSON line:
+#   {"session_id": "<id>", "replies": ["..."], "state": "<dialogue state or null>", "finished": false}
+# {"command": "stats"} returns session store statistics and the model version.
+# {"command": "metrics"} returns the latency histograms and counters (see --metrics) as JSON, or with
+# "format": "prometheus" as Prometheus text. --metrics-port also serves them over HTTP at GET /metrics.
+#
+# Sessions idle for longer than session_ttl (or beyond max_sessions) are evicted; with spill_path set
+# they are saved to SQLite and resumed on their next request.
+#
+# The model lives in one ModelStore shared by every session and is swapped atomically when its source
+# files are edited (see --reload-interval); each session has its own ConversationContext
+# and IdentityManager. Turns run on a pool of worker threads so matching and SQLite work never block the event loop.
+class ChatServer:
+    def __init__(self, db_path, session_ttl=session_store.DEFAULT_SESSION_TTL,
+                 max_sessions=session_store.DEFAULT_MAX_SESSIONS, spill_path=None, workers=DEFAULT_WORKERS,
+                 group_commit=False, max_commit_latency=write_queue.DEFAULT_MAX_LATENCY):
+        self.db_path = db_path
+        self.group_commit = group_commit
+        self.max_commit_latency = max_commit_latency
+        # HealthcareBooking gives each worker thread its own connection, so turns can run in parallel
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-worker')
+        self.booking_system = None
+        self.sessions = session_store.SessionStore(
+            restore_session=lambda saved: converse.ChatSession.from_dict(saved, self.booking_system),
+            ttl=session_ttl, max_sessions=max_sessions, spill_path=spill_path)
+        self.session_locks = {}  # session_id -> asyncio.Lock, so one session's turns never interleave
+        self.server = None
+        self.sweeper = None
+
+    # Opens the booking database and starts listening
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        loop = asyncio.get_running_loop()
+        self.booking_system = await loop.run_in_executor(
+            self.executor, lambda: HealthcareBooking(self.db_path, group_commit=self.group_commit,
+                                                     max_commit_latency=self.max_commit_latency))
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        self.sweeper = asyncio.create_task(self.sweep_sessions())
+        return self.server
+
+    # Stops accepting connections and shuts the worker pool down
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+        self.sessions.close()
+
+    # Periodically evicts idle sessions and drops the locks of sessions that are gone
+    async def sweep_sessions(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            self.sessions.evict_expired()
+            for session_id in list(self.session_locks):
+                if session_id not in self.sessions and not self.session_locks[session_id].locked():
+                    del self.session_locks[session_id]
+
+    # Creates a session and returns its id
+    def create_session(self):
+        session_id = uuid4().hex
+        self.sessions.put(session_id, converse.ChatSession(self.booking_system))
+        return session_id
+
+    # Forgets a finished session
+    def end_session(self, session_id):
+        self.sessions.remove(session_id)
+        self.session_locks.pop(session_id, None)
+
+    # Returns session statistics, not counting the objects every session shares, and the model version
+    def stats(self):
+        stats = self.sessions.stats(shared=(self.booking_system,))
+        stats['model_version'] = converse.current_snapshot().version
+        return stats
+
+    # Handles one decoded request and returns the response object
+    async def handle_request(self, request, connection_session_id):
+        if not isinstance(request, dict):
+            return {'error': "Request must be a JSON object"}
+
+        if request.get('command') == 'stats':
+            return {'stats': self.stats()}
+        if request.get('command') == 'metrics':
+            if request.get('format') == 'prometheus':
+                return {'metrics': metrics.registry.to_prometheus()}
+            return {'metrics': metrics.registry.to_dict()}
+
+        message = request.get('message')
+        if message is None:
+            session_id = self.create_session()
+            return {'session_id': session_id, 'replies': [self.sessions.get(session_id).welcome()], 'state': None, 'finished': False}
+        if not isinstance(message, str):
+            return {'error': "'message' must be a string"}
+
+        session_id = request.get('session_id') or connection_session_id
+        if session_id is None:
+            return {'error': "No session: send a request without 'message' to start one"}
+        session = self.sessions.get(session_id)
+        if session is None:
+            return {'error': f"Unknown session: {session_id}"}
+
+        loop = asyncio.get_running_loop()
+        async with self.session_locks.setdefault(session_id, asyncio.Lock()):
+            replies = await loop.run_in_executor(self.executor, session.respond, message)
+        if session.finished:
+            self.end_session(session_id)
+        return {'session_id': session_id, 'replies': replies, 'state': session.context.state, 'finished': session.finished}
+
+    # Serves one TCP connection until the client disconnects
+    async def handle_client(self, reader, writer):
+        connection_session_id = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    response = await self.handle_request(json.loads(line), connection_session_id)
+                except json.JSONDecodeError as e:
+                    response = {'error': f"Invalid JSON: {e}"}
+                except Exception as e:
+                    # A failing turn (e.g. the model could not be loaded) is reported, and the connection kept
+                    print("Request failed:", repr(e))
+                    metrics.increment('request_errors', type(e).__name__)
+                    response = {'error': f"Request failed: {e}"}
+                if 'session_id' in response:
+                    connection_session_id = None if response['finished'] else response['session_id']
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # Answers one HTTP request for the metrics: /metrics in Prometheus text, /metrics.json as JSON
+    async def handle_metrics_request(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():  # Skip the headers
+                pass
+            parts = request_line.decode('latin-1').split()
+            path = parts[1] if len(parts) > 1 else ''
+            if path == '/metrics':
+                status, content_type, body = '200 OK', 'text/plain; version=0.0.4', metrics.registry.to_prometheus()
+            elif path == '/metrics.json':
+                status, content_type, body = '200 OK', 'application/json', metrics.registry.to_json()
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', "Not found\n"
+            body = body.encode('utf-8')
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+# Loads the model once, then serves sessions until interrupted
+async def serve(args):
+    if args.offline:
+        text_preprocessing.OFFLINE = True
+    loop = asyncio.get_running_loop()
+    store = await loop.run_in_executor(
+        None, lambda: model_store.ModelStore(args.intents, args.qa, args.healthcare, backend=args.backend,
+                                             tiered=args.tiered, features=args.features,
+                                             shared_dir=args.shared_model, ingest_workers=args.ingest_workers))
+    converse.setup(store)
+    if args.metrics or args.metrics_port:
+        metrics.enable()
+    if args.reload_interval > 0:
+        store.watch(args.reload_interval)
+
+    chat_server = ChatServer(args.db, session_ttl=args.session_ttl,
+                             max_sessions=args.max_sessions, spill_path=args.session_spill, workers=args.workers,
+                             group_commit=args.group_commit, max_commit_latency=args.max_commit_latency / 1000)
+    server = await chat_server.start(args.host, args.port)
+    print(f"Healthcare chat server listening on {args.host}:{args.port}")
+    metrics_server = None
+    if args.metrics_port:
+        metrics_server = await asyncio.start_server(chat_server.handle_metrics_request, args.host, args.metrics_port)
+        print(f"Metrics served at http://{args.host}:{args.metrics_port}/metrics")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await chat_server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the healthcare chatbot to many concurrent sessions")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--db', default='healthcare_bookings.db')
+    parser.add_argument('--intents', default='intents.json')
+    parser.add_argument('--qa', default='qa_dataset.csv')
+    parser.add_argument('--healthcare', default='healthcare_info.csv')
+    parser.add_argument('--backend', default='exact', choices=ir.MATCHING_BACKENDS)
+    parser.add_argument('--tiered', action='store_true', help="Score intents, healthcare QA and general QA in tiers")
+    parser.add_argument('--features', default='tfidf', choices=ir.FEATURE_MODES,
+                        help="'hashing' keeps vectorizer memory fixed for large corpora")
+    parser.add_argument('--shared-model', metavar='DIR',
+                        help="Memory-map the model from a shared export in DIR, so several server processes share one copy")
+    parser.add_argument('--ingest-workers', type=int,
+                        help="Build the model by streaming the sources through this many preprocessing processes")
+    parser.add_argument('--reload-interval', type=float, default=model_store.DEFAULT_RELOAD_INTERVAL,
+                        help="Seconds between checks for edited intents/QA files (0 disables hot reload)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Worker threads running turns")
+    parser.add_argument('--session-ttl', type=float, default=session_store.DEFAULT_SESSION_TTL,
+                        help="Seconds of inactivity before a session is evicted")
+    parser.add_argument('--max-sessions', type=int, default=session_store.DEFAULT_MAX_SESSIONS)
+    parser.add_argument('--session-spill', help="SQLite file to save evicted sessions to, so they can be resumed")
+    parser.add_argument('--group-commit', action='store_true',
+                        help="Commit bookings and cancellations from many sessions together")
+    parser.add_argument('--max-commit-latency', type=float, default=write_queue.DEFAULT_MAX_LATENCY * 1000,
+                        help="Milliseconds a booking may wait to share a group commit")
+    parser.add_argument('--offline', action='store_true',
+                        help="Never download NLTK data; fail if it is missing (as CHATBOT_OFFLINE=1 does)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Record per-stage latency histograms and intent/state counters")
+    parser.add_argument('--metrics-port', type=int,
+                        help="Serve the metrics over HTTP on this port (implies --metrics)")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
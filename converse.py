@@ -1,13 +1,17 @@
-import json
 import random
-import intent_recognition as ir
+import threading
+import identity_management as idm
 from healthcare_booking import HealthcareBooking
+from response_cache import ResponseCache
+import metrics
 import re
 import datetime
 from uuid import uuid4
 
 # Class to manage conversation context, holding the state and data of the conversation
 class ConversationContext:
+    __slots__ = ('state', 'data')  # No per-instance __dict__, since the server keeps one context per session
+
     def __init__(self):
         self.state = None
         self.data = {}
@@ -36,53 +40,75 @@ class ConversationContext:
         # Restore the retained data back into the context
         self.data.update(retained_data)
 
-# Loads response templates from the intents JSON file
-def load_responses(intents_file):
-    with open(intents_file) as file:
-        intents_data = json.load(file)
-        responses = {intent['tag']: intent['responses'] for intent in intents_data['intents']}
-    return responses
-
-# Global variables to store the components for intent recognition
-vectorizer = None
-X = None
-labels = None
-questions = None
-answers = None
-healthcare_questions = None  
-healthcare_answers = None    
-
-# Setup function to initialize global variables for intent recognition
-def setup(vect, mat, lbls, qsts, answs, hc_qsts, hc_answs):
-    global vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers
-    vectorizer = vect
-    X = mat
-    labels = lbls
-    questions = qsts
-    answers = answs
-    healthcare_questions = hc_qsts  
-    healthcare_answers = hc_answs
-
-responses = load_responses('intents.json')
-
-# Processes user input and generates a response based on the current context and booking system
-
-def get_response(user_input, context, booking_system, intents):
-    global vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers
+# ModelStore holding the current model snapshot (model, intents, responses, professional directory)
+model_store = None
+# Thread creating the model store, when it is loaded in the background (see setup_in_background),
+# and the exception that stopped it, if any
+model_loader = None
+model_load_error = None
+
+# Cache of recognition results for frequent utterances, keyed on the preprocessed input
+recognition_cache = ResponseCache()
+
+# Setup function to point the conversation logic at the model store every turn reads from
+def setup(store):
+    global model_store
+    model_store = store
+    recognition_cache.clear()
+
+# Creates the model store on a background thread and sets it up once it is ready, so the first prompt is
+# shown without waiting for the model (and scikit-learn, NumPy and NLTK) to load. Turns that need the model
+# wait for it; the name, menu and booking turns do not.
+def setup_in_background(create_store):
+    global model_loader, model_load_error
+    model_load_error = None
+
+    # Kept for current_snapshot to re-raise, so turns see why the model is missing
+    def load():
+        global model_load_error
+        try:
+            setup(create_store())
+        except Exception as e:
+            model_load_error = e
+
+    model_loader = threading.Thread(target=load, name='model-loader', daemon=True)
+    model_loader.start()
+    return model_loader
 
+# Returns the model snapshot new turns should use, waiting for a background load to finish
+def current_snapshot():
+    if model_store is None and model_loader is not None:
+        model_loader.join()
+    if model_store is None:
+        if model_load_error is not None:
+            raise RuntimeError(f"Loading the model failed: {model_load_error}") from model_load_error
+        raise RuntimeError("No model loaded: call converse.setup (or setup_in_background) first")
+    return model_store.snapshot
+
+# Recognizes the user's intent, serving repeated utterances from the cache.
+# The cache is tied to the snapshot's version, so it empties itself when the model is reloaded.
+@metrics.timed('recognition_seconds')
+def recognize_intent_cached(user_input, snapshot):
+    import intent_recognition as ir  # Already loaded along with the snapshot; kept out of this module's import
+    with metrics.timer('recognition_stage_seconds', 'preprocess'):
+        key = ir.preprocess_text(user_input)
+    result = recognition_cache.get(key, version=snapshot.version)
+    if result is None:
+        # The key is the preprocessed input, so a miss goes straight to matching
+        result = ir.recognize_preprocessed(key, *snapshot.model())
+        recognition_cache.put(key, result, version=snapshot.version)
+    return result
+
+# Processes user input and generates a response based on the current context and booking system.
+# Everything model-related comes from one snapshot, the current one unless the caller passes its own.
+def get_response(user_input, context, booking_system, snapshot=None):
     # Handle user input based on current conversation state
     if context.state is None:
+        # Only turns that need the model take a snapshot, and each takes one, even if a reload swaps in another
+        snapshot = snapshot or current_snapshot()
         # Recognize the type and specific tag of the user's intent
-        intent_type, response_tag = ir.recognize_intent(
-            user_input, 
-            vectorizer, 
-            X, 
-            labels, 
-            questions, 
-            answers, 
-            healthcare_questions, 
-            healthcare_answers
-        )
+        intent_type, response_tag = recognize_intent_cached(user_input, snapshot)
+        metrics.increment('recognized_intents', response_tag if intent_type == 'intent' else intent_type)
         
         if intent_type == 'intent':
             # Respond based on the recognized intent tag
@@ -90,7 +116,7 @@ def get_response(user_input, context, booking_system, intents):
                 user_name = context.get_data('user_name')
                 if user_name:
                     # Fetch the response templates for the 'name_query' intent
-                    response_templates = next((item['responses'] for item in intents if item['tag'] == 'name_query'), [])
+                    response_templates = snapshot.responses.get('name_query', [])
                     # Choose a random response template
                     response_template = random.choice(response_templates) if response_templates else "I'm not sure of your name yet."
                     # Replace the placeholder with the actual user name
@@ -114,12 +140,9 @@ def get_response(user_input, context, booking_system, intents):
                 context.set_state('ask_question')
                 return "Please ask a question about our healthcare professionals.", None
             else:
-                return random.choice(responses.get(response_tag, ["I'm not sure how to respond to that, could you rephrase that?"])), None
+                return random.choice(snapshot.responses.get(response_tag, ["I'm not sure how to respond to that, could you rephrase that?"])), None
         elif intent_type == 'qa':
-            if response_tag in healthcare_answers:
-                return response_tag, None
-            else:
-                return response_tag, None
+            return response_tag, None
         elif intent_type == 'unknown':
             return "I'm sorry, I didn't understand that. Could you rephrase or ask something else?", None
     # Handling responses based on the current state of the conversation  
@@ -136,14 +159,15 @@ def get_response(user_input, context, booking_system, intents):
                 return "Please ask a question about our healthcare professionals.", None
 
         # Handle state-based response for non-empty input
-        state_response = handle_state_based_response(user_input, context, booking_system)
+        state_response = handle_state_based_response(user_input, context, booking_system, snapshot)
         if state_response is not None:
             return state_response
         else:
             return "I'm sorry, something went wrong. Could you try again?", None
 
 # Handles user input based on the current state in a state-based conversation
-def handle_state_based_response(user_input, context, booking_system):
+@metrics.timed('dialogue_state_seconds', label=lambda user_input, context, *args: context.state)
+def handle_state_based_response(user_input, context, booking_system, snapshot=None):
     # View appointments state: handle requests to view appointment details
     if context.state == 'view_appointments':
         appointment_id = user_input.strip()  # Assuming the user inputs the appointment ID
@@ -212,7 +236,7 @@ def handle_state_based_response(user_input, context, booking_system):
 
     # Ask question about healthcare professionals
     if context.state == 'ask_question':
-        answer = handle_healthcare_question(user_input)
+        answer = handle_healthcare_question(user_input, snapshot)
         context.set_state(None)
         return answer, None
 
@@ -261,15 +285,136 @@ def handle_state_based_response(user_input, context, booking_system):
                         context.update_data('user_id', user_id)
                         return response_message, None
                     else:
-                        return message, None
+                        # Let the user pick another time, offering the nearest free slots straight away
+                        context.data.pop('appointment_time', None)
+                        alternatives = booking_system.suggest_slots(context.get_data('appointment_date'), appointment_time.strftime('%H:%M'))
+                        if alternatives:
+                            return f"{message}. The nearest free times that day are {', '.join(alternatives)}. Please enter another time (in HH:MM format).", None
+                        return f"{message}. Please enter another time (in HH:MM format).", None
                 except ValueError:
                     return "Sorry, that's an invalid time format. Please enter the time in HH:MM format.", None
             else:
                 return "Sorry, that's an invalid time format. Please enter the time in HH:MM format.", None
 
 # Function to handle questions about healthcare professionals based on the CSV file
-def handle_healthcare_question(question):
-    # A function to search the healthcare information and return a relevant answer
-    # Placeholder response, should be replaced with logic to parse the CSV and answer questions accordingly
-    return "I'm not sure about that yet, but I'm learning more about our healthcare professionals every day."
+def handle_healthcare_question(question, snapshot=None):
+    # Routes the question to the professionals it names (or whose specialty it mentions) and answers
+    # from the healthcare information, see professional_directory
+    answer = (snapshot or current_snapshot()).directory.answer(question)
+    if answer is None:
+        return "I'm not sure about that yet, but I'm learning more about our healthcare professionals every day."
+    return answer
+
+# Returns a time-based greeting based on the current hour
+def get_time_based_greeting():
+    current_hour = datetime.datetime.now().hour
+    if 5 <= current_hour < 12:
+        return "Good morning"
+    elif 12 <= current_hour < 17:
+        return "Good afternoon"
+    else:
+        return "Good evening"
+
+MENU_OPTIONS = {
+    "1": "book_appointment",
+    "2": "view_appointments",
+    "3": "cancel_appointment",
+    "4": "ask_question",
+}
+EXIT_COMMANDS = ('quit', 'exit')
+ANYTHING_ELSE_PROMPT = "Is there anything else I can help with, or would you like to type 'exit' to leave?"
+GOODBYE_MESSAGE = "Goodbye! Take care of your health."
+
+# One user's conversation: holds the context and identity state and turns each input into the bot's replies.
+# This is the turn-by-turn form of the dialogue flow, shared by the REPL in main.py and the chat server.
+class ChatSession:
+    __slots__ = ('booking_system', 'identity_manager', 'context', 'user_greeted', 'in_transaction', 'finished')
+
+    def __init__(self, booking_system, identity_manager=None):
+        self.booking_system = booking_system
+        self.identity_manager = identity_manager or idm.IdentityManager()
+        self.context = ConversationContext()
+        self.user_greeted = False  # Flag to check if user has been greeted
+        self.in_transaction = False  # Set while a view/cancel dialogue is collecting its answers
+        self.finished = False
+
+    # Returns the per-user state as plain JSON-serializable data, so the session can be stored and resumed
+    def to_dict(self):
+        return {
+            'state': self.context.state,
+            'data': dict(self.context.data),
+            'user_data': dict(self.identity_manager.user_data),
+            'user_greeted': self.user_greeted,
+            'in_transaction': self.in_transaction,
+            'finished': self.finished,
+        }
+
+    # Rebuilds a session saved with to_dict
+    @classmethod
+    def from_dict(cls, saved, booking_system):
+        identity_manager = idm.IdentityManager()
+        for user_id, user_name in saved.get('user_data', {}).items():
+            identity_manager.add_user(user_id, user_name)
+        session = cls(booking_system, identity_manager)
+        session.context.state = saved.get('state')
+        session.context.data.update(saved.get('data', {}))
+        session.user_greeted = saved.get('user_greeted', False)
+        session.in_transaction = saved.get('in_transaction', False)
+        session.finished = saved.get('finished', False)
+        return session
+
+    # Returns the opening message of the conversation
+    def welcome(self):
+        return f"{get_time_based_greeting()}, welcome to Nottingham Healthcare Services. Firstly, could I take your name?"
+
+    # Handles one line of user input and returns the list of replies to show
+    @metrics.timed('turn_seconds')
+    def respond(self, user_input):
+        user_input = user_input.strip()
+        context = self.context
+        metrics.increment('conversation_turns', context.state or 'idle')
+
+        # Handle exit commands
+        if user_input.lower() in EXIT_COMMANDS:
+            self.finished = True
+            return [GOODBYE_MESSAGE]
+
+        # Continue a transactional dialogue (view/cancel) until its state is cleared
+        if self.in_transaction:
+            result = handle_state_based_response(user_input, context, self.booking_system)
+            response = result[0] if result else "I'm sorry, something went wrong. Could you try again?"
+            if context.state:
+                return [response]
+            self.in_transaction = False
+            context.reset(keys_to_retain=['user_name'])
+            return [response, ANYTHING_ELSE_PROMPT]
+
+        # Greet user and extract name only once per session
+        if not self.user_greeted and not context.data.get('user_id'):
+            user_id = self.identity_manager.extract_name(user_input)
+            if user_id:
+                user_name = self.identity_manager.get_user_name(user_id)
+                context.update_data('user_id', user_id)
+                context.update_data('user_name', user_name)
+                self.user_greeted = True
+                return [f"Greetings, {user_name}! I'm here to assist with your healthcare needs. You can ask me any questions or choose from the options below:\n"
+                        "  1. Book an Appointment\n"
+                        "  2. View Appointments\n"
+                        "  3. Cancel an Appointment\n"
+                        "  4. Ask a question about our healthcare professionals\n"
+                        "Just type the number of the option you'd like to select."]
+
+        # Menu selection based on user input
+        if context.state is None and user_input in MENU_OPTIONS:
+            context.set_state(MENU_OPTIONS[user_input])
+            response, context_state = get_response("", context, self.booking_system)
+        else:
+            response, context_state = get_response(user_input, context, self.booking_system)
 
+        # A returned context state starts a transactional dialogue; the response is its first prompt
+        if context_state:
+            self.in_transaction = True
+            return [response]
+        if not context.state:
+            return [response, ANYTHING_ELSE_PROMPT]
+        return [response]
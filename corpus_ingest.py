@@ -0,0 +1,242 @@
+import csv
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+
+import hashing_vectorizer
+import text_preprocessing
+
+# Rows read, preprocessed and counted together; also the unit of work handed to a pool worker
+DEFAULT_CHUNK_SIZE = 10000
+# Chunks in flight per worker, bounding how much raw text is held while the workers are busy
+CHUNKS_PER_WORKER = 2
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+
+# Yields the (questions, answers) columns of a QA csv file chunk_size rows at a time
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # Skip header row
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                break
+            yield [row[1] for row in rows], [row[2] for row in rows]
+
+
+# Yields the (patterns, tags) of the intents file chunk_size patterns at a time
+def read_intent_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(path) as file:
+        intents = json.load(file)['intents']
+    pairs = ((pattern, intent['tag']) for intent in intents for pattern in intent['patterns'])
+    while True:
+        chunk = list(itertools.islice(pairs, chunk_size))
+        if not chunk:
+            break
+        yield [pattern for pattern, _ in chunk], [tag for _, tag in chunk]
+
+
+# Counts the n-grams of preprocessed texts the way the chosen vectorizer will: for 'tfidf' one
+# {term: count} dict per text, in the order the terms first occur (the order TfidfVectorizer assigns
+# vocabulary ids in), for 'hashing' the hashed count rows. Stateless, so every worker has its own.
+class ChunkCounter:
+    def __init__(self, features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES):
+        self.features = features
+        if features == 'tfidf':
+            self.analyze = TfidfVectorizer(ngram_range=(1, 2)).build_analyzer()
+        else:
+            self.hasher = hashing_vectorizer.HashingTfidfVectorizer(n_features=n_features, ngram_range=(1, 2)).hasher
+
+    def count(self, texts):
+        if self.features != 'tfidf':
+            return self.hasher.transform(texts)
+        term_counts = []
+        for text in texts:
+            counts = {}
+            for term in self.analyze(text):
+                counts[term] = counts.get(term, 0) + 1
+            term_counts.append(counts)
+        return term_counts
+
+
+# Preprocesses a chunk of raw texts and counts its n-grams; returns (preprocessed texts, counts)
+def process_chunk(texts, counter):
+    preprocessed = text_preprocessing.preprocess_texts(texts)
+    return preprocessed, counter.count(preprocessed)
+
+
+# Counter of the current pool worker, set by init_worker
+worker_counter = None
+
+# Pool initializer: spawned workers start from a fresh interpreter, so they get the parent's
+# preprocessing configuration and offline mode explicitly
+def init_worker(tokenizer, cache_size, offline, features, n_features):
+    global worker_counter
+    text_preprocessing.OFFLINE = offline
+    text_preprocessing.configure_preprocessing(tokenizer=tokenizer, cache_size=cache_size)
+    worker_counter = ChunkCounter(features, n_features)
+
+# Runs process_chunk in a pool worker
+def process_worker_chunk(texts):
+    return process_chunk(texts, worker_counter)
+
+
+# Preprocesses and counts (texts, payload) chunks, yielding (preprocessed, counts, payload) in input
+# order. With workers > 1 the chunks are spread over a process pool, with at most CHUNKS_PER_WORKER
+# chunks per worker in flight, so reading never runs further ahead of the slowest chunk than that.
+def process_chunks(chunks, features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES, workers=1):
+    if workers <= 1:
+        counter = ChunkCounter(features, n_features)
+        for texts, payload in chunks:
+            yield (*process_chunk(texts, counter), payload)
+        return
+
+    preprocessor = text_preprocessing.default_preprocessor
+    # spawn rather than fork: the caller may have threads (e.g. a background model load)
+    context = multiprocessing.get_context('spawn')
+    initargs = (preprocessor.tokenizer, preprocessor.cache_size, text_preprocessing.OFFLINE, features, n_features)
+    with context.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        pending = deque()
+        for texts, payload in chunks:
+            pending.append((pool.apply_async(process_worker_chunk, (texts,)), payload))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                result, payload = pending.popleft()
+                yield (*result.get(), payload)
+        while pending:
+            result, payload = pending.popleft()
+            yield (*result.get(), payload)
+
+
+# Fits a vectorizer from counted chunks fed in row order, producing the same vectorizer and X as
+# fit_transform over all the texts at once. Only the count rows are kept between chunks: TF-IDF weights
+# depend on the document frequencies of the whole corpus, so rows are weighted once the last chunk is in.
+class StreamingVectorizer:
+    def __init__(self, features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES):
+        self.features = features
+        self.rows = 0
+        self.chunks = []
+        if features == 'tfidf':
+            self.vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+            self.vocabulary = {}
+        else:
+            self.vectorizer = hashing_vectorizer.HashingTfidfVectorizer(n_features=n_features, ngram_range=(1, 2))
+
+    # Adds the counts of the next chunk of rows, as ChunkCounter.count returns them
+    def add(self, counts):
+        if self.features != 'tfidf':
+            self.vectorizer.fold_counts(counts)
+            self.chunks.append(counts)
+            self.rows += counts.shape[0]
+            return
+
+        # Same id assignment as CountVectorizer: new terms get the next id as they are first seen
+        vocabulary = self.vocabulary
+        indices, values, indptr = [], [], [0]
+        for term_counts in counts:
+            for term, count in term_counts.items():
+                index = vocabulary.get(term)
+                if index is None:
+                    index = vocabulary[term] = len(vocabulary)
+                indices.append(index)
+                values.append(count)
+            indptr.append(len(indices))
+        chunk = sp.csr_matrix((np.array(values, dtype=np.intc), np.array(indices, dtype=np.int32), indptr),
+                              shape=(len(counts), len(vocabulary)))
+        chunk.sort_indices()
+        self.chunks.append(chunk)
+        self.rows += len(counts)
+
+    # Weighs the collected rows; returns the fitted vectorizer and X
+    def finish(self):
+        chunks, self.chunks = self.chunks, []
+        if self.features != 'tfidf':
+            return self.vectorizer, self.vectorizer.weigh(sp.vstack(chunks, format='csr'))
+
+        vocabulary = self.vocabulary
+        if not vocabulary:
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        nnz = sum(chunk.nnz for chunk in chunks)
+        index_dtype = np.int32 if nnz <= np.iinfo(np.int32).max else np.int64
+        indptr = np.zeros(self.rows + 1, dtype=index_dtype)
+        np.cumsum(np.concatenate([np.diff(chunk.indptr) for chunk in chunks]), out=indptr[1:])
+        indices = np.concatenate([chunk.indices for chunk in chunks]).astype(index_dtype, copy=False)
+        values = np.concatenate([chunk.data for chunk in chunks]).astype(np.float64)
+        del chunks
+
+        # Renumber the terms in sorted order, as CountVectorizer does after counting (rows keep their order)
+        map_index = np.empty(len(vocabulary), dtype=index_dtype)
+        for new_index, (term, old_index) in enumerate(sorted(vocabulary.items())):
+            vocabulary[term] = new_index
+            map_index[old_index] = new_index
+        counts = sp.csr_matrix((values, map_index.take(indices, mode='clip'), indptr),
+                               shape=(self.rows, len(vocabulary)), copy=False)
+
+        vectorizer = self.vectorizer
+        vectorizer.vocabulary_ = vocabulary
+        vectorizer.build_analyzer()  # Validates the parameters as fitting does
+        transformer = TfidfTransformer(norm=vectorizer.norm, use_idf=vectorizer.use_idf,
+                                       smooth_idf=vectorizer.smooth_idf, sublinear_tf=vectorizer.sublinear_tf)
+        transformer.fit(counts)
+        vectorizer.idf_ = transformer.idf_
+        return vectorizer, transformer.transform(counts, copy=False)
+
+
+# Prints the rows ingested so far and the rate to stderr, at most once per interval and once at the end
+class ProgressPrinter:
+    def __init__(self, interval=PROGRESS_INTERVAL, stream=None):
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.last = None
+
+    def __call__(self, rows, elapsed, done=False):
+        if not done and self.last is not None and elapsed - self.last < self.interval:
+            return
+        self.last = elapsed
+        rate = rows / elapsed if elapsed else 0.0
+        status = 'ingested' if done else 'ingesting'
+        print(f"{status}: {rows} rows in {elapsed:.1f}s ({rate:.0f} rows/s)", file=self.stream, flush=True)
+
+
+# Builds the model tuple of intent_recognition.build_model by streaming the sources in chunks: rows are
+# read, preprocessed (across a pool of workers when workers > 1) and counted chunk by chunk, so the raw
+# corpus is never held in memory at once. Rows keep the serial order (intent patterns, general QA,
+# healthcare QA), so the model is the same as the serial one. progress, if given, is called as
+# progress(rows, elapsed_seconds, done) after every chunk.
+def build_model(intents_file, qa_file, healthcare_file, features='tfidf',
+                n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES, workers=1, chunk_size=DEFAULT_CHUNK_SIZE,
+                progress=None):
+    sources = (
+        ('intents', read_intent_chunks(intents_file, chunk_size)),
+        ('qa', read_chunks(qa_file, chunk_size)),
+        ('healthcare', read_chunks(healthcare_file, chunk_size)),
+    )
+    chunks = ((texts, (source, extra)) for source, reader in sources for texts, extra in reader)
+    # source -> (preprocessed texts, labels or answers)
+    columns = {source: ([], []) for source, _ in sources}
+    streaming = StreamingVectorizer(features, n_features)
+
+    start = time.perf_counter()
+    for preprocessed, counts, (source, extra) in process_chunks(chunks, features, n_features, workers):
+        texts, others = columns[source]
+        texts.extend(preprocessed)
+        others.extend(extra)
+        streaming.add(counts)
+        if progress:
+            progress(streaming.rows, time.perf_counter() - start, False)
+    vectorizer, X = streaming.finish()
+    if progress:
+        progress(streaming.rows, time.perf_counter() - start, True)
+
+    _, labels = columns['intents']
+    questions, answers = columns['qa']
+    healthcare_questions, healthcare_answers = columns['healthcare']
+    return vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers
@@ -0,0 +1,97 @@
+import datetime
+import sqlite3
+
+# Formats used for appointments: what users type and see, and the sortable slot stored alongside it
+DATE_FORMAT = '%d-%m-%Y'
+TIME_FORMAT = '%H:%M'
+SLOT_FORMAT = '%Y-%m-%dT%H:%M'  # ISO-8601, so string order is chronological order
+
+# Registered migrations as (version, description, apply) tuples, in version order
+MIGRATIONS = []
+
+# Registers a schema migration; versions must be unique and increasing
+def migration(version, description):
+    def register(apply):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} must come after migration {MIGRATIONS[-1][0]}")
+        MIGRATIONS.append((version, description, apply))
+        return apply
+    return register
+
+# Converts a user-facing date (DD-MM-YYYY) and time (HH:MM) to the stored ISO-8601 slot
+def to_slot(date, time):
+    return datetime.datetime.strptime(f"{date} {time}", f"{DATE_FORMAT} {TIME_FORMAT}").strftime(SLOT_FORMAT)
+
+# Converts a stored slot back to the user-facing (date, time) pair
+def from_slot(slot):
+    value = datetime.datetime.strptime(slot, SLOT_FORMAT)
+    return value.strftime(DATE_FORMAT), value.strftime(TIME_FORMAT)
+
+# Returns the schema version recorded in the database
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# Applies every migration newer than the database's version, each in its own transaction.
+# The version is re-read under the write lock, so concurrent processes never apply a migration twice.
+def apply_migrations(conn):
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+@migration(1, "unique (date, time) slot index")
+def add_slot_uniqueness(conn):
+    try:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_slot ON appointments (date, time)")
+    except sqlite3.IntegrityError as e:
+        print("Database error: existing appointments share a slot, so slot uniqueness is not enforced:", e)
+
+
+@migration(2, "sortable ISO-8601 slot column with (slot) and (user_id, slot) indexes")
+def add_sortable_slot(conn):
+    conn.execute("ALTER TABLE appointments ADD COLUMN slot TEXT")
+    # DD-MM-YYYY + HH:MM -> YYYY-MM-DDTHH:MM; rows in any other format keep a NULL slot
+    conn.execute('''
+        UPDATE appointments
+        SET slot = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2) || 'T' || time
+        WHERE date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]' AND time GLOB '[0-9][0-9]:[0-9][0-9]'
+    ''')
+    # The slot index replaces the (date, time) one for uniqueness and serves range scans
+    try:
+        conn.execute("CREATE UNIQUE INDEX idx_appointments_slot_time ON appointments (slot)")
+    except sqlite3.IntegrityError as e:
+        print("Database error: existing appointments share a slot, so slot uniqueness is not enforced:", e)
+        conn.execute("CREATE INDEX idx_appointments_slot_time ON appointments (slot)")
+    conn.execute("CREATE INDEX idx_appointments_user_slot ON appointments (user_id, slot)")
+    conn.execute("DROP INDEX IF EXISTS idx_appointments_slot")
+
+
+@migration(3, "zero-pad unpadded legacy dates and times and backfill their slots")
+def pad_legacy_slots(conn):
+    # Rows like '1-1-2031' / '9:5' got a NULL slot from migration 2, so the unique index never saw them
+    taken = {slot for slot, in conn.execute("SELECT slot FROM appointments WHERE slot IS NOT NULL")}
+    updates = []
+    for appointment_id, date, time in conn.execute("SELECT id, date, time FROM appointments WHERE slot IS NULL").fetchall():
+        try:
+            slot = to_slot(date, time)
+        except (TypeError, ValueError):
+            continue  # Not a date and time at all; left as it is
+        if slot in taken:
+            continue  # Another appointment holds the slot; left unslotted rather than merged
+        taken.add(slot)
+        updates.append((*from_slot(slot), slot, appointment_id))
+    conn.executemany("UPDATE appointments SET date = ?, time = ?, slot = ? WHERE id = ?", updates)
@@ -0,0 +1,58 @@
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+DEFAULT_HASH_FEATURES = 2 ** 18
+
+
+# TF-IDF over hashed n-gram features: a drop-in for TfidfVectorizer whose memory is fixed by n_features
+# instead of growing with a vocabulary dict of every n-gram seen. Document frequencies and IDF weights are
+# flat NumPy arrays, and partial_fit folds more documents into them without a refit. IDF is smoothed and
+# rows are L2-normalized exactly as TfidfVectorizer does, so scores are comparable; the only difference
+# is that n-grams hashing to the same feature share a weight.
+class HashingTfidfVectorizer:
+    def __init__(self, n_features=DEFAULT_HASH_FEATURES, ngram_range=(1, 2)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.hasher = HashingVectorizer(n_features=n_features, ngram_range=ngram_range, alternate_sign=False,
+                                        norm=None, dtype=np.float32)
+        self.document_counts = np.zeros(n_features, dtype=np.int32)
+        self.n_documents = 0
+        self.idf_ = None
+
+    # Learns IDF weights from texts, forgetting any earlier ones
+    def fit(self, texts):
+        self.document_counts[:] = 0
+        self.n_documents = 0
+        return self.partial_fit(texts)
+
+    # Adds texts to the document frequencies and updates the IDF weights
+    def partial_fit(self, texts):
+        return self.fold_counts(self.hasher.transform(texts))
+
+    # Adds rows of hashed term counts (as self.hasher returns them) to the document frequencies
+    def fold_counts(self, counts):
+        self.document_counts += np.bincount(counts.indices, minlength=self.n_features).astype(np.int32)
+        self.n_documents += counts.shape[0]
+        self.idf_ = (np.log((1 + self.n_documents) / (1 + self.document_counts)) + 1).astype(np.float32)
+        return self
+
+    # Returns the L2-normalized TF-IDF rows for texts
+    def transform(self, texts):
+        return self.weigh(self.hasher.transform(texts))
+
+    # Turns rows of hashed term counts into L2-normalized TF-IDF rows, in place
+    def weigh(self, counts):
+        counts.data *= self.idf_[counts.indices]
+        return normalize(counts, copy=False)
+
+    def fit_transform(self, texts):
+        return self.fit(texts).transform(texts)
+
+    # The tokenizer and n-gram generator, as TfidfVectorizer.build_analyzer
+    def build_analyzer(self):
+        return self.hasher.build_analyzer()
+
+    # Memory held by the fitted state
+    def nbytes(self):
+        return self.document_counts.nbytes + (self.idf_.nbytes if self.idf_ is not None else 0)
@@ -1,13 +1,99 @@
 import sqlite3
+import csv
 import datetime
+import os
+import tempfile
+import threading
+import db_migrations
+from availability_index import AvailabilityIndex, DEFAULT_SUGGESTIONS
+import write_queue
+import metrics
+
+# Connection tuning: WAL lets readers run alongside a writer, NORMAL sync is durable in WAL mode without
+# an fsync per commit, and writers wait for the lock instead of failing with "database is locked"
+BUSY_TIMEOUT_MS = 5000
+JOURNAL_MODE = 'WAL'
+SYNCHRONOUS = 'NORMAL'
+# Prepared statements kept per connection; queries below use fixed SQL text so they are reused
+STATEMENT_CACHE_SIZE = 128
+
+# Bulk import/export: columns read from each imported row (CSV header names), rows per transaction,
+# and the most slots looked up in one IN (...) query (below SQLite's default host parameter limit)
+IMPORT_COLUMNS = ('user_id', 'date', 'time', 'service_type', 'professional_name')
+EXPORT_COLUMNS = ('id',) + IMPORT_COLUMNS
+DEFAULT_BATCH_SIZE = 1000
+SLOT_LOOKUP_CHUNK = 500
 
 class HealthcareBooking:
-    # Constructor to initialize the healthcare booking system with a database connection
-    def __init__(self, db_path):
+    # Results returned when a booking or cancellation could not be written
+    BOOKING_FAILED = (False, "Sorry, we failed to make an appointment", None)
+    CANCEL_FAILED = (False, "Your appointment has not been cancelled.")
+
+    # Constructor to initialize the healthcare booking system with a database connection.
+    # Every thread gets its own connection (see conn), so one instance can be shared by worker threads.
+    # With group_commit, bookings and cancellations go through a WriteQueue that commits operations from
+    # many threads together, adding at most max_commit_latency seconds to each.
+    def __init__(self, db_path, group_commit=False, max_commit_batch=write_queue.DEFAULT_MAX_BATCH,
+                 max_commit_latency=write_queue.DEFAULT_MAX_LATENCY):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
-        self.cursor = self.conn.cursor()
+        self.local = threading.local()
+        self.connections = []  # Every connection opened, so close() can release them all
+        self.connections_lock = threading.Lock()
+        self.database_file = db_path
+        self.temporary_file = None
+        if db_path == ':memory:':
+            # A :memory: database is private to one connection, so threads could not share it;
+            # use a throwaway file instead, removed again by close()
+            fd, self.temporary_file = tempfile.mkstemp(prefix='healthcare-', suffix='.db')
+            os.close(fd)
+            self.database_file = self.temporary_file
         self.setup_database()
+        self.write_queue = None
+        if group_commit:
+            self.write_queue = write_queue.WriteQueue(self, max_commit_batch, max_commit_latency)
+
+    # Opens a new tuned connection
+    def connect(self):
+        conn = sqlite3.connect(self.database_file, timeout=BUSY_TIMEOUT_MS / 1000,
+                               cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+        with self.connections_lock:
+            self.connections.append(conn)
+        return conn
+
+    # The calling thread's connection, opened on first use
+    @property
+    def conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+        return conn
+
+    # The calling thread's cursor
+    @property
+    def cursor(self):
+        cursor = getattr(self.local, 'cursor', None)
+        if cursor is None:
+            cursor = self.local.cursor = self.conn.cursor()
+        return cursor
+
+    # Closes every connection opened by any thread
+    def close(self):
+        if getattr(self, 'write_queue', None) is not None:
+            self.write_queue.close()
+            self.write_queue = None
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        self.local = threading.local()
+        if self.temporary_file is not None:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.temporary_file + suffix):
+                    os.remove(self.temporary_file + suffix)
+            self.temporary_file = None
 
     # Setup database with appointments and users tables if they do not exist
     def setup_database(self):
@@ -30,43 +116,206 @@ class HealthcareBooking:
             )
         ''')
         self.conn.commit()
+        # Bring the schema up to date: the unique, sortable slot column and its indexes come from here.
+        # One appointment per slot: the unique index makes reservation a single atomic insert
+        # and turns availability checks and date ranges into index lookups.
+        db_migrations.apply_migrations(self.conn)
+
+        # In-memory view of booked times, used for O(1) availability checks and slot suggestions
+        self.availability = AvailabilityIndex()
+        self.availability.load(self.cursor.execute("SELECT date, time, service_type FROM appointments").fetchall())
 
     # Method to add a user to the database
+    @metrics.timed('db_query_seconds', 'add_user')
     def add_user(self, name, phone_number):
         self.cursor.execute("INSERT INTO users (name, phone_number) VALUES (?, ?)", (name, phone_number))
         self.conn.commit()
 
     # Method to check the availability of an appointment slot
+    @metrics.timed('db_query_seconds', 'check_availability')
     def check_availability(self, date, time, excluding_appointment_id=None):
         # Check if there's any existing appointment at the given date and time, excluding a specific appointment if provided
-        query = "SELECT * FROM appointments WHERE date = ? AND time = ?"
-        params = [date, time]
+        query = "SELECT 1 FROM appointments WHERE slot = ?"
+        params = [db_migrations.to_slot(date, time)]
         if excluding_appointment_id:
             query += " AND id != ?"
             params.append(excluding_appointment_id)
         
-        self.cursor.execute(query, params)
+        self.cursor.execute(query + " LIMIT 1", params)
         appointment = self.cursor.fetchone()
         return appointment is None
 
-    # Method to make an appointment
+    # Method to check a slot against the in-memory availability index, without a database query
+    def is_slot_free(self, date, time):
+        return self.availability.is_free(*self.index_key(date, time))
+
+    # Method to suggest the nearest free slots to a requested date and time, without a database query
+    def suggest_slots(self, date, time, count=DEFAULT_SUGGESTIONS):
+        return self.availability.nearest_free(*self.index_key(date, time), count)
+
+    # Returns the zero-padded (date, time) the availability index is keyed on; input that is not a valid
+    # date and time is passed through unchanged, as the index never holds it
+    def index_key(self, date, time):
+        try:
+            return db_migrations.from_slot(db_migrations.to_slot(date, time))
+        except ValueError:
+            return date, time
+
+    # Method to make an appointment. The slot is reserved by a single INSERT OR IGNORE against the unique
+    # slot index, so concurrent sessions can never both book it; an ignored insert means the slot is taken.
+    # date and time are in the user-facing DD-MM-YYYY and HH:MM formats.
+    @metrics.timed('db_query_seconds', 'book_appointment')
     def book_appointment(self, user_id, date, time, service_type, professional_name):
-        if self.check_availability(date, time):
+        if self.write_queue is not None:
+            return self.write_queue.book(user_id, date, time, service_type, professional_name).result()
+        try:
+            result, change = self.reserve_slot(user_id, date, time, service_type, professional_name)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print("Database error:", e)
+            metrics.increment('db_errors', 'book_appointment')
+            self.conn.rollback()
+            return self.BOOKING_FAILED
+        if change is not None:
+            change()
+        return result
+
+    # Method to insert an appointment without committing. Returns book_appointment's result and a callable
+    # that updates the availability index, to be called once the insert is committed (None if nothing to do).
+    def reserve_slot(self, user_id, date, time, service_type, professional_name):
+        try:
+            slot = db_migrations.to_slot(date, time)
+        except ValueError as e:
+            print("Invalid appointment date or time:", e)
+            return self.BOOKING_FAILED, None
+        # Store and index the zero-padded form ('1-1-2031' -> '01-01-2031'), which is what the slot encodes
+        date, time = db_migrations.from_slot(slot)
+
+        cursor = self.cursor
+        cursor.execute(
+            "INSERT OR IGNORE INTO appointments (user_id, date, time, service_type, professional_name, slot) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, date, time, service_type, professional_name, slot)
+        )
+        if cursor.rowcount != 1:
+            # Taken, possibly by another process: record it for the day only, since the service holding it is unknown
+            return (False, "No available slots for the requested time", None), lambda: self.availability.add(date, time)
+        appointment_id = cursor.lastrowid
+        change = lambda: self.availability.add(date, time, service_type)
+        return (True, f"Your appointment with {professional_name} for {service_type} on {date} at {time} is confirmed. Appointment ID is {appointment_id}.", appointment_id), change
+
+    # Method to import many appointments at once. rows is any iterable of dicts keyed by IMPORT_COLUMNS
+    # (e.g. a csv.DictReader) or of tuples in that order, consumed as a stream. Each batch is one
+    # transaction: rows with missing or extra fields, or whose slot is malformed, already booked or repeated
+    # in the import are reported and skipped, and the rest go in with a single executemany.
+    # Returns (number imported, [(row number, reason), ...]) with row numbers counted from 1.
+    @metrics.timed('db_query_seconds', 'import_appointments')
+    def import_appointments(self, rows, batch_size=DEFAULT_BATCH_SIZE):
+        imported = 0
+        conflicts = []
+        batch = []
+        for number, row in enumerate(rows, 1):
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                imported += self._import_batch(batch, conflicts)
+                batch = []
+        if batch:
+            imported += self._import_batch(batch, conflicts)
+        conflicts.sort()
+        return imported, conflicts
+
+    # Method to import appointments from a CSV file (a path or an open file) with an IMPORT_COLUMNS header
+    def import_appointments_csv(self, file, batch_size=DEFAULT_BATCH_SIZE):
+        if isinstance(file, str):
+            with open(file, newline='', encoding='utf-8') as handle:
+                return self.import_appointments(csv.DictReader(handle), batch_size)
+        return self.import_appointments(csv.DictReader(file), batch_size)
+
+    # Inserts one import batch in its own transaction, appending any conflicts; returns the rows inserted
+    def _import_batch(self, batch, conflicts):
+        values = []
+        for number, row in batch:
             try:
-                self.cursor.execute(
-                    "INSERT INTO appointments (user_id, date, time, service_type, professional_name) VALUES (?, ?, ?, ?, ?)",
-                    (user_id, date, time, service_type, professional_name)
-                )
-                self.conn.commit()
-                appointment_id = self.cursor.lastrowid
-                return True, f"Your appointment with {professional_name} for {service_type} on {date} at {time} is confirmed. Appointment ID is {appointment_id}.", appointment_id
-            except sqlite3.Error as e:
-                print("Database error:", e)
-                return False, "Sorry, we failed to make an appointment", None
-        else:
-            return False, "No available slots for the requested time", None
+                if isinstance(row, dict):
+                    # csv.DictReader fills missing fields with None and collects extra ones under the None key
+                    if None in row or any(row.get(column) is None for column in IMPORT_COLUMNS):
+                        raise ValueError("wrong number of fields")
+                    row = tuple(row[column] for column in IMPORT_COLUMNS)
+                user_id, date, time, service_type, professional_name = row
+            except (TypeError, ValueError):
+                conflicts.append((number, "malformed row"))
+                continue
+            try:
+                slot = db_migrations.to_slot(date, time)
+            except (TypeError, ValueError):
+                conflicts.append((number, "invalid date or time"))
+                continue
+            date, time = db_migrations.from_slot(slot)  # Stored and indexed zero-padded, as reserve_slot does
+            values.append((number, (user_id, date, time, service_type, professional_name, slot)))
+
+        try:
+            # Take the write lock first, so no other writer can book a slot between the check and the insert
+            self.conn.execute("BEGIN IMMEDIATE")
+            booked = set()
+            slots = [value[5] for _, value in values]
+            for start in range(0, len(slots), SLOT_LOOKUP_CHUNK):
+                chunk = slots[start:start + SLOT_LOOKUP_CHUNK]
+                query = f"SELECT slot FROM appointments WHERE slot IN ({', '.join('?' * len(chunk))})"
+                booked.update(slot for slot, in self.cursor.execute(query, chunk))
+
+            accepted = []
+            for number, value in values:
+                if value[5] in booked:
+                    conflicts.append((number, "slot already booked"))
+                    continue
+                booked.add(value[5])  # Later rows in the import for the same slot conflict with this one
+                accepted.append(value)
+
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO appointments (user_id, date, time, service_type, professional_name, slot) VALUES (?, ?, ?, ?, ?, ?)",
+                accepted
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print("Database error:", e)
+            metrics.increment('db_errors', 'import_appointments')
+            self.conn.rollback()
+            conflicts.extend((number, f"database error: {e}") for number, _ in values)
+            return 0
+
+        for user_id, date, time, service_type, professional_name, slot in accepted:
+            self.availability.add(date, time, service_type)
+        return len(accepted)
+
+    # Method to export every appointment as a stream of EXPORT_COLUMNS tuples, in id order,
+    # fetching batch_size rows at a time
+    def export_appointments(self, batch_size=DEFAULT_BATCH_SIZE):
+        cursor = self.conn.cursor()  # Own cursor, so other calls on this thread don't disturb the stream
+        try:
+            cursor.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM appointments ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    # Method to export every appointment to a CSV file (a path or an open file); returns the rows written
+    @metrics.timed('db_query_seconds', 'export_appointments_csv')
+    def export_appointments_csv(self, file, batch_size=DEFAULT_BATCH_SIZE):
+        if isinstance(file, str):
+            with open(file, 'w', newline='', encoding='utf-8') as handle:
+                return self.export_appointments_csv(handle, batch_size)
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_COLUMNS)
+        count = 0
+        for row in self.export_appointments(batch_size):
+            writer.writerow(row)
+            count += 1
+        return count
 
     # Method to get appointment details by ID
+    @metrics.timed('db_query_seconds', 'get_appointment_by_id')
     def get_appointment_by_id(self, appointment_id):
         try:
             self.cursor.execute("SELECT * FROM appointments WHERE id = ?", (appointment_id,))
@@ -77,33 +326,65 @@ class HealthcareBooking:
                 return None
         except sqlite3.Error as e:
             print("Database error:", e)
+            metrics.increment('db_errors', 'get_appointment_by_id')
             return None
 
     # Method to check if an appointment exists
+    @metrics.timed('db_query_seconds', 'appointment_exists')
     def appointment_exists(self, appointment_id):
         try:
             self.cursor.execute("SELECT * FROM appointments WHERE id = ?", (appointment_id,))
             return self.cursor.fetchone() is not None
         except sqlite3.Error as e:
             print("Database error:", e)
+            metrics.increment('db_errors', 'appointment_exists')
             return False
 
     # Method to cancel an appointment
+    @metrics.timed('db_query_seconds', 'cancel_appointment')
     def cancel_appointment(self, appointment_id):
+        if self.write_queue is not None:
+            return self.write_queue.cancel(appointment_id).result()
         try:
-            self.cursor.execute("SELECT * FROM appointments WHERE id = ?", (appointment_id,))
-            appointment = self.cursor.fetchone()
-            if not appointment:
-                return False, "Appointment not found"
-
-            self.cursor.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
+            result, change = self.delete_appointment(appointment_id)
             self.conn.commit()
-            return True, "Your appointment has been successfully cancelled."
         except sqlite3.Error as e:
             print("Database error:", e)
-            return False, "Your appointment has not been cancelled."
+            metrics.increment('db_errors', 'cancel_appointment')
+            self.conn.rollback()
+            return self.CANCEL_FAILED
+        if change is not None:
+            change()
+        return result
+
+    # Method to delete an appointment without committing. Returns cancel_appointment's result and a callable
+    # that frees the slot in the availability index once the delete is committed (None if nothing to do).
+    def delete_appointment(self, appointment_id):
+        self.cursor.execute("SELECT date, time, service_type FROM appointments WHERE id = ?", (appointment_id,))
+        appointment = self.cursor.fetchone()
+        if not appointment:
+            return (False, "Appointment not found"), None
+
+        self.cursor.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
+        return (True, "Your appointment has been successfully cancelled."), lambda: self.free_slot(*appointment)
+
+    # Marks a cancelled appointment's time as free in the availability index, unless other appointments
+    # still hold it (duplicates survive on databases where the unique slot index could not be created)
+    def free_slot(self, date, time, service_type):
+        try:
+            still_booked = [service for service, in self.cursor.execute(
+                "SELECT service_type FROM appointments WHERE date = ? AND time = ?", (date, time)).fetchall()]
+        except sqlite3.Error as e:
+            print("Database error:", e)
+            metrics.increment('db_errors', 'free_slot')
+            return  # Leave the time marked booked; the database still refuses a double booking
+        try:
+            self.availability.remove(date, time, service_type, still_booked)
+        except (AttributeError, ValueError):
+            pass  # Legacy row with a malformed time, never indexed
 
     # Method to list all appointments for a given user
+    @metrics.timed('db_query_seconds', 'list_appointments')
     def list_appointments(self, user_id):
         try:
             self.cursor.execute("SELECT * FROM appointments WHERE user_id = ?", (user_id,))
@@ -111,8 +392,40 @@ class HealthcareBooking:
             return True, appointments
         except sqlite3.Error as e:
             print("Database error:", e)
+            metrics.increment('db_errors', 'list_appointments')
+            return False, []
+
+    # Method to list all appointments from start_date to end_date inclusive (DD-MM-YYYY), in time order,
+    # using a range scan over the slot index
+    @metrics.timed('db_query_seconds', 'list_appointments_between')
+    def list_appointments_between(self, start_date, end_date):
+        try:
+            start = db_migrations.to_slot(start_date, '00:00')
+            end = (datetime.datetime.strptime(end_date, db_migrations.DATE_FORMAT) + datetime.timedelta(days=1)).strftime(db_migrations.SLOT_FORMAT)
+        except ValueError as e:
+            print("Invalid date:", e)
+            return False, []
+        try:
+            self.cursor.execute("SELECT * FROM appointments WHERE slot >= ? AND slot < ? ORDER BY slot", (start, end))
+            return True, self.cursor.fetchall()
+        except sqlite3.Error as e:
+            print("Database error:", e)
+            metrics.increment('db_errors', 'list_appointments_between')
+            return False, []
+
+    # Method to list a user's appointments from now on, in time order, using the (user_id, slot) index
+    @metrics.timed('db_query_seconds', 'list_upcoming_appointments')
+    def list_upcoming_appointments(self, user_id, now=None):
+        now = (now or datetime.datetime.now()).strftime(db_migrations.SLOT_FORMAT)
+        try:
+            self.cursor.execute("SELECT * FROM appointments WHERE user_id = ? AND slot >= ? ORDER BY slot", (user_id, now))
+            return True, self.cursor.fetchall()
+        except sqlite3.Error as e:
+            print("Database error:", e)
+            metrics.increment('db_errors', 'list_upcoming_appointments')
             return False, []
 
-    # Destructor to close the database connection when the object is destroyed
+    # Destructor to close the database connections when the object is destroyed
     def __del__(self):
-        self.conn.close()
+        if hasattr(self, 'connections_lock'):
+            self.close()
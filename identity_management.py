@@ -1,127 +1,85 @@
-import json
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.stem import WordNetLemmatizer
-import csv
 import re
+from collections import OrderedDict
 from uuid import uuid4
 
-# nltk downloads
-nltk.download('punkt')
-nltk.download('wordnet')
-
-# Preprocesses text by tokenization, lemmatization, and removing non-alphabetic characters
-def preprocess_text(text):
-    lemmatizer = WordNetLemmatizer()
-    tokens = nltk.word_tokenize(text.lower())
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token.isalpha()]
-    return ' '.join(tokens)
-
-# Loads and returns intents, questions, and answers from given files
-def load_data(intents_file, qa_file, healthcare_file):
-    with open(intents_file) as file:
-        intents = json.load(file)['intents']
-
-    questions, answers = [], []
-    # Load general QA data
-    with open(qa_file, newline='', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        next(reader, None)  # Skip header row
-        for row in reader:
-            questions.append(row[1])
-            answers.append(row[2])
-
-    # Load healthcare-specific questions and answers
-    healthcare_questions, healthcare_answers = [], []
-    with open(healthcare_file, newline='', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        next(reader, None)  # Skip header row
-        for row in reader:
-            question = row[1]
-            answer = row[2]
-            healthcare_questions.append(question)
-            healthcare_answers.append(answer)
-
-    return intents, questions, answers, healthcare_questions, healthcare_answers
-
-# Vectorizes text data and returns vectorizer, matrix X, and labels for intent recognition
-def vectorize_data(intents, questions):
-    vectorizer = TfidfVectorizer(ngram_range=(1, 2))  # Using bigrams in addition to unigrams
-    labels, patterns = [], []
-
-    for intent in intents:
-        for pattern in intent['patterns']:
-            labels.append(intent['tag'])
-            patterns.append(preprocess_text(pattern))
-
-    all_texts = patterns + questions
-    X = vectorizer.fit_transform(all_texts)
-
-    return vectorizer, X, labels
-
-# Define similarity thresholds for intent recognition and question-answering
-INTENT_SIMILARITY_THRESHOLD = 0.3  # Adjusted threshold for intents
-QA_SIMILARITY_THRESHOLD = 0.15     # Threshold for QA pairs
-
-# Recognizes intent or answers a question based on input text, using cosine similarity
-def recognize_intent(input_text, vectorizer, X, labels, questions, answers):
-    input_vec = vectorizer.transform([preprocess_text(input_text)])
-    similarities = cosine_similarity(input_vec, X).flatten()
-    best_match = np.argmax(similarities)
-    best_similarity = similarities[best_match]
-
-    if best_match < len(labels):
-        if best_similarity < INTENT_SIMILARITY_THRESHOLD:
-            return 'unknown', None
-        return 'intent', labels[best_match]
+# Phrases a user introduces themselves with, in priority order: the first phrase found anywhere in the
+# text wins, and a bare name is only accepted when no phrase is present
+NAME_PATTERNS = [
+    r"My name is ([\w\s]+)",
+    r"I am ([\w\s]+)",
+    r"Call me ([\w\s]+)",
+    r"You can call me ([\w\s]+)",
+    r"My name's ([\w\s]+)",
+    r"I'm ([\w\s]+)",
+    r"^([\w\s]+)$"
+]
+
+# Turns one name pattern into an alternative of NAME_EXTRACTOR: a pattern anchored with ^ must match at the
+# start of the text, any other lazily skips ahead to its phrase; its name group gets a unique name
+def name_alternative(index, pattern):
+    if pattern.startswith('^'):
+        prefix, pattern = '', pattern[1:]
     else:
-        if best_similarity < QA_SIMILARITY_THRESHOLD:
-            return 'unknown', None
-        return 'qa', answers[best_match - len(labels)]
+        prefix = '.*?'
+    return f"(?:{prefix}{pattern.replace('(', f'(?P<name{index}>', 1)})"
 
-# Sets up intent recognition by loading data and vectorizing text
-def setup_intent_recognition(intents_file, qa_file, healthcare_file):
-    intents, questions, answers, healthcare_questions, healthcare_answers = load_data(intents_file, qa_file, healthcare_file)
-    vectorizer, X, labels = vectorize_data(intents, questions + healthcare_questions)
-    return vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers
+# All patterns compiled once into a single alternation matched at the start of the text. Alternatives are
+# tried in order, so the result is the same as trying every pattern with re.search in turn; the name is in
+# the one named group that took part in the match.
+NAME_EXTRACTOR = re.compile(
+    '|'.join(name_alternative(index, pattern) for index, pattern in enumerate(NAME_PATTERNS)),
+    re.IGNORECASE | re.DOTALL
+)
+
+DEFAULT_MAX_USERS = 100000  # Least recently used identities beyond this are forgotten
 
 # Class to manage user identities
 class IdentityManager:
-    # Initializes the IdentityManager with an empty dictionary for user data
-    def __init__(self):
-        self.user_data = {}
+    # Initializes the IdentityManager with empty user data (user ID -> name, least recently used first)
+    # and its reverse index (name -> user IDs, in registration order)
+    def __init__(self, max_users=DEFAULT_MAX_USERS):
+        self.max_users = max_users
+        self.user_data = OrderedDict()
+        self.user_ids = {}
 
     # Extracts a name from the input text and assigns a UUID to the extracted name
     def extract_name(self, text):
-        patterns = [
-            r"My name is ([\w\s]+)",
-            r"I am ([\w\s]+)",
-            r"Call me ([\w\s]+)",
-            r"You can call me ([\w\s]+)",
-            r"My name's ([\w\s]+)",
-            r"I'm ([\w\s]+)",
-            r"^([\w\s]+)$"
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                user_name = ' '.join(part.capitalize() for part in match.group(1).split())
-                user_id = str(uuid4())
-                self.user_data[user_id] = user_name
-                return user_id
+        match = NAME_EXTRACTOR.match(text)
+        if match:
+            user_name = ' '.join(part.capitalize() for part in match.group(match.lastgroup).split())
+            user_id = str(uuid4())
+            self.add_user(user_id, user_name)
+            return user_id
 
         return None
 
+    # Registers a user ID and name, evicting the least recently used identities beyond max_users
+    def add_user(self, user_id, user_name):
+        if user_id in self.user_data:
+            self.remove_user(user_id)
+        self.user_data[user_id] = user_name
+        self.user_ids.setdefault(user_name, {})[user_id] = None
+        while len(self.user_data) > self.max_users:
+            self.remove_user(next(iter(self.user_data)))
+
+    # Forgets a user ID
+    def remove_user(self, user_id):
+        user_name = self.user_data.pop(user_id, None)
+        ids = self.user_ids.get(user_name)
+        if ids is not None:
+            ids.pop(user_id, None)
+            if not ids:
+                del self.user_ids[user_name]
+
     # Retrieves the user's name from the stored user data using their unique ID
     def get_user_name(self, user_id):
-        return self.user_data.get(user_id, None)
+        user_name = self.user_data.get(user_id, None)
+        if user_name is not None:
+            self.user_data.move_to_end(user_id)
+        return user_name
 
     # Retrieves the user's unique ID from the stored user data using their name
+    # (the earliest registered one, if several users share the name)
     def get_user_id(self, user_name):
-        for id, name in self.user_data.items():
-            if name == user_name:
-                return id
-        return None
+        ids = self.user_ids.get(user_name)
+        return next(iter(ids)) if ids else None
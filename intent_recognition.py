@@ -1,24 +1,31 @@
 import json
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.stem import WordNetLemmatizer
 import csv
+import hashlib
+import os
+import pickle
+import threading
+import time
+import text_preprocessing
+import retrieval_index
+import lsa_index
+import hashing_vectorizer
+import metrics
+import shared_model
+import corpus_ingest
 
-# nltk downloads
-nltk.download('punkt')
-nltk.download('wordnet')
 
 # Preprocesses text by tokenization, lemmatization, and removing non-alphabetic characters
 def preprocess_text(text):
-    lemmatizer = WordNetLemmatizer()
-    tokens = nltk.word_tokenize(text.lower())
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token.isalpha()]
-    return ' '.join(tokens)
+    return text_preprocessing.preprocess_text(text)
 
-# Loads and returns intents, questions, and answers from given files
-def load_data(intents_file, qa_file, healthcare_file):
+# Preprocesses a whole list of texts through the shared, memoized preprocessor
+def preprocess_texts(texts):
+    return text_preprocessing.preprocess_texts(texts)
+
+# Reads and returns intents, questions, and answers from given files, with the questions as written
+def read_data(intents_file, qa_file, healthcare_file):
     with open(intents_file) as file:
         intents = json.load(file)['intents']
 
@@ -28,7 +35,7 @@ def load_data(intents_file, qa_file, healthcare_file):
         reader = csv.reader(file)
         next(reader, None)  # Skip header row
         for row in reader:
-            questions.append(preprocess_text(row[1]))
+            questions.append(row[1])
             answers.append(row[2])
 
     # Load healthcare-specific questions and answers
@@ -37,22 +44,39 @@ def load_data(intents_file, qa_file, healthcare_file):
         reader = csv.reader(file)
         next(reader, None)  # Skip header row
         for row in reader:
-            question = preprocess_text(row[1])
-            answer = row[2]
-            healthcare_questions.append(question)
-            healthcare_answers.append(answer)
+            healthcare_questions.append(row[1])
+            healthcare_answers.append(row[2])
+
+    return intents, questions, answers, healthcare_questions, healthcare_answers
+
+# Loads and returns intents, questions, and answers from given files, with the questions preprocessed
+def load_data(intents_file, qa_file, healthcare_file):
+    intents, questions, answers, healthcare_questions, healthcare_answers = read_data(intents_file, qa_file, healthcare_file)
+
+    questions = preprocess_texts(questions)
+    healthcare_questions = preprocess_texts(healthcare_questions)
 
     return intents, questions, answers, healthcare_questions, healthcare_answers
 
+# Feature modes: 'tfidf' learns a vocabulary of every unigram and bigram, 'hashing' hashes them into
+# a fixed number of features (see hashing_vectorizer)
+FEATURE_MODES = ('tfidf', 'hashing')
+
 # Vectorizes text data and returns vectorizer, matrix X, and labels for intent recognition
-def vectorize_data(intents, questions):
-    vectorizer = TfidfVectorizer(ngram_range=(1, 2))  # Using bigrams in addition to unigrams
+def vectorize_data(intents, questions, features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES):
+    if features == 'tfidf':
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2))  # Using bigrams in addition to unigrams
+    elif features == 'hashing':
+        vectorizer = hashing_vectorizer.HashingTfidfVectorizer(n_features=n_features, ngram_range=(1, 2))
+    else:
+        raise ValueError(f"Unknown feature mode: {features!r} (expected one of {FEATURE_MODES})")
     labels, patterns = [], []
 
     for intent in intents:
         for pattern in intent['patterns']:
             labels.append(intent['tag'])
-            patterns.append(preprocess_text(pattern))
+            patterns.append(pattern)
+    patterns = preprocess_texts(patterns)
 
 #model is then trained on model and questions with fit_transform
 
@@ -65,37 +89,373 @@ def vectorize_data(intents, questions):
 INTENT_SIMILARITY_THRESHOLD = 0.25  # Adjusted threshold for intents to be more inclusive
 QA_SIMILARITY_THRESHOLD = 0.2       # Threshold for QA pairs
 
-# Recognizes intent or answers a question based on input text, using cosine similarity
-def recognize_intent(input_text, vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers):
-    preprocessed_input = preprocess_text(input_text)
-    input_vec = vectorizer.transform([preprocessed_input])
-    # calculates the similarity betqeen user input and whateevr is in X
-    similarities = cosine_similarity(input_vec, X).flatten()
-    best_match = np.argmax(similarities)
-    best_similarity = similarities[best_match]
-
+# Maps a matched row of X to ('intent', tag), ('qa', answer) or ('unknown', None) using the thresholds
+def classify_match(best_match, best_similarity, labels, questions, answers, healthcare_answers):
     num_labels = len(labels)
     num_questions = len(questions)
 
     # Prioritize intents over QA pairs when they are above the similarity threshold
-    if best_match < num_labels and best_similarity >= INTENT_SIMILARITY_THRESHOLD:
-        return 'intent', labels[best_match]
+    if best_match < num_labels:
+        if best_similarity >= INTENT_SIMILARITY_THRESHOLD:
+            return 'intent', labels[best_match]
+        return 'unknown', None
 
     # Otherwise, handle QA pairs
-    if best_match < num_labels + num_questions:
-        # It's a general QA match
-        if best_similarity >= QA_SIMILARITY_THRESHOLD:
+    if best_similarity >= QA_SIMILARITY_THRESHOLD:
+        if best_match < num_labels + num_questions:
+            # It's a general QA match
             return 'qa', answers[best_match - num_labels]
-    else:
         # It's a healthcare QA match
-        if best_similarity >= QA_SIMILARITY_THRESHOLD:
-            return 'qa', healthcare_answers[best_match - num_labels - num_questions]
+        return 'qa', healthcare_answers[best_match - num_labels - num_questions]
 
     # If no suitable match is found
     return 'unknown', None
 
-# Sets up intent recognition by loading data and vectorizing text
-def setup_intent_recognition(intents_file, qa_file, healthcare_file):
+# Returns the indices of the k highest scores, best first; ties go to the lower index like np.argmax
+def top_k_indices(scores, k):
+    if k == 1:
+        return np.array([np.argmax(scores)])
+    k = min(k, scores.size)
+    kth_score = np.partition(scores, scores.size - k)[scores.size - k]
+    above = np.flatnonzero(scores > kth_score)
+    ties = np.flatnonzero(scores == kth_score)[:k - above.size]
+    candidates = np.concatenate([above, ties])
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+# Finds the top_k rows of X for each input vector, returning a list of (indices, scores) pairs.
+# X is either the TF-IDF matrix itself, scored with one sparse product (rows of X and the transformed
+# inputs are already L2-normalized, so the dot product is the cosine similarity), or a matching index
+# built over it, such as retrieval_index.InvertedIndex, which exposes the same top_k interface.
+def score_vectors(input_vecs, X, top_k=1):
+    if hasattr(X, 'top_k'):
+        return X.top_k(input_vecs, top_k)
+
+    similarities = (input_vecs @ X.T).toarray()
+    matches = []
+    for scores in similarities:
+        indices = top_k_indices(scores, top_k)
+        matches.append((indices, scores[indices]))
+    return matches
+
+# Vectorizes preprocessed inputs and finds the top_k rows of X for each of them
+def match_inputs(preprocessed_inputs, vectorizer, X, top_k=1):
+    return score_vectors(vectorizer.transform(preprocessed_inputs), X, top_k)
+
+# Row ranges of X scored by the tiered matcher, in priority order
+MATCHING_TIERS = ('intents', 'healthcare', 'general')
+
+# Scores the rows of X in tiers (intent patterns, then healthcare QA, then general QA) and stops at the
+# first tier whose best match clears its threshold, so menu-style turns never touch the QA corpus.
+# Each tier can use any matching backend. Passed in place of X, like the other matching indexes.
+# Concurrent turns (e.g. the chat server's executor threads) share one index, so its timings are updated under a lock.
+class TieredIndex:
+    def __init__(self, X, num_labels, num_questions, backend='exact', n_components=None):
+        self.matrix = X
+        self.shape = X.shape
+        num_rows = X.shape[0]
+        row_ranges = {
+            'intents': (0, num_labels),
+            'healthcare': (num_labels + num_questions, num_rows),
+            'general': (num_labels, num_labels + num_questions),
+        }
+        thresholds = {
+            'intents': INTENT_SIMILARITY_THRESHOLD,
+            'healthcare': QA_SIMILARITY_THRESHOLD,
+            'general': QA_SIMILARITY_THRESHOLD,
+        }
+
+        self.tiers = []
+        for name in MATCHING_TIERS:
+            start, end = row_ranges[name]
+            if start == end:
+                continue
+            options = {'n_components': n_components} if n_components else {}
+            searcher = build_matching_index(X[start:end], backend, **options)
+            self.tiers.append((name, start, searcher, thresholds[name]))
+        self.timings = {name: {'queries': 0, 'hits': 0, 'seconds': 0.0} for name, _, _, _ in self.tiers}
+        self.timings_lock = threading.Lock()
+
+    # Pickled without its lock, since the lsa backend caches tiered indexes as artifacts
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['timings_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.timings_lock = threading.Lock()
+
+    # Returns a list of (rows, scores) pairs. Each input gets the top_k of the first confident tier; if no
+    # tier is confident, it gets the best rows over all tiers, which fall below the thresholds.
+    def top_k(self, input_vecs, k=1):
+        k = min(k, self.shape[0])
+        results = [None] * input_vecs.shape[0]
+        fallback = [[] for _ in results]
+        pending = np.arange(input_vecs.shape[0])
+        for name, first_row, searcher, threshold in self.tiers:
+            if pending.size == 0:
+                break
+            start = time.perf_counter()
+            matches = score_vectors(input_vecs[pending], searcher, k)
+            seconds = time.perf_counter() - start
+
+            still_pending = []
+            for position, (indices, scores) in zip(pending, matches):
+                indices = indices + first_row
+                if scores[0] >= threshold:
+                    results[position] = (indices, scores)
+                else:
+                    fallback[position].append((indices, scores))
+                    still_pending.append(position)
+            with self.timings_lock:
+                timing = self.timings[name]
+                timing['seconds'] += seconds
+                timing['queries'] += pending.size
+                timing['hits'] += pending.size - len(still_pending)
+            pending = np.array(still_pending, dtype=int)
+
+        for position in pending:
+            indices = np.concatenate([indices for indices, _ in fallback[position]])
+            scores = np.concatenate([scores for _, scores in fallback[position]])
+            best = np.lexsort((indices, -scores))[:k]
+            results[position] = (indices[best], scores[best])
+        return results
+
+    # Returns per-tier query counts, confident hits and time spent, so early exits can be monitored
+    def tier_stats(self):
+        stats = {}
+        with self.timings_lock:
+            for name, timing in self.timings.items():
+                queries = timing['queries']
+                stats[name] = {
+                    'queries': queries,
+                    'hits': timing['hits'],
+                    'total_ms': timing['seconds'] * 1000,
+                    'mean_ms': timing['seconds'] * 1000 / queries if queries else 0.0,
+                }
+        return stats
+
+# Recognizes a batch of inputs at once, returning the top_k (type, tag/answer, score) candidates for each input.
+# With top_k=1 each result list holds exactly what recognize_intent returns for that input, plus the score.
+def recognize_intents(input_texts, vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers, top_k=1):
+    if not input_texts:
+        return []
+
+    # Each stage is timed separately (when metrics are enabled) to show where a slow turn spends its time
+    with metrics.timer('recognition_stage_seconds', 'preprocess'):
+        preprocessed = preprocess_texts(input_texts)
+    return recognize_preprocessed_intents(preprocessed, vectorizer, X, labels, questions, answers,
+                                          healthcare_questions, healthcare_answers, top_k)
+
+# recognize_intents for inputs that are already preprocessed (e.g. recognition cache keys), so they are not
+# tokenized and lemmatized a second time
+def recognize_preprocessed_intents(preprocessed, vectorizer, X, labels, questions, answers, healthcare_questions,
+                                   healthcare_answers, top_k=1):
+    if not preprocessed:
+        return []
+
+    with metrics.timer('recognition_stage_seconds', 'transform'):
+        input_vecs = vectorizer.transform(preprocessed)
+    with metrics.timer('recognition_stage_seconds', 'similarity'):
+        matched = score_vectors(input_vecs, X, top_k)
+
+    results = []
+    for indices, scores in matched:
+        matches = []
+        for index, similarity in zip(indices, scores):
+            similarity = float(similarity)
+            intent_type, response = classify_match(index, similarity, labels, questions, answers, healthcare_answers)
+            matches.append((intent_type, response, similarity))
+        results.append(matches)
+    return results
+
+# Recognizes intent or answers a question based on input text, using cosine similarity
+def recognize_intent(input_text, vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers):
+    intent_type, response, _ = recognize_intents(
+        [input_text], vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers)[0][0]
+    return intent_type, response
+
+# recognize_intent for one already preprocessed input
+def recognize_preprocessed(preprocessed_input, vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers):
+    intent_type, response, _ = recognize_preprocessed_intents(
+        [preprocessed_input], vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers)[0][0]
+    return intent_type, response
+
+# Default location of the prebuilt model artifact
+DEFAULT_MODEL_ARTIFACT = 'intent_model.pkl'
+# Bump whenever preprocessing or the artifact layout changes so old artifacts get rebuilt
+MODEL_ARTIFACT_VERSION = 1
+
+# Hashes the contents of the source files (plus the artifact version) to key the model artifact
+def compute_source_hash(intents_file, qa_file, healthcare_file):
+    # The tokenizer mode changes the preprocessed corpus, so it is part of the key too
+    digest = hashlib.sha256(f"v{MODEL_ARTIFACT_VERSION}:{text_preprocessing.default_preprocessor.tokenizer}".encode())
+    for path in (intents_file, qa_file, healthcare_file):
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                digest.update(chunk)
+        digest.update(b'\0')  # Separator so content can't shift between files unnoticed
+    return digest.hexdigest()
+
+# Loads a saved model if the artifact exists and was built from the same sources, otherwise returns None
+def load_model_artifact(artifact_file, source_hash):
+    try:
+        with open(artifact_file, 'rb') as file:
+            artifact = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError) as e:
+        print("Ignoring unreadable model artifact:", e)
+        return None
+
+    if not isinstance(artifact, dict) or artifact.get('source_hash') != source_hash:
+        return None
+    return artifact['model']
+
+# Saves the fitted model next to the hash of its sources; written to a temp file first so readers never see a partial artifact
+def save_model_artifact(artifact_file, source_hash, model):
+    temp_file = f"{artifact_file}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, 'wb') as file:
+            pickle.dump({'source_hash': source_hash, 'model': model}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, artifact_file)
+    except OSError as e:
+        print("Could not save model artifact:", e)
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+# Returns where the artifact of a feature mode is saved: the default mode uses artifact_file itself,
+# others get their own file next to it so switching modes never loads the wrong model
+def model_artifact_file(artifact_file, features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES):
+    if artifact_file is None or features == 'tfidf':
+        return artifact_file
+    return f"{os.path.splitext(artifact_file)[0]}.{features}{n_features}.pkl"
+
+# Returns the directory the shared export of a model lives in (see shared_model): one per source hash,
+# feature mode and export layout version, so workers never open files built from other sources or by
+# an older layout (which export_model could not replace in place)
+def shared_model_directory(shared_dir, source_hash, features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES):
+    suffix = '' if features == 'tfidf' else f"-{features}{n_features}"
+    return os.path.join(shared_dir, f"{source_hash[:16]}{suffix}.v{shared_model.SHARED_MODEL_VERSION}")
+
+# Builds the model from scratch by loading data and vectorizing text. With workers set, the sources are
+# streamed through corpus_ingest in chunks instead (preprocessed by that many processes), which gives the
+# same model without holding the raw corpus in memory; progress is passed on to corpus_ingest.build_model.
+def build_model(intents_file, qa_file, healthcare_file, features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES,
+                workers=None, chunk_size=corpus_ingest.DEFAULT_CHUNK_SIZE, progress=None):
+    if workers is not None:
+        return corpus_ingest.build_model(intents_file, qa_file, healthcare_file, features, n_features,
+                                         workers, chunk_size, progress)
     intents, questions, answers, healthcare_questions, healthcare_answers = load_data(intents_file, qa_file, healthcare_file)
-    vectorizer, X, labels = vectorize_data(intents, questions + healthcare_questions)
+    vectorizer, X, labels = vectorize_data(intents, questions + healthcare_questions, features, n_features)
+    return vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers
+
+# Matching backends: 'exact' scores every row of X, 'inverted' only scores rows sharing a term with
+# the input, and 'lsa' scores a dense low-dimensional projection of X
+MATCHING_BACKENDS = ('exact', 'inverted', 'lsa')
+
+# Wraps X in the index used by the chosen matching backend; the result is passed wherever X is expected
+def build_matching_index(X, backend='exact', n_components=lsa_index.DEFAULT_LSA_COMPONENTS):
+    if backend == 'exact':
+        return X
+    if backend == 'inverted':
+        return retrieval_index.InvertedIndex(X)
+    if backend == 'lsa':
+        return lsa_index.LSAIndex(X, n_components=n_components)
+    raise ValueError(f"Unknown matching backend: {backend!r} (expected one of {MATCHING_BACKENDS})")
+
+# Loads the model, reusing the saved artifact when the source files are unchanged
+# and rebuilding (and re-saving) it otherwise. Pass artifact_file=None to always build in memory.
+# workers (see build_model) only matters when the model has to be built.
+def load_model(intents_file, qa_file, healthcare_file, artifact_file=DEFAULT_MODEL_ARTIFACT,
+               features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES, workers=None):
+    if artifact_file is None:
+        return build_model(intents_file, qa_file, healthcare_file, features, n_features, workers)
+    source_hash = compute_source_hash(intents_file, qa_file, healthcare_file)
+
+    model = load_model_artifact(artifact_file, source_hash)
+    if model is None:
+        model = build_model(intents_file, qa_file, healthcare_file, features, n_features, workers)
+        save_model_artifact(artifact_file, source_hash, model)
+    return model
+
+# Opens the memory-mapped export of the model in shared_dir, so worker processes share one copy of X and the
+# QA texts; the first process to need it exports it (building or loading the artifact as load_model does)
+def load_shared_model(intents_file, qa_file, healthcare_file, shared_dir, artifact_file=DEFAULT_MODEL_ARTIFACT,
+                      features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES, workers=None):
+    source_hash = compute_source_hash(intents_file, qa_file, healthcare_file)
+    directory = shared_model_directory(shared_dir, source_hash, features, n_features)
+    model = shared_model.open_model(directory)
+    if model is None:
+        shared_model.export_model(directory, load_model(intents_file, qa_file, healthcare_file, artifact_file,
+                                                        features, n_features, workers))
+        model = shared_model.open_model(directory)
+        if model is None:
+            raise RuntimeError(f"Could not open the shared model export in {directory}; remove it to rebuild")
+    return model
+
+# Wraps X in the matcher selected by configuration: a single index over all rows, or a TieredIndex
+def build_matcher(X, labels, questions, backend='exact', n_components=lsa_index.DEFAULT_LSA_COMPONENTS, tiered=False):
+    if tiered:
+        return TieredIndex(X, len(labels), len(questions), backend, n_components)
+    return build_matching_index(X, backend, n_components)
+
+# Sets up intent recognition. The returned X is wrapped in the matcher of the chosen backend, and with
+# tiered=True intents, healthcare QA and general QA are scored in that order with early exit.
+# features selects the vectorizer ('hashing' keeps memory fixed at n_features, see FEATURE_MODES).
+# LSA indexes are expensive to fit, so they are cached next to the model artifact under the same source hash.
+# With shared_dir the model is memory-mapped from a shared export (see load_shared_model); the exact backend
+# then scores the shared X directly, while the other backends build their index from it in each process.
+# workers streams a model that has to be built through a pool of preprocessing processes (see build_model).
+def setup_intent_recognition(intents_file, qa_file, healthcare_file, artifact_file=DEFAULT_MODEL_ARTIFACT,
+                             backend='exact', n_components=lsa_index.DEFAULT_LSA_COMPONENTS, tiered=False,
+                             features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES, shared_dir=None,
+                             workers=None):
+    artifact_file = model_artifact_file(artifact_file, features, n_features)
+    if shared_dir is not None:
+        model = load_shared_model(intents_file, qa_file, healthcare_file, shared_dir, artifact_file, features, n_features,
+                                  workers)
+    else:
+        model = load_model(intents_file, qa_file, healthcare_file, artifact_file, features, n_features, workers)
+    vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers = model
+
+    if backend == 'lsa' and artifact_file is not None:
+        index_file = f"{os.path.splitext(artifact_file)[0]}.lsa{n_components}{'-tiered' if tiered else ''}.pkl"
+        source_hash = compute_source_hash(intents_file, qa_file, healthcare_file)
+        index = load_model_artifact(index_file, source_hash)
+        if index is None:
+            index = build_matcher(X, labels, questions, backend, n_components, tiered)
+            save_model_artifact(index_file, source_hash, index)
+        X = index
+    else:
+        X = build_matcher(X, labels, questions, backend, n_components, tiered)
     return vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers
+
+# Build step: python intent_recognition.py [--force] prebuilds the artifact so startup only has to load it
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the intent recognition model artifact")
+    parser.add_argument('--intents', default='intents.json')
+    parser.add_argument('--qa', default='qa_dataset.csv')
+    parser.add_argument('--healthcare', default='healthcare_info.csv')
+    parser.add_argument('--artifact', default=DEFAULT_MODEL_ARTIFACT)
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the artifact is up to date")
+    parser.add_argument('--features', default='tfidf', choices=FEATURE_MODES)
+    parser.add_argument('--n-features', type=int, default=hashing_vectorizer.DEFAULT_HASH_FEATURES,
+                        help="Number of hashed features with --features hashing")
+    parser.add_argument('--workers', type=int,
+                        help="Stream the sources in chunks, preprocessing them in this many processes (1: in this one)")
+    parser.add_argument('--chunk-size', type=int, default=corpus_ingest.DEFAULT_CHUNK_SIZE,
+                        help="Rows per chunk with --workers")
+    args = parser.parse_args()
+
+    artifact_file = model_artifact_file(args.artifact, args.features, args.n_features)
+    source_hash = compute_source_hash(args.intents, args.qa, args.healthcare)
+    if not args.force and load_model_artifact(artifact_file, source_hash) is not None:
+        print(f"{artifact_file} is up to date ({source_hash[:12]})")
+    else:
+        model = build_model(args.intents, args.qa, args.healthcare, args.features, args.n_features,
+                            args.workers, args.chunk_size, corpus_ingest.ProgressPrinter())
+        save_model_artifact(artifact_file, source_hash, model)
+        print(f"Built {artifact_file} ({source_hash[:12]})")
@@ -0,0 +1,46 @@
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+DEFAULT_LSA_COMPONENTS = 256
+
+
+# Dense latent semantic analysis (LSA) index over the rows of a TF-IDF matrix.
+# X is projected with a truncated SVD into a compact, L2-normalized, C-contiguous float32 matrix,
+# so scoring a batch of inputs is a single dense matrix product. It exposes the same top_k
+# interface as retrieval_index.InvertedIndex and can be passed in place of X.
+class LSAIndex:
+    def __init__(self, X, n_components=DEFAULT_LSA_COMPONENTS, random_state=0):
+        self.matrix = X
+        self.shape = X.shape
+        # TruncatedSVD needs fewer components than the smaller side of X
+        n_components = max(1, min(n_components, min(X.shape) - 1))
+        svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+        embeddings = svd.fit_transform(X)
+        self.n_components = n_components
+        self.explained_variance = float(svd.explained_variance_ratio_.sum())
+        # Terms x components projection, so sparse inputs project with one sparse-dense product
+        self.projection = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        self.embeddings = np.ascontiguousarray(normalize(embeddings), dtype=np.float32)
+
+    # Projects TF-IDF input vectors into the normalized latent space
+    def project(self, input_vecs):
+        return normalize(np.asarray(input_vecs @ self.projection, dtype=np.float32))
+
+    # Returns a list of (rows, scores) pairs for each input, best first, ties going to the lower row
+    def top_k(self, input_vecs, k=1):
+        k = min(k, self.shape[0])
+        similarities = self.project(input_vecs) @ self.embeddings.T
+        results = []
+        for scores in similarities:
+            if k == 1:
+                rows = np.array([np.argmax(scores)])
+            else:
+                candidates = np.argpartition(-scores, k - 1)[:k]
+                rows = candidates[np.lexsort((candidates, -scores[candidates]))]
+            results.append((rows, scores[rows].astype(np.float64)))
+        return results
+
+    # Memory used by the dense index, for comparison with the sparse matrix it replaces
+    def nbytes(self):
+        return self.embeddings.nbytes + self.projection.nbytes
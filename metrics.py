@@ -0,0 +1,199 @@
+import bisect
+import functools
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds, from 50 microseconds (a cached turn) to 10 seconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = 'chatbot_'
+
+
+# Latency histogram with fixed buckets: constant memory however many observations it holds.
+# Quantiles are estimated by interpolating within the bucket they fall in, as Prometheus does.
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot counts observations above every bucket
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # Estimates the q-quantile (0 < q < 1) of the observations, or None if there are none
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+# No-op stand-in for a timer while metrics are disabled
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+# Times the block it wraps into a histogram of the registry
+class Timer:
+    __slots__ = ('registry', 'name', 'label', 'start')
+
+    def __init__(self, registry, name, label):
+        self.registry = registry
+        self.name = name
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, self.label)
+        return False
+
+
+# Labelled latency histograms and counters, exported as Prometheus text or JSON.
+# Disabled by default: timers and counters then return after a single attribute check.
+class MetricsRegistry:
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.histograms = {}  # name -> {label: Histogram}
+        self.counters = {}  # name -> {label: count}
+        self.lock = threading.Lock()
+
+    # Records one duration in seconds
+    def observe(self, name, seconds, label=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(label)
+            if histogram is None:
+                histogram = series[label] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    # Adds to a counter
+    def increment(self, name, label=None, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[label] = series.get(label, 0) + amount
+
+    # Context manager timing its block into the named histogram
+    def timer(self, name, label=None):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name, label)
+
+    # Decorator timing every call of a function. label is a fixed label, or a function of the call's
+    # arguments returning one (evaluated before the call).
+    def timed(self, name, label=None):
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                series_label = label(*args, **kwargs) if callable(label) else label
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, series_label)
+            return wrapper
+        return decorate
+
+    # Forgets every recorded value
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    # Returns every metric as plain data: per histogram series its count, sum and estimated quantiles (seconds)
+    def to_dict(self):
+        with self.lock:
+            histograms = {
+                name: {str(label): {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    **{f"p{round(q * 100)}": histogram.quantile(q) for q in QUANTILES},
+                } for label, histogram in series.items()}
+                for name, series in self.histograms.items()
+            }
+            counters = {name: {str(label): count for label, count in series.items()}
+                        for name, series in self.counters.items()}
+        return {'enabled': self.enabled, 'histograms': histograms, 'counters': counters}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    # Returns every metric in the Prometheus text exposition format. Labels go in a 'label' label;
+    # histograms are cumulative buckets plus _sum and _count, counters get a _total suffix.
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# TYPE {metric} histogram")
+                for label, histogram in series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{metric}_bucket{prometheus_labels(label, le=bound)} {cumulative}")
+                    lines.append(f"{metric}_bucket{prometheus_labels(label, le='+Inf')} {histogram.count}")
+                    lines.append(f"{metric}_sum{prometheus_labels(label)} {histogram.sum}")
+                    lines.append(f"{metric}_count{prometheus_labels(label)} {histogram.count}")
+            for name, series in sorted(self.counters.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# TYPE {metric}_total counter")
+                for label, count in series.items():
+                    lines.append(f"{metric}_total{prometheus_labels(label)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+# Formats the label set of one Prometheus sample
+def prometheus_labels(label, le=None):
+    pairs = []
+    if label is not None:
+        escaped = str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'label="{escaped}"')
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+# Process-wide registry every module reports to
+registry = MetricsRegistry()
+
+# Turns instrumentation on or off for the whole process
+def enable(enabled=True):
+    registry.enabled = enabled
+
+def timer(name, label=None):
+    return registry.timer(name, label)
+
+def timed(name, label=None):
+    return registry.timed(name, label)
+
+def increment(name, label=None, amount=1):
+    registry.increment(name, label, amount)
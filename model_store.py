@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+
+import scipy.sparse as sp
+
+import intent_recognition as ir
+import lsa_index
+import hashing_vectorizer
+import metrics
+from professional_directory import ProfessionalDirectory
+
+DEFAULT_RELOAD_INTERVAL = 2.0  # seconds between checks of the source files
+# Past this fraction of changed rows a reload refits the vectorizer instead of patching the live matrix
+REBUILD_FRACTION = 0.2
+
+
+# Everything a conversation turn reads from the model and its source files, built together and never
+# modified afterwards. Turns take the current snapshot once and use only it, so a reload that swaps in
+# a new snapshot never shows them a mix of old and new data.
+class ModelSnapshot:
+    def __init__(self, version, source_hash, vectorizer, matrix, X, labels, patterns, questions, answers,
+                 healthcare_questions, healthcare_answers, intents, texts):
+        self.version = version
+        self.source_hash = source_hash
+        self.vectorizer = vectorizer
+        self.matrix = matrix  # The TF-IDF rows themselves; X may be a matching index built over them
+        self.X = X
+        self.labels = labels
+        self.patterns = patterns  # Preprocessed intent patterns, one per label
+        self.questions = questions
+        self.answers = answers
+        self.healthcare_questions = healthcare_questions
+        self.healthcare_answers = healthcare_answers
+        self.intents = intents
+        self.texts = texts  # Every pattern and question as written -> preprocessed, for the next incremental reload
+        self.responses = {intent['tag']: intent['responses'] for intent in intents}
+        self.directory = ProfessionalDirectory(vectorizer, healthcare_questions, healthcare_answers)
+
+    # The model in the form intent_recognition expects
+    def model(self):
+        return (self.vectorizer, self.X, self.labels, self.questions, self.answers,
+                self.healthcare_questions, self.healthcare_answers)
+
+
+# Preprocesses texts, looking each one up in known (text as written -> preprocessed) first. Only the texts
+# missing from it are preprocessed, and they are added to it.
+def preprocess_known(texts, known):
+    new = [text for text in dict.fromkeys(texts) if text not in known]
+    known.update(zip(new, ir.preprocess_texts(new)))
+    return [known[text] for text in texts]
+
+
+# Returns the intent labels and preprocessed patterns in the order vectorize_data puts them in X,
+# preprocessing through known as preprocess_known does
+def intent_patterns(intents, known):
+    labels = [intent['tag'] for intent in intents for _ in intent['patterns']]
+    patterns = preprocess_known([pattern for intent in intents for pattern in intent['patterns']], known)
+    return labels, patterns
+
+
+# Rebuilds one block of rows for new_keys, reusing the row of every key the block already had and
+# transforming only the new texts. Returns (rows, number of rows added, number of rows removed).
+def update_block(vectorizer, old_keys, old_rows, new_keys, new_texts):
+    available = {}
+    for index, key in enumerate(old_keys):
+        available.setdefault(key, []).append(index)
+    order, added = [], []
+    for key, text in zip(new_keys, new_texts):
+        if available.get(key):
+            order.append(available[key].pop(0))
+        else:
+            order.append(len(old_keys) + len(added))
+            added.append(text)
+    rows = sp.vstack([old_rows, vectorizer.transform(added)], format='csr') if added else old_rows
+    return rows[order], len(added), len(old_keys) - (len(new_keys) - len(added))
+
+
+# Holds the current ModelSnapshot and replaces it when intents.json, qa_dataset.csv or healthcare_info.csv
+# change. Small edits are applied incrementally: only added patterns and questions are preprocessed, their rows
+# transformed with the live vectorizer and removed ones dropped, while unchanged rows are reused. Terms the vectorizer has
+# never seen are ignored until a larger edit (or reload(full=True)) refits it from scratch.
+# The new snapshot is built off to the side and swapped in with a single assignment.
+# With shared_dir the model is memory-mapped from a shared export (see intent_recognition.load_shared_model),
+# and every reload is a full one, since incrementally patched rows would be private to this process.
+# ingest_workers is passed to intent_recognition.setup_intent_recognition as workers for full rebuilds.
+class ModelStore:
+    def __init__(self, intents_file, qa_file, healthcare_file, artifact_file=ir.DEFAULT_MODEL_ARTIFACT,
+                 backend='exact', n_components=lsa_index.DEFAULT_LSA_COMPONENTS, tiered=False,
+                 features='tfidf', n_features=hashing_vectorizer.DEFAULT_HASH_FEATURES, shared_dir=None,
+                 ingest_workers=None):
+        self.files = (intents_file, qa_file, healthcare_file)
+        self.artifact_file = artifact_file
+        self.backend = backend
+        self.n_components = n_components
+        self.tiered = tiered
+        self.features = features
+        self.n_features = n_features
+        self.shared_dir = shared_dir
+        self.ingest_workers = ingest_workers
+        self.reload_lock = threading.Lock()  # One reload at a time; readers never take it
+        self.watcher = None
+        self.stop_watching = threading.Event()
+        self.last_reload = None
+        self.signature = self.file_signature()
+        self.snapshot = self.build_full(1)
+
+    # Modification time and size of every source file, to notice edits cheaply
+    def file_signature(self):
+        return tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in self.files)
+
+    # Builds a snapshot from scratch (through the model artifact when it is current)
+    def build_full(self, version):
+        vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers = ir.setup_intent_recognition(
+            *self.files, artifact_file=self.artifact_file, backend=self.backend,
+            n_components=self.n_components, tiered=self.tiered, features=self.features, n_features=self.n_features,
+            shared_dir=self.shared_dir, workers=self.ingest_workers)
+        # Only the patterns are preprocessed again; the questions' preprocessed forms are already in the model
+        intents, raw_questions, _, raw_healthcare_questions, _ = ir.read_data(*self.files)
+        texts = dict(zip(raw_questions, questions))
+        texts.update(zip(raw_healthcare_questions, healthcare_questions))
+        _, patterns = intent_patterns(intents, texts)
+        return ModelSnapshot(version, ir.compute_source_hash(*self.files), vectorizer, getattr(X, 'matrix', X), X,
+                             labels, patterns, questions, answers, healthcare_questions, healthcare_answers, intents,
+                             texts)
+
+    # Builds a snapshot of the edited sources from the current one, reusing its vectorizer and unchanged rows,
+    # and preprocessing only the texts it did not have. Returns None when so much changed that a full rebuild
+    # is the better choice.
+    def build_incremental(self, current, version, source_hash):
+        intents, raw_questions, answers, raw_healthcare_questions, healthcare_answers = ir.read_data(*self.files)
+        known = dict(current.texts)  # A copy: the current snapshot is never modified
+        labels, patterns = intent_patterns(intents, known)
+        questions = preprocess_known(raw_questions, known)
+        healthcare_questions = preprocess_known(raw_healthcare_questions, known)
+
+        num_labels, num_questions = len(current.labels), len(current.questions)
+        matrix = current.matrix
+        blocks = [
+            (list(zip(current.labels, current.patterns)), matrix[:num_labels],
+             list(zip(labels, patterns)), patterns),
+            (list(zip(current.questions, current.answers)), matrix[num_labels:num_labels + num_questions],
+             list(zip(questions, answers)), questions),
+            (list(zip(current.healthcare_questions, current.healthcare_answers)), matrix[num_labels + num_questions:],
+             list(zip(healthcare_questions, healthcare_answers)), healthcare_questions),
+        ]
+        rows, added, removed = [], 0, 0
+        for old_keys, old_rows, new_keys, new_texts in blocks:
+            block, block_added, block_removed = update_block(current.vectorizer, old_keys, old_rows, new_keys, new_texts)
+            rows.append(block)
+            added += block_added
+            removed += block_removed
+        if added + removed > REBUILD_FRACTION * matrix.shape[0]:
+            return None
+
+        matrix = sp.vstack(rows, format='csr')
+        X = ir.build_matcher(matrix, labels, questions, self.backend, self.n_components, self.tiered)
+        self.last_reload.update(added=added, removed=removed)
+        # Keep only the texts still in the sources
+        texts = {text: known[text] for text in [pattern for intent in intents for pattern in intent['patterns']]
+                 + raw_questions + raw_healthcare_questions}
+        return ModelSnapshot(version, source_hash, current.vectorizer, matrix, X, labels, patterns, questions,
+                             answers, healthcare_questions, healthcare_answers, intents, texts)
+
+    # Rebuilds the model from the source files and swaps it in; returns True if the sources had changed.
+    # full=True refits the vectorizer even for small edits.
+    def reload(self, full=False):
+        with self.reload_lock:
+            start = time.perf_counter()
+            self.signature = self.file_signature()
+            current = self.snapshot
+            source_hash = ir.compute_source_hash(*self.files)
+            if source_hash == current.source_hash and not full:
+                return False
+
+            self.last_reload = {'version': current.version + 1, 'full_rebuild': False, 'added': None, 'removed': None}
+            snapshot = None if full or self.shared_dir else self.build_incremental(current, current.version + 1, source_hash)
+            if snapshot is None:
+                self.last_reload['full_rebuild'] = True
+                snapshot = self.build_full(current.version + 1)
+            self.snapshot = snapshot
+            self.last_reload['seconds'] = time.perf_counter() - start
+            return True
+
+    # Reloads if any source file was modified since the last check; returns True if a new snapshot was swapped in.
+    # A file caught mid-edit (e.g. invalid JSON) or otherwise unusable leaves the current snapshot in place
+    # until its next change, and never stops the watcher.
+    def check_for_changes(self):
+        try:
+            if self.file_signature() == self.signature:
+                return False
+            return self.reload()
+        except Exception as e:
+            print("Model reload failed, keeping the current model:", repr(e))
+            metrics.increment('model_reload_errors', type(e).__name__)
+            return False
+
+    # Starts a background thread that checks the source files every interval seconds
+    def watch(self, interval=DEFAULT_RELOAD_INTERVAL):
+        if self.watcher is not None:
+            return
+        self.stop_watching.clear()
+
+        def run():
+            while not self.stop_watching.wait(interval):
+                self.check_for_changes()
+
+        self.watcher = threading.Thread(target=run, name='model-watcher', daemon=True)
+        self.watcher.start()
+
+    # Stops the background watcher
+    def close(self):
+        if self.watcher is not None:
+            self.stop_watching.set()
+            self.watcher.join()
+            self.watcher = None
@@ -0,0 +1,164 @@
+import re
+from collections import Counter, deque
+
+import numpy as np
+
+import intent_recognition as ir
+
+# "Dr. First Last" in the healthcare answers; every such name is a professional in the directory
+PROFESSIONAL_NAME = re.compile(r"\bDr\. ([A-Z][a-z]+) ([A-Z][a-z]+)\b")
+# "Dr. Last", a later reference to a professional already named in the same answer
+SHORT_NAME = re.compile(r"\bDr\. [A-Z][a-z]+\b")
+# Capitalised phrases left in an answer once names are removed, e.g. "Cardiologist", "Specialist in Neurology"
+TITLE_PHRASE = re.compile(r"\b[A-Z][\w-]*(?: (?:in )?[A-Z][\w-]*)*")
+# Sentence openers that are capitalised but not specialties
+NOT_SPECIALTIES = {'yes', 'you', 'please', 'to'}
+
+
+# Lowercases text and turns punctuation into single spaces, so keywords only ever match whole words
+def normalize(text):
+    return ' '.join(re.sub(r"[^a-z0-9]+", ' ', text.lower()).split())
+
+
+# Aho–Corasick automaton over a fixed set of keywords: finds every occurrence of every keyword
+# in one pass over the text, however many keywords there are
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.goto = [{}]  # state -> {character: next state}; state 0 is the root
+        self.fail = [0]
+        self.output = [[]]  # state -> keywords ending at this state
+        for keyword in keywords:
+            state = 0
+            for character in keyword:
+                if character not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][character] = len(self.goto) - 1
+                state = self.goto[state][character]
+            self.output[state].append(keyword)
+
+        # Breadth-first, so each state's failure link points at an already finished, shallower state
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for character, child in self.goto[state].items():
+                pending.append(child)
+                fallback = self.fail[state]
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(character, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    # Yields (start, end, keyword) for every keyword occurrence in text
+    def find(self, text):
+        state = 0
+        for position, character in enumerate(text):
+            while state and character not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(character, 0)
+            for keyword in self.output[state]:
+                yield position + 1 - len(keyword), position + 1, keyword
+
+
+# Directory of the healthcare professionals named in the healthcare QA answers, built once at startup.
+# A question is routed in one pass: an Aho–Corasick matcher over professional names ("emily carter",
+# "dr carter") and specialties ("cardiologist", "ent specialist") picks the professionals it is about,
+# and the best of their rows by TF-IDF similarity is the answer. Questions naming no one get the most
+# similar healthcare row, never one from the general QA corpus.
+class ProfessionalDirectory:
+    def __init__(self, vectorizer, healthcare_questions, healthcare_answers):
+        self.vectorizer = vectorizer
+        self.answers = healthcare_answers
+        # Term -> rows postings over the healthcare rows only (healthcare_questions are preprocessed)
+        self.postings = vectorizer.transform(healthcare_questions).tocsc()
+        # With a fitted vocabulary, queries are weighted directly, skipping the cost of a sparse transform
+        self.analyzer = vectorizer.build_analyzer() if hasattr(vectorizer, 'vocabulary_') else None
+
+        # professional -> rows whose answer mentions them, and keyword -> professionals it refers to
+        self.rows = {}
+        names = {}
+        specialties = {}
+        for row, answer in enumerate(healthcare_answers):
+            mentioned = []
+            for first, last in PROFESSIONAL_NAME.findall(answer):
+                professional = f"Dr. {first} {last}"
+                if professional not in mentioned:
+                    mentioned.append(professional)
+                    self.rows.setdefault(professional, []).append(row)
+                for keyword in (f"{first} {last}", f"dr {last}", f"doctor {last}"):
+                    names.setdefault(normalize(keyword), set()).add(professional)
+            # Specialties are only taken from answers about a single professional
+            if len(mentioned) == 1:
+                text = SHORT_NAME.sub(' ', PROFESSIONAL_NAME.sub(' ', answer))
+                for phrase in TITLE_PHRASE.findall(text):
+                    for keyword in (phrase, phrase.replace('Specialist', '')):
+                        keyword = normalize(keyword).removeprefix('in ').strip()
+                        if keyword and keyword not in NOT_SPECIALTIES:
+                            specialties.setdefault(keyword, set()).add(mentioned[0])
+
+        self.rows = {professional: np.array(rows) for professional, rows in self.rows.items()}
+        # A name always outranks a specialty that happens to be spelled the same
+        self.keywords = {keyword: ('specialty', professionals) for keyword, professionals in specialties.items()}
+        self.keywords.update((keyword, ('name', professionals)) for keyword, professionals in names.items())
+        self.matcher = KeywordMatcher(self.keywords)
+
+    # Returns the professionals a question refers to by name, or else by specialty (an empty set if neither).
+    # Keywords must match whole words (a trailing plural "s" is allowed); overlapping matches keep the longest.
+    def find_professionals(self, question):
+        text = normalize(question)
+        hits = []
+        for start, end, keyword in self.matcher.find(text):
+            if start > 0 and text[start - 1] != ' ':
+                continue
+            if end < len(text) and text[end] != ' ' and not (text[end] == 's' and text[end + 1:end + 2] in ('', ' ')):
+                continue
+            hits.append((start, -end, keyword))
+
+        by_kind = {'name': set(), 'specialty': set()}
+        covered = -1
+        for start, negative_end, keyword in sorted(hits):
+            if start < covered:
+                continue
+            covered = -negative_end
+            kind, professionals = self.keywords[keyword]
+            by_kind[kind].update(professionals)
+        return by_kind['name'] or by_kind['specialty']
+
+    # Returns the query's (term columns, L2-normalized TF-IDF weights)
+    def weigh_query(self, question):
+        text = ir.preprocess_text(question)
+        if self.analyzer is None:
+            query = self.vectorizer.transform([text])
+            return query.indices, query.data
+        vocabulary = self.vectorizer.vocabulary_
+        counts = Counter(vocabulary[term] for term in self.analyzer(text) if term in vocabulary)
+        terms = np.fromiter(counts.keys(), dtype=int, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=float, count=len(counts)) * self.vectorizer.idf_[terms]
+        norm = np.sqrt(weights @ weights)
+        return terms, weights / norm if norm else weights
+
+    # Returns the cosine similarity of a question with every healthcare row, touching only the
+    # postings of the question's terms
+    def score(self, question):
+        scores = np.zeros(len(self.answers))
+        indptr, indices, data = self.postings.indptr, self.postings.indices, self.postings.data
+        for term, weight in zip(*self.weigh_query(question)):
+            start, end = indptr[term], indptr[term + 1]
+            scores[indices[start:end]] += data[start:end] * weight
+        return scores
+
+    # Returns the best healthcare answer for a question, or None if nothing is relevant enough
+    def answer(self, question):
+        scores = self.score(question)
+        professionals = self.find_professionals(question)
+        if professionals:
+            rows = np.unique(np.concatenate([self.rows[professional] for professional in professionals]))
+            # Every candidate is about the right professional, so even a zero score is an answer;
+            # ties go to the earliest row, which is usually the professional's introduction
+            return self.answers[rows[int(np.argmax(scores[rows]))]]
+
+        best = int(np.argmax(scores))
+        if scores[best] < ir.QA_SIMILARITY_THRESHOLD:
+            return None
+        return self.answers[best]
@@ -0,0 +1,108 @@
+import numpy as np
+import scipy.sparse as sp
+
+# Slack used when comparing score upper bounds, so floating point rounding never prunes a true top-k row
+PRUNE_TOLERANCE = 1e-9
+
+
+# Term -> postings inverted index over the rows of a TF-IDF matrix.
+# Only rows that share at least one term with the query are scored, and MaxScore-style pruning
+# skips rows whose upper bound can no longer reach the current top k. It can be passed in place
+# of X to intent_recognition.recognize_intent(s) and returns the same best matches as the full scan.
+class InvertedIndex:
+    def __init__(self, X):
+        self.matrix = X
+        # Column t of the CSC matrix is the postings list of term t, sorted by row
+        postings = sp.csc_matrix(X, dtype=np.float64)
+        postings.sort_indices()
+        self.shape = postings.shape
+        self.postings_ptr = postings.indptr
+        self.postings_rows = postings.indices
+        self.postings_weights = postings.data
+
+        # Highest weight of each term in any row, the per-term score upper bound used for pruning
+        self.max_weights = np.zeros(self.shape[1])
+        nonempty = np.diff(self.postings_ptr) > 0
+        if nonempty.any():
+            self.max_weights[nonempty] = np.maximum.reduceat(postings.data, self.postings_ptr[:-1][nonempty])
+
+        self.queries = 0
+        self.postings_scanned = 0
+        self.rows_scored = 0
+
+    # Returns up to k (rows, scores) for one query, best first, ties going to the lower row
+    def search(self, terms, weights, k=1):
+        self.queries += 1
+        bounds = weights * self.max_weights[terms]
+        # Terms with the highest possible contribution first, so the threshold rises quickly
+        order = np.argsort(-bounds, kind='stable')
+        terms, weights = terms[order], weights[order]
+        # remaining_bounds[i] is the most any row can still gain from terms i onwards
+        remaining_bounds = np.append(np.cumsum(bounds[order][::-1])[::-1], 0.0)
+
+        rows = np.empty(0, dtype=self.postings_rows.dtype)
+        scores = np.empty(0)
+        threshold = -np.inf
+        for i, term in enumerate(terms):
+            start, end = self.postings_ptr[term], self.postings_ptr[term + 1]
+            if start == end:
+                continue
+            posting_rows = self.postings_rows[start:end]
+            posting_scores = self.postings_weights[start:end] * weights[i]
+
+            if rows.size < k or remaining_bounds[i] >= threshold - PRUNE_TOLERANCE:
+                # Essential term: a row not seen yet could still make the top k, so merge its whole postings list
+                merged_rows = np.concatenate((rows, posting_rows))
+                merged_scores = np.concatenate((scores, posting_scores))
+                rows, inverse = np.unique(merged_rows, return_inverse=True)
+                scores = np.bincount(inverse, weights=merged_scores)
+                self.postings_scanned += int(end - start)
+            else:
+                # Non-essential term: only existing candidates can gain, so look them up by binary search
+                positions = np.minimum(np.searchsorted(posting_rows, rows), posting_rows.size - 1)
+                hits = posting_rows[positions] == rows
+                scores[hits] += posting_scores[positions[hits]]
+                self.postings_scanned += int(rows.size)
+
+            if rows.size >= k:
+                threshold = np.partition(scores, rows.size - k)[rows.size - k]
+                # Drop candidates that can no longer reach the current k-th best score
+                keep = scores + remaining_bounds[i + 1] >= threshold - PRUNE_TOLERANCE
+                rows, scores = rows[keep], scores[keep]
+
+        self.rows_scored += int(rows.size)
+        best = np.lexsort((rows, -scores))[:k]
+        return rows[best], scores[best]
+
+    # Scores each row of a (normalized) query matrix and returns a list of (rows, scores) pairs.
+    # Like a full scan, it always returns k rows, padding with the lowest unmatched rows at score 0.
+    def top_k(self, input_vecs, k=1):
+        input_vecs = sp.csr_matrix(input_vecs)
+        k = min(k, self.shape[0])
+        results = []
+        for i in range(input_vecs.shape[0]):
+            start, end = input_vecs.indptr[i], input_vecs.indptr[i + 1]
+            rows, scores = self.search(input_vecs.indices[start:end], input_vecs.data[start:end], k)
+            if rows.size < k:
+                matched = set(rows.tolist())
+                padding = []
+                row = 0
+                while len(padding) < k - rows.size:
+                    if row not in matched:
+                        padding.append(row)
+                    row += 1
+                rows = np.concatenate((rows, np.array(padding, dtype=rows.dtype)))
+                scores = np.concatenate((scores, np.zeros(len(padding))))
+            results.append((rows, scores))
+        return results
+
+    # Returns counters showing how much work the pruning saves compared to a full scan
+    def stats(self):
+        return {
+            'rows': self.shape[0],
+            'terms': self.shape[1],
+            'postings': int(self.postings_ptr[-1]),
+            'queries': self.queries,
+            'postings_scanned': self.postings_scanned,
+            'rows_scored': self.rows_scored,
+        }
@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_SESSION_TTL = 1800.0  # seconds of inactivity before a session is evicted
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_SPILL_TTL = 86400.0  # seconds a spilled session can still be resumed
+
+
+# Estimates the memory held by an object graph, counting each object once.
+# Objects listed in shared (e.g. the booking system every session points to) are not counted.
+def estimate_size(obj, shared=(), _seen=None):
+    seen = set(id(item) for item in shared) if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key, _seen=seen) + estimate_size(value, _seen=seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen=seen) for item in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(estimate_size(getattr(obj, name), _seen=seen)
+                    for name in obj.__slots__ if hasattr(obj, name))
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), _seen=seen)
+    return size
+
+
+# Holds live chat sessions in LRU order and evicts them once they have been idle longer than the TTL or
+# when more than max_sessions are live. With spill_path set, evicted sessions are saved to SQLite and
+# transparently restored by get(), so a user can resume a conversation after eviction. A session leaves
+# memory and reaches the spill database (and back) under one hold of the lock, so get() always finds it.
+#
+# Sessions must provide to_dict(); restore_session turns that dict back into a session.
+class SessionStore:
+    def __init__(self, restore_session=None, ttl=DEFAULT_SESSION_TTL, max_sessions=DEFAULT_MAX_SESSIONS,
+                 spill_path=None, spill_ttl=DEFAULT_SPILL_TTL, clock=time.monotonic):
+        self.restore_session = restore_session
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.spill_ttl = spill_ttl
+        self.clock = clock
+        self.sessions = OrderedDict()  # session_id -> (session, last_access), least recently used first
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.resumed = 0
+
+        self.spill_conn = None
+        if spill_path is not None:
+            self.spill_conn = sqlite3.connect(spill_path, check_same_thread=False)
+            self.spill_conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT,
+                    saved_at REAL
+                )
+            ''')
+            self.spill_conn.commit()
+
+    # Adds (or replaces) a live session
+    def put(self, session_id, session):
+        with self.lock:
+            self._put(session_id, session)
+
+    # Returns a live session, restoring it from the spill database if it was evicted, or None
+    def get(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is not None:
+                self.sessions[session_id] = (entry[0], self.clock())
+                self.sessions.move_to_end(session_id)
+                return entry[0]
+
+            session = self._restore(session_id)
+            if session is not None:
+                self.resumed += 1
+                self._put(session_id, session)
+            return session
+
+    # Forgets a session entirely, including any spilled copy
+    def remove(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            if self.spill_conn is not None:
+                self.spill_conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self.spill_conn.commit()
+
+    def __contains__(self, session_id):
+        return session_id in self.sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    # Evicts sessions idle for longer than the TTL and purges expired spilled sessions; returns the evicted ids
+    def evict_expired(self):
+        cutoff = self.clock() - self.ttl
+        evicted = []
+        with self.lock:
+            while self.sessions:
+                session_id, (session, last_access) = next(iter(self.sessions.items()))
+                if last_access > cutoff:
+                    break
+                del self.sessions[session_id]
+                evicted.append((session_id, session))
+            self.evictions += len(evicted)
+            self._spill(evicted)
+
+            if self.spill_conn is not None:
+                self.spill_conn.execute("DELETE FROM sessions WHERE saved_at < ?", (time.time() - self.spill_ttl,))
+                self.spill_conn.commit()
+        return [session_id for session_id, _ in evicted]
+
+    # Adds a live session, spilling any it pushes over max_sessions (call with the lock held)
+    def _put(self, session_id, session):
+        self.sessions[session_id] = (session, self.clock())
+        self.sessions.move_to_end(session_id)
+        self._spill(self._evict_over_capacity())
+
+    # Removes least recently used sessions beyond max_sessions (call with the lock held)
+    def _evict_over_capacity(self):
+        evicted = []
+        while len(self.sessions) > self.max_sessions:
+            session_id, (session, _) = self.sessions.popitem(last=False)
+            evicted.append((session_id, session))
+        self.evictions += len(evicted)
+        return evicted
+
+    # Saves evicted sessions to the spill database, if there is one (call with the lock held)
+    def _spill(self, evicted):
+        if self.spill_conn is None or not evicted:
+            return
+        now = time.time()
+        rows = [(session_id, json.dumps(session.to_dict()), now) for session_id, session in evicted]
+        self.spill_conn.executemany("INSERT OR REPLACE INTO sessions (session_id, data, saved_at) VALUES (?, ?, ?)", rows)
+        self.spill_conn.commit()
+
+    # Loads and removes a spilled session, returning None if there is none (call with the lock held)
+    def _restore(self, session_id):
+        if self.spill_conn is None or self.restore_session is None:
+            return None
+        row = self.spill_conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        self.spill_conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self.spill_conn.commit()
+        return self.restore_session(json.loads(row[0]))
+
+    # Returns live-session count, eviction counters and the estimated memory per live session
+    def stats(self, sample_size=100, shared=()):
+        with self.lock:
+            sample = [session for session, _ in list(self.sessions.values())[:sample_size]]
+            live = len(self.sessions)
+        spilled = 0
+        if self.spill_conn is not None:
+            with self.lock:
+                spilled = self.spill_conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        bytes_per_session = sum(estimate_size(session, shared) for session in sample) / len(sample) if sample else 0
+        return {
+            'live_sessions': live,
+            'spilled_sessions': spilled,
+            'evictions': self.evictions,
+            'resumed': self.resumed,
+            'bytes_per_session': bytes_per_session,
+            'estimated_bytes': bytes_per_session * live,
+        }
+
+    # Closes the spill database
+    def close(self):
+        if self.spill_conn is not None:
+            self.spill_conn.close()
+            self.spill_conn = None
@@ -0,0 +1,129 @@
+import json
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+from collections.abc import Sequence
+
+import numpy as np
+import scipy.sparse as sp
+
+# Bump whenever the export layout changes so old exports are ignored
+SHARED_MODEL_VERSION = 1
+TEXT_FIELDS = ('questions', 'answers', 'healthcare_questions', 'healthcare_answers')
+MANIFEST_FILE = 'manifest.json'
+
+
+# Texts stored back to back as UTF-8 in one blob file, with an .npy array of their offsets. Both are
+# memory-mapped, so every process reading them shares one copy in the page cache, and a text is only
+# decoded into a Python string when it is read. Behaves as a read-only list of strings.
+class TextBlob(Sequence):
+    def __init__(self, blob_file, offsets_file):
+        self.files = (blob_file, offsets_file)
+        self.offsets = np.load(offsets_file, mmap_mode='r')
+        with open(blob_file, 'rb') as file:
+            # An empty file cannot be mapped, and has no texts to read anyway
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("TextBlob index out of range")
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    # Pickles as its file names, so it can be handed to another process without copying the texts
+    def __reduce__(self):
+        return TextBlob, self.files
+
+
+# Row labels stored as an int32 array of ids into a short list of names, read like a list of strings
+class LabelSequence(Sequence):
+    def __init__(self, ids_file, names):
+        self.ids_file = ids_file
+        self.ids = np.load(ids_file, mmap_mode='r')
+        self.names = names
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.names[label_id] for label_id in self.ids[index]]
+        return self.names[self.ids[index]]
+
+    def __reduce__(self):
+        return LabelSequence, (self.ids_file, self.names)
+
+
+# Writes texts as a blob file and its offsets array
+def write_texts(directory, field, texts):
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(text) for text in encoded])
+    with open(os.path.join(directory, f"{field}.bin"), 'wb') as file:
+        file.write(b''.join(encoded))
+    np.save(os.path.join(directory, f"{field}.offsets.npy"), offsets)
+
+
+# Exports a model tuple (as returned by intent_recognition.load_model) to directory: the CSR arrays of X
+# and the label ids as .npy files, the texts as blobs and the fitted vectorizer as a pickle. The files
+# are written to a temporary directory renamed into place, so readers never see a partial export;
+# if another process exported the same model first, its export is kept.
+def export_model(directory, model):
+    vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers = model
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    temp_directory = tempfile.mkdtemp(dir=parent, prefix='.export-')
+    try:
+        X = sp.csr_matrix(X)
+        X.sort_indices()
+        np.save(os.path.join(temp_directory, 'X_data.npy'), X.data)
+        np.save(os.path.join(temp_directory, 'X_indices.npy'), X.indices)
+        np.save(os.path.join(temp_directory, 'X_indptr.npy'), X.indptr)
+
+        label_names = sorted(set(labels))
+        label_ids = {name: label_id for label_id, name in enumerate(label_names)}
+        np.save(os.path.join(temp_directory, 'label_ids.npy'),
+                np.array([label_ids[label] for label in labels], dtype=np.int32))
+        for field, texts in zip(TEXT_FIELDS, (questions, answers, healthcare_questions, healthcare_answers)):
+            write_texts(temp_directory, field, texts)
+        with open(os.path.join(temp_directory, 'vectorizer.pkl'), 'wb') as file:
+            pickle.dump(vectorizer, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # The manifest goes last: a directory with one is complete
+        with open(os.path.join(temp_directory, MANIFEST_FILE), 'w') as file:
+            json.dump({'version': SHARED_MODEL_VERSION, 'shape': list(X.shape), 'label_names': label_names}, file)
+        os.rename(temp_directory, directory)
+    except OSError:
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        if not os.path.isfile(os.path.join(directory, MANIFEST_FILE)):
+            raise
+
+
+# Opens an exported model with its arrays and texts memory-mapped; returns the model tuple, or None if
+# directory holds no complete export of this layout version
+def open_model(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get('version') != SHARED_MODEL_VERSION:
+        return None
+
+    path = lambda name: os.path.join(directory, name)
+    X = sp.csr_matrix((np.load(path('X_data.npy'), mmap_mode='r'), np.load(path('X_indices.npy'), mmap_mode='r'),
+                       np.load(path('X_indptr.npy'), mmap_mode='r')), shape=tuple(manifest['shape']), copy=False)
+    X.has_sorted_indices = True  # Sorted on export; the read-only arrays must never be sorted in place
+    labels = LabelSequence(path('label_ids.npy'), manifest['label_names'])
+    texts = [TextBlob(path(f"{field}.bin"), path(f"{field}.offsets.npy")) for field in TEXT_FIELDS]
+    with open(path('vectorizer.pkl'), 'rb') as file:
+        vectorizer = pickle.load(file)
+    return (vectorizer, X, labels, *texts)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import intent_recognition as ir
+
+SOURCE_FILES = ('intents.json', 'qa_dataset.csv', 'healthcare_info.csv')
+
+
+# Paths of the bundled intents and QA sources
+@pytest.fixture(scope='session')
+def source_files():
+    return [os.path.join(ROOT, name) for name in SOURCE_FILES]
+
+
+# The model tuple built from the bundled sources by the serial path, without touching any artifact
+@pytest.fixture(scope='session')
+def model(source_files):
+    return ir.build_model(*source_files)
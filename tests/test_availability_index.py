@@ -0,0 +1,106 @@
+import datetime
+
+import pytest
+
+import converse
+from availability_index import AvailabilityIndex
+from healthcare_booking import HealthcareBooking
+
+DATE = '01-01-2031'
+
+
+# A booking system on a throwaway database file
+@pytest.fixture
+def booking(tmp_path):
+    booking = HealthcareBooking(str(tmp_path / 'bookings.db'))
+    yield booking
+    booking.close()
+
+
+# Booked times are taken for the day and for their own service only
+def test_is_free_per_day_and_service():
+    index = AvailabilityIndex()
+    index.add(DATE, '09:00', 'Dentist')
+    assert not index.is_free(DATE, '09:00')
+    assert not index.is_free(DATE, '09:00', 'dentist ')  # Service types compare case- and space-insensitively
+    assert index.is_free(DATE, '09:00', 'General Practitioner')
+    assert index.is_free(DATE, '09:30') and index.is_free('02-01-2031', '09:00')
+
+
+# Suggestions are the nearest free grid slots within opening hours, earlier first on ties, never the requested time
+def test_nearest_free_ordering():
+    index = AvailabilityIndex()
+    for time in ('09:30', '10:00', '10:30'):
+        index.add(DATE, time)
+    assert index.nearest_free(DATE, '10:00', 3) == ['09:00', '11:00', '08:30']
+    assert index.nearest_free(DATE, '08:00', 2) == ['08:30', '09:00']
+    assert index.nearest_free(DATE, '17:30', 1) == ['17:00']  # 18:00 is closing time, not a slot
+    assert index.nearest_free(DATE, '12:15', 2) == ['12:00', '12:30']
+
+
+# Removing a time clears only the given service's bit, and leaves the day booked while other appointments hold it
+def test_remove_respects_remaining_bookings():
+    index = AvailabilityIndex()
+    index.add(DATE, '09:00', 'Dentist')
+    index.add(DATE, '09:00', 'General Practitioner')
+    index.remove(DATE, '09:00', 'Dentist', still_booked=['General Practitioner'])
+    assert index.is_free(DATE, '09:00', 'Dentist')
+    assert not index.is_free(DATE, '09:00', 'General Practitioner')
+    assert not index.is_free(DATE, '09:00')
+    index.remove(DATE, '09:00', 'General Practitioner')
+    assert index.is_free(DATE, '09:00') and index.days == {} and index.services == {}
+
+
+# The index follows bookings, cancellations and conflicts made through the booking system
+def test_index_follows_book_cancel_and_conflict(booking):
+    success, _, appointment_id = booking.book_appointment(1, DATE, '09:00', 'Dentist', 'Dr. Sarah Lee')
+    assert success and not booking.availability.is_free(DATE, '09:00', 'Dentist')
+
+    assert not booking.book_appointment(2, DATE, '09:00', 'General Practitioner', 'Dr. Emily Carter')[0]
+    assert booking.availability.is_free(DATE, '09:00', 'General Practitioner')  # A conflict books no service
+
+    # A booking made by another process is learned from the conflict it causes
+    other = HealthcareBooking(booking.database_file)
+    try:
+        assert other.book_appointment(3, DATE, '10:00', 'Dentist', 'Dr. Sarah Lee')[0]
+    finally:
+        other.close()
+    assert booking.is_slot_free(DATE, '10:00')
+    assert not booking.book_appointment(4, DATE, '10:00', 'Dentist', 'Dr. Sarah Lee')[0]
+    assert not booking.is_slot_free(DATE, '10:00')
+
+    assert booking.cancel_appointment(appointment_id)[0]
+    assert booking.is_slot_free(DATE, '09:00') and booking.availability.is_free(DATE, '09:00', 'Dentist')
+
+
+# free_slot clears only the cancelled appointment's service, and not the day while a duplicate row holds the time
+def test_free_slot_with_duplicate_rows(booking):
+    booking.conn.execute("DROP INDEX idx_appointments_slot_time")  # As on databases with legacy duplicates
+    rows = [(1, DATE, '09:00', 'Dentist', 'Dr. Sarah Lee'), (2, DATE, '09:00', 'General Practitioner', 'Dr. Emily Carter')]
+    booking.conn.executemany("INSERT INTO appointments (user_id, date, time, service_type, professional_name) "
+                             "VALUES (?, ?, ?, ?, ?)", rows)
+    booking.conn.commit()
+    for _, date, time, service_type, _ in rows:
+        booking.availability.add(date, time, service_type)
+
+    dentist_id = booking.cursor.execute("SELECT id FROM appointments WHERE user_id = 1").fetchone()[0]
+    assert booking.cancel_appointment(dentist_id)[0]
+    assert booking.availability.is_free(DATE, '09:00', 'Dentist')
+    assert not booking.availability.is_free(DATE, '09:00', 'General Practitioner')
+    assert not booking.is_slot_free(DATE, '09:00')
+
+
+# A booking that hits a taken time offers the nearest free times and asks for another
+def test_booking_dialogue_suggests_free_times(booking):
+    date = (datetime.date.today() + datetime.timedelta(days=7)).strftime('%d-%m-%Y')
+    for time in ('09:00', '09:30'):
+        assert booking.book_appointment(1, date, time, 'Dentist', 'Dr. Sarah Lee')[0]
+
+    context = converse.ConversationContext()
+    context.set_state('book_appointment')
+    context.update_data('service_type', 'Dentist')
+    context.update_data('appointment_date', date)
+    response, _ = converse.handle_state_based_response('09:00 please', context, booking)
+    assert response == ("No available slots for the requested time. The nearest free times that day are "
+                        "08:30, 08:00, 10:00. Please enter another time (in HH:MM format).")
+    assert 'appointment_time' not in context.data and context.state == 'book_appointment'
@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db_migrations
+from healthcare_booking import HealthcareBooking
+
+CONFLICT = (False, "No available slots for the requested time", None)
+
+
+# A booking system on a throwaway database file
+@pytest.fixture
+def booking(tmp_path):
+    booking = HealthcareBooking(str(tmp_path / 'bookings.db'))
+    yield booking
+    booking.close()
+
+
+# Two threads booking the same slot at once: exactly one gets it, the other gets the conflict result
+def test_concurrent_bookings_of_one_slot(booking):
+    start = threading.Barrier(2)
+    results = [None, None]
+
+    def book(number):
+        start.wait()
+        results[number] = booking.book_appointment(number + 1, '01-01-2031', '09:00', 'General Practitioner',
+                                                    'Dr. Emily Carter')
+
+    threads = [threading.Thread(target=book, args=(number,)) for number in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(result[0] for result in results) == [False, True]
+    assert CONFLICT in results
+    assert booking.cursor.execute("SELECT COUNT(*) FROM appointments").fetchone()[0] == 1
+
+
+# Unpadded input names the same slot as its zero-padded form, and is stored padded
+def test_unpadded_date_and_time_collide(booking):
+    success, _, appointment_id = booking.book_appointment(1, '1-1-2031', '9:5', 'General Practitioner', 'Dr. Emily Carter')
+    assert success
+    assert booking.book_appointment(2, '01-01-2031', '09:05', 'Dentist', 'Dr. Sarah Lee') == CONFLICT
+    assert booking.get_appointment_by_id(appointment_id)[2:4] == ('01-01-2031', '09:05')
+    assert not booking.is_slot_free('01-01-2031', '09:05')
+
+
+# setup_database leaves a unique index on the slot column
+def test_unique_slot_index_exists(booking):
+    indexes = booking.conn.execute("PRAGMA index_list(appointments)").fetchall()
+    unique = [name for _, name, is_unique, *_ in indexes if is_unique]
+    assert any([column for _, _, column in booking.conn.execute(f"PRAGMA index_info({name})")] == ['slot']
+               for name in unique)
+    with pytest.raises(sqlite3.IntegrityError):
+        booking.conn.execute("INSERT INTO appointments (date, time, slot) VALUES ('x', 'y', '2031-01-01T09:00'), "
+                             "('x', 'y', '2031-01-01T09:00')")
+    booking.conn.rollback()
+
+
+# Creates a database with the original schema (before any migration) holding rows
+def legacy_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            date TEXT,
+            time TEXT,
+            service_type TEXT,
+            professional_name TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, phone_number TEXT)")
+    conn.executemany("INSERT INTO appointments (user_id, date, time, service_type, professional_name) VALUES (?, ?, ?, ?, ?)",
+                     rows)
+    conn.commit()
+    conn.close()
+
+
+# Returns {index name: (unique, [columns])} for the appointments table
+def appointment_indexes(conn):
+    return {name: (bool(unique), [column for _, _, column in conn.execute(f"PRAGMA index_info({name})")])
+            for _, name, unique, *_ in conn.execute("PRAGMA index_list(appointments)")}
+
+
+# Migrating a legacy database backfills slots (zero-padding unpadded rows) and enforces one booking per slot
+def test_migrates_legacy_database(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    legacy_database(path, [
+        (1, '24-11-2024', '12:30', 'General Practitioner', 'Dr. Emily Carter'),
+        (2, '1-1-2031', '9:5', 'Dentist', 'Dr. Sarah Lee'),
+        (3, '01-01-2031', '09:05', 'Dentist', 'Dr. Sarah Lee'),  # Same slot as the unpadded row before it
+        (4, 'someday', 'noon', 'Dentist', 'Dr. Sarah Lee'),
+    ])
+    booking = HealthcareBooking(path)
+    try:
+        conn = booking.conn
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db_migrations.MIGRATIONS[-1][0]
+        rows = conn.execute("SELECT user_id, date, time, slot FROM appointments ORDER BY id").fetchall()
+        assert rows == [
+            (1, '24-11-2024', '12:30', '2024-11-24T12:30'),
+            (2, '1-1-2031', '9:5', None),  # Its slot was already held, so it is left unslotted
+            (3, '01-01-2031', '09:05', '2031-01-01T09:05'),
+            (4, 'someday', 'noon', None),
+        ]
+        indexes = appointment_indexes(conn)
+        assert (True, ['slot']) in indexes.values()
+        assert 'idx_appointments_slot' not in indexes  # The v1 (date, time) index is dropped
+        assert booking.book_appointment(5, '1-1-2031', '9:5', 'Dentist', 'Dr. Sarah Lee') == CONFLICT
+    finally:
+        booking.close()
+
+
+# An unpadded legacy row whose slot is free is zero-padded and gets its slot
+def test_migration_pads_unpadded_rows(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    legacy_database(path, [(1, '2-3-2031', '8:0', 'Dentist', 'Dr. Sarah Lee')])
+    booking = HealthcareBooking(path)
+    try:
+        row = booking.conn.execute("SELECT date, time, slot FROM appointments").fetchone()
+        assert row == ('02-03-2031', '08:00', '2031-03-02T08:00')
+        assert not booking.is_slot_free('02-03-2031', '08:00')
+    finally:
+        booking.close()
+
+
+# Exact duplicate bookings cannot get a unique index; the migration still completes with a plain one
+def test_migrates_database_with_duplicate_slots(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    legacy_database(path, [(1, '24-11-2024', '12:30', 'Dentist', 'Dr. Sarah Lee')] * 2)
+    booking = HealthcareBooking(path)
+    try:
+        conn = booking.conn
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db_migrations.MIGRATIONS[-1][0]
+        assert [slot for slot, in conn.execute("SELECT slot FROM appointments")] == ['2024-11-24T12:30'] * 2
+        assert (False, ['slot']) in appointment_indexes(conn).values()
+    finally:
+        booking.close()
+
+
+IMPORT_CSV = """user_id,date,time,service_type,professional_name
+1,01-01-2031,09:00,Dentist,Dr. Sarah Lee
+2,31-02-2031,10:00,Dentist,Dr. Sarah Lee
+3,01-01-2031,10:00,Dentist,Dr. Sarah Lee,extra
+4,1-1-2031,9:0,General Practitioner,Dr. Emily Carter
+5,01-01-2031,11:00,Dentist,Dr. Sarah Lee
+6,01-01-2031,12:00,Dentist,Dr. Sarah Lee
+"""
+
+
+# Importing a CSV reports and skips malformed dates, extra fields, slots repeated in the file and booked ones
+def test_import_reports_bad_rows(booking, tmp_path):
+    assert booking.book_appointment(9, '01-01-2031', '12:00', 'Dentist', 'Dr. Sarah Lee')[0]
+    path = tmp_path / 'import.csv'
+    path.write_text(IMPORT_CSV, encoding='utf-8')
+
+    imported, conflicts = booking.import_appointments_csv(str(path))
+    assert imported == 2
+    assert conflicts == [
+        (2, "invalid date or time"),
+        (3, "malformed row"),
+        (4, "slot already booked"),  # Row 1's slot, unpadded
+        (6, "slot already booked"),  # Booked before the import
+    ]
+    rows = booking.conn.execute("SELECT user_id, date, time FROM appointments WHERE user_id != 9 ORDER BY id").fetchall()
+    assert rows == [(1, '01-01-2031', '09:00'), (5, '01-01-2031', '11:00')]
+    assert not booking.is_slot_free('01-01-2031', '11:00')
+
+
+# An export imports into an empty database and exports again unchanged
+def test_export_import_round_trip(booking, tmp_path):
+    booking.book_appointment(1, '01-01-2031', '09:00', 'Dentist', 'Dr. Sarah Lee')
+    booking.book_appointment(2, '1-1-2031', '9:30', 'General Practitioner', 'Dr. Emily Carter')
+    first, second = tmp_path / 'first.csv', tmp_path / 'second.csv'
+    assert booking.export_appointments_csv(str(first)) == 2
+
+    copy = HealthcareBooking(str(tmp_path / 'copy.db'))
+    try:
+        assert copy.import_appointments_csv(str(first)) == (2, [])
+        assert copy.export_appointments_csv(str(second)) == 2
+        assert not copy.is_slot_free('01-01-2031', '09:30')
+    finally:
+        copy.close()
+    assert second.read_text(encoding='utf-8') == first.read_text(encoding='utf-8')
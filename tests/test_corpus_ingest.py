@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import corpus_ingest
+import intent_recognition as ir
+
+# Small enough that every source spans several chunks
+CHUNK_SIZE = 300
+
+
+# Asserts two model tuples are identical: X down to its stored arrays, the fitted vectorizer and every column
+def assert_same_model(expected, actual):
+    expected_vectorizer, expected_X, *expected_columns = expected
+    vectorizer, X, *columns = actual
+    assert type(X) is type(expected_X) and X.shape == expected_X.shape
+    for field in ('data', 'indices', 'indptr'):
+        assert getattr(X, field).dtype == getattr(expected_X, field).dtype
+        np.testing.assert_array_equal(getattr(X, field), getattr(expected_X, field))
+    np.testing.assert_array_equal(vectorizer.idf_, expected_vectorizer.idf_)
+    if hasattr(expected_vectorizer, 'vocabulary_'):
+        assert list(vectorizer.vocabulary_.items()) == list(expected_vectorizer.vocabulary_.items())
+    for column, expected_column in zip(columns, expected_columns):
+        assert list(column) == list(expected_column)
+
+
+# Streaming, in this process or across a pool, builds exactly the serial model
+@pytest.mark.parametrize('features', ['tfidf', 'hashing'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_streamed_model_is_identical(source_files, features, workers):
+    serial = ir.build_model(*source_files, features=features)
+    streamed = corpus_ingest.build_model(*source_files, features=features, workers=workers, chunk_size=CHUNK_SIZE)
+    assert_same_model(serial, streamed)
+    queries = ['what are your opening hours', 'i want to book an appointment']
+    assert (serial[0].transform(queries) != streamed[0].transform(queries)).nnz == 0
+
+
+# Progress is reported after every chunk and once more when the model is done
+def test_progress_reports_every_chunk(source_files):
+    reports = []
+    model = corpus_ingest.build_model(*source_files, chunk_size=CHUNK_SIZE,
+                                      progress=lambda rows, elapsed, done: reports.append((rows, done)))
+    rows = model[1].shape[0]
+    assert reports[-1] == (rows, True)
+    assert [done for _, done in reports].count(True) == 1
+    counts = [count for count, _ in reports]
+    assert counts == sorted(counts) and len(reports) > rows // CHUNK_SIZE
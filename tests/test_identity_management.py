@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+import identity_management as idm
+
+
+# The name the original extractor found: each pattern tried with re.search in turn, the first match winning
+def original_name(text):
+    for pattern in idm.NAME_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return ' '.join(part.capitalize() for part in match.group(1).split())
+    return None
+
+
+# One phrase for each pattern in order, then texts where several patterns match, and texts with no name
+@pytest.mark.parametrize('text, name', [
+    ("My name is alice smith", "Alice Smith"),
+    ("Hello, I am bob", "Bob"),
+    ("please call me carol", "Carol"),
+    ("You can call me Dave", "Dave"),  # "Call me" matches too, with the same name
+    ("my name's Eve", "Eve"),
+    ("Hi, I'm frank", "Frank"),
+    ("grace hopper", "Grace Hopper"),
+    ("I'm Heidi, my name is Heidi Klum", "Heidi Klum"),  # "My name is" is tried first, wherever it is
+    ("I am here, call me Ivan", "Here"),
+    ("Call me Judy, I am Judith", "Judith"),
+    ("My name is José", "José"),
+    ("i am\njudy", "I Am Judy"),  # The phrases need a space, so this is a bare name
+    ("Hello!", None),
+    ("what's up", None),
+])
+def test_extract_name_matches_original_patterns(text, name):
+    assert original_name(text) == name
+    identities = idm.IdentityManager()
+    user_id = identities.extract_name(text)
+    assert (identities.get_user_name(user_id) if user_id else None) == name
+
+
+# Identities beyond max_users are forgotten least recently used first, and leave the name index with them
+def test_least_recently_used_identities_are_evicted():
+    identities = idm.IdentityManager(max_users=2)
+    identities.add_user('a', 'Ann')
+    identities.add_user('b', 'Bob')
+    identities.get_user_name('a')
+    identities.add_user('c', 'Ann')
+    assert identities.get_user_name('b') is None and identities.get_user_id('Bob') is None
+    assert 'Bob' not in identities.user_ids
+    assert identities.get_user_id('Ann') == 'a'
+
+    identities.add_user('d', 'Dan')  # Evicts 'a', so the other Ann is found by name
+    assert identities.get_user_name('a') is None
+    assert identities.get_user_id('Ann') == 'c'
+    assert identities.user_ids == {'Ann': {'c': None}, 'Dan': {'d': None}}
@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import intent_recognition as ir
+import metrics
+import model_store
+
+
+# A model store over copies of the bundled sources, which the test may edit
+@pytest.fixture
+def store(tmp_path, source_files):
+    copies = [shutil.copy(path, tmp_path) for path in source_files]
+    store = model_store.ModelStore(*copies, artifact_file=None)
+    yield store
+    store.close()
+
+
+# Counting metrics for the length of a test
+@pytest.fixture
+def counters(monkeypatch):
+    metrics.registry.reset()
+    monkeypatch.setattr(metrics.registry, 'enabled', True)
+    yield metrics.registry.counters
+    metrics.registry.reset()
+
+
+# Adding a QA pair preprocesses only its question, and gives the rows a full build would
+def test_incremental_reload_preprocesses_only_new_texts(store, monkeypatch):
+    with open(store.files[1], 'a', newline='', encoding='utf-8') as file:
+        file.write('999,Do you offer flu shots on weekends?,Yes, every Saturday morning.\n')
+    preprocessed = []
+    preprocess_texts = ir.preprocess_texts
+    monkeypatch.setattr(ir, 'preprocess_texts', lambda texts: preprocessed.extend(texts) or preprocess_texts(texts))
+
+    assert store.reload()
+    assert preprocessed == ['Do you offer flu shots on weekends?']
+    assert store.last_reload['full_rebuild'] is False and store.last_reload['added'] == 1
+    snapshot = store.snapshot
+    assert snapshot.questions[-1] == ir.preprocess_text('Do you offer flu shots on weekends?')
+    _, questions, _, healthcare_questions, _ = ir.load_data(*store.files)
+    assert snapshot.questions == questions and snapshot.healthcare_questions == healthcare_questions
+
+
+# An unusable edit is counted and the current model kept; the next good edit is picked up
+def test_failed_reload_keeps_model_and_watching(store, counters):
+    intents_file = store.files[0]
+    with open(intents_file) as file:
+        intents = json.load(file)
+    with open(intents_file, 'w') as file:
+        json.dump({'intents': [{'tag': 'broken', 'patterns': None, 'responses': []}]}, file)
+
+    snapshot = store.snapshot
+    assert store.check_for_changes() is False
+    assert store.snapshot is snapshot
+    assert counters['model_reload_errors'] == {'TypeError': 1}
+
+    with open(intents_file, 'w') as file:
+        json.dump({'intents': intents['intents'] + [{'tag': 'extra', 'patterns': ['extra pattern'], 'responses': ['ok']}]},
+                  file)
+    os.utime(intents_file, ns=(0, 0))  # Make sure the signature differs even on coarse timestamps
+    assert store.check_for_changes() is True
+    assert store.snapshot.version == snapshot.version + 1 and store.snapshot.labels[-1] == 'extra'
@@ -0,0 +1,76 @@
+import converse
+import intent_recognition as ir
+from response_cache import ResponseCache
+
+
+# A cache whose clock the test moves by hand
+def cache_with_clock(**kwargs):
+    now = [0.0]
+    cache = ResponseCache(clock=lambda: now[0], **kwargs)
+    return cache, now
+
+
+# Entries are served until their TTL has passed, then dropped as expired
+def test_entries_expire_after_ttl():
+    cache, now = cache_with_clock(ttl=10)
+    cache.put('hello', 'greeting')
+    now[0] = 9.9
+    assert cache.get('hello') == 'greeting'
+    now[0] = 10
+    assert cache.get('hello') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['size']) == (1, 1, 1, 0)
+
+
+# Looking up or storing with another model version drops every entry
+def test_model_version_change_invalidates():
+    cache, _ = cache_with_clock()
+    cache.put('hello', 'greeting', version=1)
+    cache.put('bye', 'goodbye', version=1)
+    assert cache.get('hello', version=2) is None
+    assert cache.stats()['invalidations'] == 1 and cache.stats()['size'] == 0
+    cache.put('hello', 'new greeting', version=2)
+    assert cache.get('hello', version=2) == 'new greeting'
+    cache.put('bye', 'goodbye', version=3)
+    assert cache.get('hello', version=3) is None
+
+
+# The least recently used entry is evicted when the cache is full
+def test_least_recently_used_is_evicted():
+    cache, _ = cache_with_clock(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+# Stands in for a model snapshot: a version and the model tuple
+class Snapshot:
+    def __init__(self, model, version):
+        self.version = version
+        self._model = model
+
+    def model(self):
+        return self._model
+
+
+# A miss matches the preprocessed input directly; inputs that preprocess alike share one entry
+def test_miss_recognizes_preprocessed_key(model, monkeypatch):
+    monkeypatch.setattr(converse, 'recognition_cache', ResponseCache())
+    keys = []
+    recognize_preprocessed = ir.recognize_preprocessed
+    monkeypatch.setattr(ir, 'recognize_preprocessed',
+                        lambda key, *model: keys.append(key) or recognize_preprocessed(key, *model))
+    snapshot = Snapshot(model, 1)
+
+    result = converse.recognize_intent_cached('What are your opening hours?', snapshot)
+    assert result == ir.recognize_intent('What are your opening hours?', *model)
+    assert keys == [ir.preprocess_text('What are your opening hours?')]
+    assert converse.recognize_intent_cached('what are your opening hours', snapshot) == result
+    assert len(keys) == 1 and converse.recognition_cache.stats()['hits'] == 1
+
+    # A reloaded model recomputes
+    converse.recognize_intent_cached('what are your opening hours', Snapshot(model, 2))
+    assert len(keys) == 2
@@ -0,0 +1,71 @@
+import pickle
+import threading
+
+import numpy as np
+import pytest
+
+import intent_recognition as ir
+import retrieval_index
+
+
+# Queries covering intent patterns, QA questions and text matching nothing in particular
+def queries(model):
+    vectorizer, X, labels, questions, answers, healthcare_questions, healthcare_answers = model
+    texts = list(questions[::40]) + list(healthcare_questions[::5])
+    texts += ['hello there', 'book an appointment for tomorrow', 'what are your opening hours', 'zebra quantum']
+    return texts
+
+
+# The inverted index returns exactly the rows of the full scan, in the same order, for any k
+@pytest.mark.parametrize('k', [1, 5, 20])
+def test_top_k_matches_exact_scan(model, k):
+    vectorizer, X = model[0], model[1]
+    index = retrieval_index.InvertedIndex(X)
+    input_vecs = vectorizer.transform(ir.preprocess_texts(queries(model)))
+    exact = ir.score_vectors(input_vecs, X, k)
+    pruned = ir.score_vectors(input_vecs, index, k)
+    assert len(exact) == len(pruned)
+    for (exact_rows, exact_scores), (rows, scores) in zip(exact, pruned):
+        np.testing.assert_array_equal(rows, exact_rows)
+        np.testing.assert_allclose(scores, exact_scores, rtol=0, atol=1e-12)
+
+
+# Recognition through the inverted backend answers every query as the exact backend does
+def test_recognition_matches_exact_backend(model):
+    vectorizer, X, *rest = model
+    index = ir.build_matching_index(X, 'inverted')
+    texts = queries(model)
+    exact = ir.recognize_intents(texts, vectorizer, X, *rest, top_k=3)
+    inverted = ir.recognize_intents(texts, vectorizer, index, *rest, top_k=3)
+    for exact_matches, matches in zip(exact, inverted):
+        assert [match[:2] for match in matches] == [match[:2] for match in exact_matches]
+        np.testing.assert_allclose([match[2] for match in matches], [match[2] for match in exact_matches], atol=1e-12)
+
+
+# Tier statistics count every query exactly once when many threads share one tiered index,
+# and the index (lock and all) survives pickling as an lsa artifact
+def test_tiered_timings_are_thread_safe(model):
+    vectorizer, X, labels, questions = model[:4]
+    index = ir.TieredIndex(X, len(labels), len(questions))
+    input_vecs = vectorizer.transform(ir.preprocess_texts(queries(model)))
+    rounds = 50
+
+    def score():
+        for _ in range(rounds):
+            index.top_k(input_vecs, 3)
+
+    threads = [threading.Thread(target=score) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = index.tier_stats()
+    assert stats['intents']['queries'] == 8 * rounds * input_vecs.shape[0]
+    hits = sum(tier['hits'] for tier in stats.values())
+    single = ir.TieredIndex(X, len(labels), len(questions))
+    single.top_k(input_vecs, 3)
+    assert hits == 8 * rounds * sum(tier['hits'] for tier in single.tier_stats().values())
+
+    restored = pickle.loads(pickle.dumps(index))
+    assert restored.tier_stats() == stats
+    restored.top_k(input_vecs, 3)
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+import converse
+import session_store
+from healthcare_booking import HealthcareBooking
+
+
+# A booking system on a throwaway database file
+@pytest.fixture
+def booking(tmp_path):
+    booking = HealthcareBooking(str(tmp_path / 'bookings.db'))
+    yield booking
+    booking.close()
+
+
+# A session store spilling ChatSessions to a throwaway file, with a clock the test moves by hand
+@pytest.fixture
+def store(tmp_path, booking):
+    now = [0.0]
+    store = session_store.SessionStore(
+        restore_session=lambda saved: converse.ChatSession.from_dict(saved, booking), ttl=60, max_sessions=2,
+        spill_path=str(tmp_path / 'spill.db'), clock=lambda: now[0])
+    store.now = now
+    yield store
+    store.close()
+
+
+# A session partway through a dialogue
+def session_in_state(booking, state, name):
+    session = converse.ChatSession(booking)
+    session.context.set_state(state)
+    session.context.update_data('user_name', name)
+    return session
+
+
+# Sessions pushed out over capacity are resumed with their dialogue state
+def test_evicted_over_capacity_is_resumed(store, booking):
+    for number in range(3):
+        store.put(f"s{number}", session_in_state(booking, 'awaiting_date', f"user {number}"))
+    assert 's0' not in store and len(store) == 2
+
+    session = store.get('s0')
+    assert session is not None
+    assert session.context.state == 'awaiting_date'
+    assert session.context.get_data('user_name') == 'user 0'
+    assert store.stats()['resumed'] == 1
+    assert 's0' in store and 's1' not in store  # Resuming s0 pushed out the least recently used session
+
+
+# Sessions idle past the TTL are spilled, then resumed on their next request
+def test_ttl_expiry_spills_and_resumes(store, booking):
+    store.put('idle', session_in_state(booking, 'awaiting_service', 'Ann'))
+    store.now[0] = 30
+    store.put('active', session_in_state(booking, None, 'Bob'))
+    store.now[0] = 61
+
+    assert store.evict_expired() == ['idle']
+    assert 'idle' not in store and 'active' in store
+    assert store.stats()['spilled_sessions'] == 1
+
+    session = store.get('idle')
+    assert session.context.state == 'awaiting_service'
+    assert session.context.get_data('user_name') == 'Ann'
+    assert store.stats()['spilled_sessions'] == 0
+    assert store.get('unknown') is None
+
+
+# Stands in for a session whose serialization is slow, signalling when it starts
+class SlowSession:
+    def __init__(self, name, spilling=None):
+        self.name = name
+        self.spilling = spilling
+
+    def to_dict(self):
+        if self.spilling is not None:
+            self.spilling.set()
+            threading.Event().wait(0.2)
+        return {'name': self.name}
+
+
+# A get() racing with an eviction finds the session in memory or in the spill database, never in neither
+def test_get_during_spill_finds_session(tmp_path):
+    store = session_store.SessionStore(restore_session=lambda saved: SlowSession(saved['name']), max_sessions=1,
+                                       spill_path=str(tmp_path / 'spill.db'))
+    spilling = threading.Event()
+    store.put('first', SlowSession('first', spilling))
+    evicting = threading.Thread(target=store.put, args=('second', SlowSession('second')))
+    evicting.start()
+    spilling.wait(5)
+    session = store.get('first')
+    evicting.join()
+    store.close()
+    assert session is not None and session.name == 'first'
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+
+import pytest
+
+from healthcare_booking import HealthcareBooking
+
+# Long enough that operations submitted back to back always share one group commit
+BATCH_LATENCY = 0.5
+
+
+# A booking system with group commit on a throwaway database file
+@pytest.fixture
+def booking(tmp_path):
+    booking = HealthcareBooking(str(tmp_path / 'bookings.db'), group_commit=True, max_commit_latency=BATCH_LATENCY)
+    yield booking
+    booking.close()
+
+
+# Every slot booked in the database, from a separate connection
+def booked_slots(booking):
+    with sqlite3.connect(booking.database_file) as conn:
+        return sorted(conn.execute("SELECT date, time, user_id FROM appointments").fetchall())
+
+
+# Bookings from many threads are all confirmed and committed
+def test_concurrent_bookings_commit(booking):
+    results = {}
+
+    def book(number):
+        results[number] = booking.book_appointment(number, '01-01-2031', f"{8 + number // 2:02d}:{30 * (number % 2):02d}",
+                                                   'General Practitioner', 'Dr. Emily Carter')
+
+    threads = [threading.Thread(target=book, args=(number,)) for number in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(success for success, _, _ in results.values())
+    assert len(booked_slots(booking)) == 16
+    assert booking.write_queue.stats()['operations'] == 16
+
+
+# Two bookings of one slot in the same group: the first wins, the second gets the usual conflict result
+def test_conflict_within_a_group(booking):
+    first = booking.write_queue.book(1, '01-01-2031', '09:00', 'General Practitioner', 'Dr. Emily Carter')
+    second = booking.write_queue.book(2, '01-01-2031', '09:00', 'Dentist', 'Dr. Sarah Lee')
+    assert first.result()[0] is True
+    assert second.result() == (False, "No available slots for the requested time", None)
+    assert booking.write_queue.stats()['commits'] == 1
+    assert booked_slots(booking) == [('01-01-2031', '09:00', 1)]
+    assert not booking.is_slot_free('01-01-2031', '09:00')
+
+
+# An operation failing with a database error is rolled back to its savepoint; the rest of its group commits
+def test_failed_operation_is_isolated(booking):
+    reserve_slot = booking.reserve_slot
+
+    # Reserves the slot, then fails for user 2 after its insert has run
+    def failing_reserve_slot(user_id, *args):
+        result = reserve_slot(user_id, *args)
+        if user_id == 2:
+            raise sqlite3.OperationalError("simulated failure")
+        return result
+
+    queue = booking.write_queue
+    queue.operations['book'] = (failing_reserve_slot, booking.BOOKING_FAILED)
+    futures = [queue.book(user_id, '01-01-2031', f"{9 + user_id}:00", 'General Practitioner', 'Dr. Emily Carter')
+               for user_id in (1, 2, 3)]
+    results = [future.result() for future in futures]
+
+    assert results[0][0] is True and results[2][0] is True
+    assert results[1] == booking.BOOKING_FAILED
+    assert queue.stats()['commits'] == 1
+    assert booked_slots(booking) == [('01-01-2031', '10:00', 1), ('01-01-2031', '12:00', 3)]
+    assert booking.is_slot_free('01-01-2031', '11:00')
+
+    # A cancellation queued alongside a missing appointment's is unaffected by it
+    cancelled = queue.cancel(results[0][2])
+    missing = queue.cancel(999)
+    assert cancelled.result() == (True, "Your appointment has been successfully cancelled.")
+    assert missing.result() == (False, "Appointment not found")
+    assert booked_slots(booking) == [('01-01-2031', '12:00', 3)]
+
+
+# An operation raising something other than a database error is rolled back and raised to its caller alone
+def test_unexpected_error_is_raised_to_its_caller(booking):
+    reserve_slot = booking.reserve_slot
+
+    # Reserves the slot, then fails with a bug for user 2
+    def buggy_reserve_slot(user_id, *args):
+        result = reserve_slot(user_id, *args)
+        if user_id == 2:
+            raise KeyError('bug')
+        return result
+
+    queue = booking.write_queue
+    queue.operations['book'] = (buggy_reserve_slot, booking.BOOKING_FAILED)
+    futures = [queue.book(user_id, '01-01-2031', f"{9 + user_id}:00", 'General Practitioner', 'Dr. Emily Carter')
+               for user_id in (1, 2, 3)]
+    with pytest.raises(KeyError):
+        futures[1].result()
+    assert futures[0].result()[0] is True and futures[2].result()[0] is True
+    assert booked_slots(booking) == [('01-01-2031', '10:00', 1), ('01-01-2031', '12:00', 3)]
+
+
+# A failing availability update after the commit still resolves the operation, and the writer keeps going
+def test_failing_change_still_resolves(booking):
+    reserve_slot = booking.reserve_slot
+
+    # Stages the booking with an index update that raises
+    def reserve_slot_with_broken_change(*args):
+        result, _ = reserve_slot(*args)
+        return result, lambda: 1 / 0
+
+    queue = booking.write_queue
+    queue.operations['book'] = (reserve_slot_with_broken_change, booking.BOOKING_FAILED)
+    assert queue.book(1, '01-01-2031', '09:00', 'Dentist', 'Dr. Sarah Lee').result(5)[0] is True
+    assert queue.book(2, '01-01-2031', '10:00', 'Dentist', 'Dr. Sarah Lee').result(5)[0] is True
+    assert len(booked_slots(booking)) == 2
+
+
+# If the writer thread dies, its batch gets the error, queued operations are failed and new ones refused
+def test_dead_writer_fails_queued_operations(tmp_path):
+    booking = HealthcareBooking(str(tmp_path / 'bookings.db'), group_commit=True, max_commit_latency=BATCH_LATENCY)
+    queue = booking.write_queue
+    committing = threading.Event()
+    release = threading.Event()
+
+    # Stands in for a commit that crashes the writer once a second operation is queued
+    def crashing_commit(batch):
+        committing.set()
+        release.wait(5)
+        raise RuntimeError("writer crashed")
+
+    queue.commit = crashing_commit
+    queue.max_batch = 1
+    first = queue.book(1, '01-01-2031', '09:00', 'Dentist', 'Dr. Sarah Lee')
+    committing.wait(5)
+    queued = queue.book(2, '01-01-2031', '10:00', 'Dentist', 'Dr. Sarah Lee')
+    release.set()
+    queue.writer.join(5)
+
+    with pytest.raises(RuntimeError, match="writer crashed"):
+        first.result(5)
+    with pytest.raises(RuntimeError, match="closed"):
+        queued.result(5)
+    with pytest.raises(RuntimeError, match="closed"):
+        queue.book(3, '01-01-2031', '11:00', 'Dentist', 'Dr. Sarah Lee')
+    booking.close()
+
+
+# Operations submitted while the queue closes are either committed or refused, never left pending
+def test_submit_racing_close_never_hangs(booking):
+    queue = booking.write_queue
+    futures = []
+    start = threading.Barrier(5)
+
+    def submit(number):
+        start.wait()
+        for minute in range(0, 60, 5):
+            try:
+                futures.append(queue.book(number, f"0{number + 1}-01-2031", f"09:{minute:02d}", 'Dentist', 'Dr. Sarah Lee'))
+            except RuntimeError:
+                return
+
+    threads = [threading.Thread(target=submit, args=(number,)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    queue.close()
+    for thread in threads:
+        thread.join()
+    assert all(future.result(5)[0] for future in futures)
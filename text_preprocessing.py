@@ -0,0 +1,156 @@
+import argparse
+import os
+import re
+from functools import lru_cache
+
+# Runs of letters; the 'regex' tokenizer mode uses this instead of nltk.word_tokenize
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+TOKENIZER_MODES = ('nltk', 'regex')
+DEFAULT_LEMMA_CACHE_SIZE = 50000
+
+# NLTK data packages, by the path nltk.data.find looks them up under, and those each tokenizer mode needs.
+# word_tokenize reads the English Punkt model from punkt_tab; NLTK before 3.8.2 read the pickled punkt instead.
+NLTK_RESOURCES = {'punkt_tab': 'tokenizers/punkt_tab/english/', 'punkt': 'tokenizers/punkt', 'wordnet': 'corpora/wordnet'}
+REQUIRED_RESOURCES = {'nltk': ('punkt_tab', 'wordnet'), 'regex': ('wordnet',)}
+# A vendored copy of the NLTK data next to the code, searched before the usual locations
+VENDORED_NLTK_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data')
+# Offline mode never downloads: missing NLTK data is an error instead of a network call
+OFFLINE = os.environ.get('CHATBOT_OFFLINE', '') not in ('', '0')
+
+
+# Returns the data packages the installed NLTK actually loads for names: punkt_tab becomes punkt on
+# releases whose word_tokenize still reads the pickled model
+def installed_package_names(names):
+    from nltk.tokenize import punkt
+    if hasattr(punkt, 'PunktTokenizer'):
+        return list(names)
+    return ['punkt' if name == 'punkt_tab' else name for name in names]
+
+
+# Checks that the named NLTK data packages are installed (or vendored), downloading missing ones
+# unless offline. Raises LookupError naming whatever is still missing.
+def ensure_nltk_resources(names, offline=None):
+    import nltk
+    if VENDORED_NLTK_DATA not in nltk.data.path:
+        nltk.data.path.insert(0, VENDORED_NLTK_DATA)
+    offline = OFFLINE if offline is None else offline
+    missing = []
+    for name in installed_package_names(names):
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+        except LookupError:
+            if offline or not nltk.download(name, quiet=True):
+                missing.append(name)
+    if missing:
+        raise LookupError(f"Missing NLTK data: {', '.join(missing)}. Run 'python text_preprocessing.py --download' "
+                          f"while online to vendor it into {VENDORED_NLTK_DATA}, or point NLTK_DATA at a copy.")
+
+
+# Preprocessing engine shared by intent recognition and identity management. It keeps a single
+# lemmatizer and a bounded token -> lemma cache, since the vocabulary is small compared to the
+# number of tokens processed at startup and per turn.
+#
+# tokenizer='nltk' matches the original word_tokenize + isalpha pipeline exactly.
+# tokenizer='regex' is faster but splits contractions differently ("don't" -> "don", "t").
+# NLTK is imported, and its data checked, on first use rather than at import.
+class TextPreprocessor:
+    def __init__(self, tokenizer='nltk', cache_size=DEFAULT_LEMMA_CACHE_SIZE):
+        if tokenizer not in TOKENIZER_MODES:
+            raise ValueError(f"Unknown tokenizer mode: {tokenizer!r} (expected one of {TOKENIZER_MODES})")
+        self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self.lemmatizer = None
+        self.word_tokenize = None
+        # lru_cache is thread-safe and keeps its own hit/miss counters
+        self._lemmatize = lru_cache(maxsize=cache_size)(self.lemmatize_token)
+
+    # Imports NLTK and checks the data this tokenizer mode needs; returns self
+    def load(self):
+        if self.lemmatizer is None:
+            ensure_nltk_resources(REQUIRED_RESOURCES[self.tokenizer])
+            import nltk
+            from nltk.stem import WordNetLemmatizer
+            self.word_tokenize = nltk.word_tokenize
+            self.lemmatizer = WordNetLemmatizer()
+        return self
+
+    # Lemmatizes one token, without the cache
+    def lemmatize_token(self, token):
+        return (self.lemmatizer or self.load().lemmatizer).lemmatize(token)
+
+    # Splits lower-cased text into alphabetic tokens
+    def tokenize(self, text):
+        if self.tokenizer == 'regex':
+            return WORD_PATTERN.findall(text.lower())
+        word_tokenize = self.word_tokenize or self.load().word_tokenize
+        return [token for token in word_tokenize(text.lower()) if token.isalpha()]
+
+    # Tokenizes, lemmatizes and re-joins a single text
+    def preprocess(self, text):
+        lemmatize = self._lemmatize
+        return ' '.join([lemmatize(token) for token in self.tokenize(text)])
+
+    # Preprocesses a list of texts, reusing the result for repeated texts within the batch
+    def preprocess_batch(self, texts):
+        seen = {}
+        results = []
+        for text in texts:
+            processed = seen.get(text)
+            if processed is None:
+                processed = seen[text] = self.preprocess(text)
+            results.append(processed)
+        return results
+
+    # Returns lemma cache counters so the effect of the cache can be monitored
+    def cache_stats(self):
+        info = self._lemmatize.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': info.hits / lookups if lookups else 0.0,
+            'size': info.currsize,
+            'max_size': info.maxsize,
+        }
+
+    # Empties the lemma cache and resets its counters
+    def clear_cache(self):
+        self._lemmatize.cache_clear()
+
+
+# Process-wide preprocessor used by the module-level helpers below
+default_preprocessor = TextPreprocessor()
+
+# Replaces the process-wide preprocessor, e.g. to switch to the regex tokenizer
+def configure_preprocessing(tokenizer='nltk', cache_size=DEFAULT_LEMMA_CACHE_SIZE):
+    global default_preprocessor
+    default_preprocessor = TextPreprocessor(tokenizer=tokenizer, cache_size=cache_size)
+    return default_preprocessor
+
+# Preprocesses text by tokenization, lemmatization, and removing non-alphabetic characters
+def preprocess_text(text):
+    return default_preprocessor.preprocess(text)
+
+# Preprocesses a list of texts in one call
+def preprocess_texts(texts):
+    return default_preprocessor.preprocess_batch(texts)
+
+
+# Checks the NLTK data every tokenizer mode needs; --download vendors missing packages next to the code,
+# so later runs (e.g. with CHATBOT_OFFLINE=1) never touch the network
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check, or vendor, the NLTK data preprocessing needs")
+    parser.add_argument('--download', action='store_true', help=f"Download missing packages into {VENDORED_NLTK_DATA}")
+    args = parser.parse_args()
+
+    import nltk
+    for name in installed_package_names(dict.fromkeys(name for names in REQUIRED_RESOURCES.values() for name in names)):
+        try:
+            ensure_nltk_resources([name], offline=True)
+            status = 'available'
+        except LookupError:
+            status = 'missing'
+            if args.download and nltk.download(name, download_dir=VENDORED_NLTK_DATA):
+                status = 'downloaded'
+        print(f"{name}: {status}")
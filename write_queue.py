@@ -0,0 +1,169 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+# Group commit limits: the most operations committed together, and the longest an operation waits
+# for others to share its commit (the maximum latency the queue adds)
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_LATENCY = 0.005  # seconds
+
+
+# Write-behind queue for booking mutations. A single writer thread collects book and cancel operations
+# from any number of callers and commits them together, so many operations share one transaction
+# (and one fsync) instead of paying for their own. Each operation runs under a savepoint, so one failing
+# operation never fails the others in its group. Callers get each operation's usual result tuple
+# (including slot conflicts) through a Future, set once the group has been committed.
+class WriteQueue:
+    def __init__(self, booking, max_batch=DEFAULT_MAX_BATCH, max_latency=DEFAULT_MAX_LATENCY):
+        self.booking = booking
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        # operation name -> (method staging it without committing, result if its transaction fails)
+        self.operations = {
+            'book': (booking.reserve_slot, booking.BOOKING_FAILED),
+            'cancel': (booking.delete_appointment, booking.CANCEL_FAILED),
+        }
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()  # Orders submit() against close()
+        self.closed = False
+        self.commits = 0
+        self.committed_operations = 0
+        self.writer = threading.Thread(target=self.run, name='booking-writer', daemon=True)
+        self.writer.start()
+
+    # Queues a booking; the Future resolves to book_appointment's (success, message, appointment_id)
+    def book(self, user_id, date, time, service_type, professional_name):
+        return self.submit('book', (user_id, date, time, service_type, professional_name))
+
+    # Queues a cancellation; the Future resolves to cancel_appointment's (success, message)
+    def cancel(self, appointment_id):
+        return self.submit('cancel', (appointment_id,))
+
+    # Queues an operation and returns the Future for its result. The closed check and the put happen under
+    # the lock close() takes, so nothing can be queued behind the writer's stop sentinel.
+    def submit(self, operation, args):
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("The write queue is closed")
+            self.queue.put((operation, args, future))
+        return future
+
+    # Writer thread: waits for an operation, gathers more until the batch is full or the first one has
+    # waited max_latency, then commits them as one group. However it exits, the queue is closed and
+    # anything still waiting in it is failed, so no caller blocks on a Future that never resolves.
+    def run(self):
+        batch = []
+        try:
+            stopping = False
+            while not stopping:
+                item = self.queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_latency
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self.commit(batch)
+                batch = []
+        except Exception as e:
+            print("Write queue error:", repr(e))
+            metrics.increment('write_errors', 'writer')
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self.lock:
+                self.closed = True
+            self.fail_queued()
+
+    # Fails every operation still queued (called once the writer has stopped taking them)
+    def fail_queued(self):
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[2].set_exception(RuntimeError("The write queue is closed"))
+
+    # Runs a batch of operations in one transaction and resolves their Futures. An operation failing with a
+    # database error gets its usual failed result; any other exception (a bug in the operation) is rolled back
+    # to its savepoint the same way and raised to its caller through the Future.
+    @metrics.timed('db_query_seconds', 'group_commit')
+    def commit(self, batch):
+        conn = self.booking.conn  # The writer thread's own connection
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, args, future in batch:
+                conn.execute("SAVEPOINT operation")
+                error = change = None
+                try:
+                    stage, failed = self.operations[operation]
+                    result, change = stage(*args)
+                    conn.execute("RELEASE operation")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    conn.execute("RELEASE operation")
+                    if isinstance(e, sqlite3.Error):
+                        print("Database error:", e)
+                        metrics.increment('db_errors', operation)
+                        result = failed
+                    else:
+                        print("Write queue error:", repr(e))
+                        metrics.increment('write_errors', operation)
+                        result, error = None, e
+                results.append((future, result, error, change))
+            conn.commit()
+        except Exception as e:
+            print("Database error:", e)
+            metrics.increment('db_errors', 'group_commit')
+            conn.rollback()
+            for operation, args, future in batch:
+                future.set_result(self.operations.get(operation, (None, None))[1])
+            return
+
+        self.commits += 1
+        self.committed_operations += len(batch)
+        for future, result, error, change in results:
+            if change is not None:
+                try:
+                    change()
+                except Exception as e:
+                    # The operation is committed; only the availability index missed it
+                    print("Write queue error:", repr(e))
+                    metrics.increment('write_errors', 'change')
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    # Returns the number of group commits and the average operations per commit
+    def stats(self):
+        return {
+            'commits': self.commits,
+            'operations': self.committed_operations,
+            'operations_per_commit': self.committed_operations / self.commits if self.commits else 0,
+            'queued': self.queue.qsize(),
+        }
+
+    # Commits everything already queued, then stops the writer thread
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+        self.writer.join()